@@ -1,28 +1,57 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g, stream_with_context
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager, jwt_required, create_access_token, get_jwt_identity
-from werkzeug.security import check_password_hash, generate_password_hash
+from flask_jwt_extended import JWTManager, jwt_required, create_access_token, get_jwt_identity, get_jwt, verify_jwt_in_request
 import os
-from datetime import datetime, timedelta
+import math
+import time
+import hashlib
+import threading
+import functools
+from datetime import datetime, timedelta, timezone
 import pickle
 import pandas as pd
 import numpy as np
-from pymongo import MongoClient
 from bson import ObjectId
+import io
+import csv
 import logging
+import click
 from dotenv import load_dotenv
 from config import config
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from loguru import logger
 from services.notification_service import notification_service
+from services.cache_service import NotificationSettingsCache
+from services.auth_service import UserResolver
+from services.password_service import PasswordHasher
+from services.metrics_service import metrics
+from services.profiler_service import SamplingProfiler
+from services.logging_service import configure_logging
+from services.json_provider import FastJSONProvider
+from services.http_cache import make_etag, etag_matches, compress_response
+from services.health_service import HealthMonitor
+from services.db_service import MongoConnectionManager, DatabaseUnavailable, client_options
+from services import analytics_service as analytics
+from services.rollup_service import RollupStore, PERIODS
+from services.retention_service import HistoryDeletionJobs, ensure_ttl_index
+from services.archive_service import PredictionArchive
+from services.storage_service import FeatureDictionary, CompactPredictionCodec
+from services.admission_service import AdmissionController, AdmissionRejected, INTERACTIVE, BATCH
+from services.rate_limit_service import RateLimiter, FileBuckets, MemoryBuckets, parse_limit
+from services.whatif_service import grid_dimensions, score_grid
+from services.risk_service import TopRiskIndex
+from services.model_service import ModelBundle, TenantModels, load_bundle
+from services.event_service import EventBroker, sse_message
+from services.idempotency_service import IdempotencyStore, IdempotencyConflict
+from services.inference_service import InferencePool, InferenceUnavailable
 
 # Load environment variables
 load_dotenv()
 
 # Initialize Flask app
 app = Flask(__name__)
+app.json = FastJSONProvider(app)  # orjson when installed; handles ObjectId, datetime and numpy
 app.config['JWT_SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-change-in-production')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
 app.config.from_object(config['default'])
@@ -49,7 +78,8 @@ CORS(
         'Authorization', 
         'Origin', 
         'Accept',
-        'X-Requested-With'
+        'X-Requested-With',
+        'Idempotency-Key'
         # Remove these as they're automatically handled:
         # 'Access-Control-Request-Method',
         # 'Access-Control-Request-Headers'
@@ -59,40 +89,185 @@ CORS(
 
 jwt = JWTManager(app)
 
+# Request latency and per-stage metrics, merged across workers when METRICS_DIR is set
+metrics.configure(app.config['METRICS_DIR'], app.config['METRICS_FLUSH_INTERVAL'])
+
+# On-demand sampling profiler; costs one attribute read per request while idle
+profiler = SamplingProfiler(
+    app.config['PROFILE_DIR'],
+    max_duration=app.config['PROFILE_MAX_DURATION'],
+    max_requests=app.config['PROFILE_MAX_REQUESTS']
+)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if profiler.active:
+        profiler.enter_request()
+
+@app.before_request
+def enforce_rate_limits():
+    if rate_limiter is None or request.endpoint not in rate_limiter.limits or request.method == 'OPTIONS':
+        return None
+    caller = None
+    try:
+        if verify_jwt_in_request(optional=True):
+            caller = f"user:{get_jwt_identity()}"
+    except Exception:
+        pass  # invalid tokens are rejected by the view; limit them by IP meanwhile
+    if caller is None:
+        forwarded = app.config['RATE_LIMIT_TRUST_FORWARDED'] and request.access_route
+        caller = f"ip:{forwarded[0] if forwarded else request.remote_addr}"
+
+    allowed, limit, remaining, retry_after = rate_limiter.check(request.endpoint, caller)
+    g.rate_limit = (limit, remaining)
+    if allowed:
+        return None
+    metrics.inc("churn_rate_limited_total", endpoint=request.endpoint)
+    response = jsonify(format_response(False, error="Rate limit exceeded, please retry later"))
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+@app.after_request
+def add_rate_limit_headers(response):
+    rate_limit = g.get('rate_limit')
+    if rate_limit is not None:
+        response.headers['X-RateLimit-Limit'] = str(rate_limit[0])
+        response.headers['X-RateLimit-Remaining'] = str(rate_limit[1])
+    return response
+
+@app.teardown_request
+def finish_request_profile(error=None):
+    if profiler.active:
+        profiler.exit_request()
+
+@app.after_request
+def compress_large_responses(response):
+    if app.config['COMPRESS_ENABLED']:
+        with metrics.stage("compress"):
+            compress_response(
+                response,
+                request.accept_encodings,
+                min_size=app.config['COMPRESS_MIN_SIZE'],
+                gzip_level=app.config['COMPRESS_LEVEL']
+            )
+    return response
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.endpoint or "unknown"
+        metrics.observe("churn_request_duration_seconds", time.perf_counter() - started, endpoint=endpoint)
+        metrics.inc("churn_requests_total", endpoint=endpoint, method=request.method, status=response.status_code)
+    return response
+
 # Fix: Enhanced logging configuration
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Request threads only enqueue records; a listener thread formats and writes them
+configure_logging(
+    level=app.config['LOG_LEVEL'],
+    json_format=app.config['LOG_FORMAT'] == 'json',
+    queue_size=app.config['LOG_QUEUE_SIZE'],
+    sample_rate=app.config['LOG_SAMPLE_RATE']
 )
 logger = logging.getLogger(__name__)
 
-# Fix: Improved MongoDB connection with error handling
-def connect_mongodb():
-    try:
-        mongo_uri = os.getenv('MONGO_URI')
-        if not mongo_uri:
-            logger.warning("MONGO_URI not found in environment variables")
-            return None, None, None
-            
-        client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
-        # Test connection
-        client.admin.command('ping')
-        
-        db = client.churn_prediction
-        predictions_collection = db.predictions
-        users_collection = db.users
-        
-        logger.info("✅ Connected to MongoDB successfully")
-        return client, predictions_collection, users_collection
-        
-    except Exception as e:
-        logger.error(f"❌ Failed to connect to MongoDB: {e}")
-        return None, None, None
+# MongoDB: the client is built lazily in each worker; collections are lazy handles
+# (None when MONGO_URI is unset) that fail fast while the database is down
+mongo = MongoConnectionManager(
+    os.getenv('MONGO_URI'),
+    db_name=app.config['MONGO_DB_NAME'],
+    retry_interval=app.config['MONGO_RETRY_INTERVAL'],
+    **client_options(app.config)
+)
+predictions_collection = mongo.collection("predictions")
+users_collection = mongo.collection("users")
+notifications_collection = mongo.collection("notification_settings")
+rollup_store = RollupStore(mongo.collection("prediction_rollups")) if mongo.configured else None
+
+def decode_prediction(document):
+    """Stored prediction in the original document shape, whichever schema it was written with"""
+    return prediction_codec.decode(document) if prediction_codec is not None else document
+
+# Old predictions live in date/user-partitioned Parquet files, read only when requested
+prediction_archive = PredictionArchive(
+    app.config['ARCHIVE_DIR'],
+    row_group_size=app.config['ARCHIVE_ROW_GROUP_SIZE'],
+    chunk_size=app.config['HISTORY_DELETE_CHUNK_SIZE'],
+    decode=decode_prediction
+)
+
+def archived_records(user_id=None):
+    return prediction_archive.records(user_id) if prediction_archive.available else ()
+
+# Latest prediction per customer, indexed by probability, for the top-risk list
+risk_index = TopRiskIndex(
+    mongo.collection("customer_risk"),
+    decode=decode_prediction,
+    cache_size=app.config['TOP_RISK_MAX_K'],
+    cache_ttl=app.config['TOP_RISK_CACHE_TTL']
+) if mongo.configured else None
+
+def finish_history_deletion(user_id):
+    """Bring archives, rollups and the top-risk index in line with the deletion; every
+    step runs even if an earlier one fails"""
+    steps = [
+        ("rollups", lambda: rollup_store.rebuild(predictions_collection, user_id)),
+        ("top-risk index", lambda: risk_index.backfill(predictions_collection, user_id)),
+    ]
+    if prediction_archive.available:
+        steps.insert(0, ("archive", lambda: prediction_archive.remove(user_id)))
+    failures = []
+    for name, step in steps:
+        try:
+            step()
+        except Exception as e:
+            logger.error(f"History deletion cleanup of {name} failed: {e}")
+            failures.append(f"{name}: {e}")
+    if failures:
+        raise RuntimeError("; ".join(failures))
+
+# History deletion runs in the background in bounded _id chunks; archived files and
+# rollups for the same scope are cleaned up afterwards
+deletion_jobs = HistoryDeletionJobs(
+    predictions_collection,
+    mongo.collection("deletion_jobs"),
+    chunk_size=app.config['HISTORY_DELETE_CHUNK_SIZE'],
+    pause=app.config['HISTORY_DELETE_PAUSE'],
+    on_finished=finish_history_deletion
+) if mongo.configured else None
+if not mongo.configured:
+    logger.warning("MONGO_URI not found in environment variables")
+
+# Per-worker user lookup: one users read per user per USER_CACHE_TTL, which also
+# bounds how long a role change or token revocation takes to apply
+user_resolver = UserResolver(
+    users_collection,
+    maxsize=app.config['USER_CACHE_MAXSIZE'],
+    ttl=app.config['USER_CACHE_TTL']
+)
+
+# Password hashing runs in a per-worker process pool, off the request threads
+password_hasher = PasswordHasher(
+    method=app.config['PASSWORD_HASH_METHOD'],
+    workers=app.config['PASSWORD_HASH_WORKERS']
+)
 
-# Initialize MongoDB connection
-client, predictions_collection, users_collection = connect_mongodb()
-db = client.churn_prediction if client else None
-notifications_collection = db["notification_settings"]
+# Model inference runs behind a per-worker concurrency limit with a short priority queue
+inference_admission = AdmissionController(
+    max_concurrent=app.config['INFERENCE_MAX_CONCURRENT'],
+    max_queue=app.config['INFERENCE_MAX_QUEUE'],
+    timeout=app.config['INFERENCE_QUEUE_TIMEOUT']
+)
+
+# Per-caller token buckets for the expensive and abuse-prone endpoints, shared by the
+# workers on this host through a memory-mapped file
+rate_limiter = RateLimiter(
+    FileBuckets(app.config['RATE_LIMIT_FILE'], slots=app.config['RATE_LIMIT_SLOTS'])
+    if app.config['RATE_LIMIT_STORAGE'] == 'file' else MemoryBuckets(),
+    {endpoint: parse_limit(spec) for endpoint, spec in app.config['RATE_LIMITS'].items()}
+) if app.config['RATE_LIMIT_ENABLED'] else None
 
 # Fix: Better base directory handling for different deployment environments
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -102,13 +277,23 @@ MODELS_DIR = os.path.join(BASE_DIR, 'models')
 model = None
 encoder = None
 scaler = None
+model_version = None
+model_file = None
+
+def file_fingerprint(path):
+    """Short content hash identifying a model artifact"""
+    digest = hashlib.blake2b(digest_size=6)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
 
 def load_models():
     """
     Load ML model, encoder, and optional scaler from disk.
     Enhanced error handling and path resolution for different environments.
     """
-    global model, encoder, scaler
+    global model, encoder, scaler, model_version, model_file
 
     try:
         # Fix: Multiple path resolution strategies for different deployment environments
@@ -139,7 +324,9 @@ def load_models():
             if os.path.exists(model_path):
                 with open(model_path, 'rb') as f:
                     model = pickle.load(f)
-                logger.info(f"✅ Model loaded successfully from {model_path}")
+                model_version = os.getenv('MODEL_VERSION') or file_fingerprint(model_path)
+                model_file = model_path
+                logger.info(f"✅ Model loaded successfully from {model_path} (version {model_version})")
                 model_loaded = True
                 break
         
@@ -188,6 +375,37 @@ except Exception as e:
     logger.error(f"❌ Failed to load ML models: {e}")
     model = encoder = scaler = None
 
+# Per-tenant bundles under TENANT_MODELS_DIR/<tenant>/, loaded on first use; everyone else gets the default
+default_models = ModelBundle(None, model, encoder, scaler, model_version) if model is not None and encoder is not None else None
+tenant_models = TenantModels(
+    app.config['TENANT_MODELS_DIR'],
+    default=default_models,
+    max_bytes=app.config['TENANT_MODELS_MAX_MB'] * 2 ** 20,
+    idle_seconds=app.config['TENANT_MODELS_IDLE_SECONDS'],
+    retry_seconds=app.config['TENANT_MODELS_RETRY_SECONDS'],
+    loader=lambda tenant, directory: load_bundle(tenant, directory, file_fingerprint)
+)
+
+# Live feed: new predictions are pushed to the same user's open /api/stream connections on this worker
+prediction_events = EventBroker(
+    max_streams=app.config['STREAM_MAX_PER_WORKER'],
+    buffer_size=app.config['STREAM_BUFFER_SIZE']
+)
+
+# Responses recorded per Idempotency-Key so client retries replay instead of re-running the model
+idempotency = IdempotencyStore(
+    mongo.collection("idempotency_keys") if mongo.configured else None,
+    ttl=app.config['IDEMPOTENCY_TTL_SECONDS'],
+    lease=app.config['IDEMPOTENCY_LEASE_SECONDS'],
+    cache_bytes=app.config['IDEMPOTENCY_CACHE_MB'] * 2 ** 20,
+    max_local_body=app.config['IDEMPOTENCY_CACHE_MAX_BODY_KB'] * 2 ** 10
+)
+
+def request_models():
+    """Model bundle for the calling user's tenant; None when no models are loaded"""
+    user = user_resolver.resolve(get_jwt_identity(), get_jwt())
+    return tenant_models.get(user.get("tenant") if user else None)
+
 DEFAULT_SETTINGS = {
     "emailEnabled": True,
     "smsEnabled": False,
@@ -197,15 +415,20 @@ DEFAULT_SETTINGS = {
     "phoneNumber": None
 }
 
+# Per-worker settings cache; PUT writes through, other workers converge within the TTL
+settings_cache = NotificationSettingsCache(
+    notifications_collection,
+    DEFAULT_SETTINGS,
+    maxsize=app.config['SETTINGS_CACHE_MAXSIZE'],
+    ttl=app.config['SETTINGS_CACHE_TTL']
+)
+
 @app.route("/api/notifications/<user_id>", methods=["GET", "PUT"])
 def notification_settings(user_id):
     try:
         # Handle GET
         if request.method == "GET":
-            settings = notifications_collection.find_one({"user_id": user_id}, {"_id": 0})
-            if not settings:
-                settings = DEFAULT_SETTINGS.copy()
-                notifications_collection.insert_one({"user_id": user_id, **settings})
+            settings = settings_cache.get(user_id)
             return jsonify({"success": True, "data": settings})
 
         # Handle PUT
@@ -223,11 +446,7 @@ def notification_settings(user_id):
                 "phoneNumber": data.get("phoneNumber", DEFAULT_SETTINGS["phoneNumber"]),
             }
 
-            notifications_collection.update_one(
-                {"user_id": user_id},
-                {"$set": updated_settings},
-                upsert=True
-            )
+            settings_cache.put(user_id, updated_settings)
 
             # Optional: call notification service if exists
             try:
@@ -280,7 +499,7 @@ You've successfully created your account. Start exploring churn predictions, ana
         msg.attach(MIMEText(body, 'plain'))
 
         # Send email with timeout
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
+        with metrics.stage("smtp_send"), smtplib.SMTP(smtp_server, smtp_port) as server:
             server.starttls()
             server.login(smtp_username, smtp_password)
             server.send_message(msg)
@@ -312,7 +531,7 @@ def init_admin_user():
             
             admin_user = {
                 "email": "admin@churnpredict.com",
-                "password": generate_password_hash("admin123"),
+                "password": password_hasher.hash("admin123"),
                 "name": "Admin User",
                 "role": "admin",
                 "created_at": datetime.utcnow()
@@ -349,10 +568,116 @@ def format_response(success=True, data=None, message=None, error=None):
         response["error"] = error
     return response
 
+def prediction_change_marker(user_id):
+    """Cheap (count, newest id) marker that changes whenever a user's predictions do"""
+    with metrics.stage("mongo_count"):
+        count = predictions_collection.count_documents({"userId": user_id})
+    with metrics.stage("mongo_find"):
+        latest = predictions_collection.find_one({"userId": user_id}, {"_id": 1}, sort=[("timestamp", -1)])
+    return count, (latest["_id"] if latest else None)
+
+def not_modified(etag):
+    response = app.response_class(status=304)
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def with_etag(response, etag):
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def parse_utc(value):
+    """ISO date or datetime as a naive UTC datetime, like the stored timestamps; raises ValueError"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def date_range_args():
+    """Optional ?from= (inclusive) and ?to= (exclusive) ISO dates; raises ValueError"""
+    start, end = request.args.get('from'), request.args.get('to')
+    return (parse_utc(start) if start else None,
+            parse_utc(end) if end else None)
+
+def history_query(user_id, start=None, end=None):
+    query = {"userId": user_id}
+    if start or end:
+        query["timestamp"] = {}
+        if start:
+            query["timestamp"]["$gte"] = start
+        if end:
+            query["timestamp"]["$lt"] = end
+    return query
+
+def format_history_record(pred):
+    """API shape of a stored (either schema) or archived prediction"""
+    pred = decode_prediction(pred)
+    return {
+        "id": str(pred["_id"]) if "_id" in pred else pred["id"],
+        "timestamp": pred["timestamp"].isoformat() if isinstance(pred["timestamp"], datetime) else pred["timestamp"],
+        "customerData": pred["customerData"],
+        "prediction": pred["prediction"],
+        "probability": pred["probability"],
+        "riskLevel": pred.get("riskLevel", "Unknown"),
+        "shapValues": pred.get("shapValues", [])
+    }
+
+def format_deletion_job(job):
+    return {
+        "jobId": job["_id"],
+        "status": job["status"],
+        "userId": job.get("userId"),
+        "deletedCount": job.get("deleted", 0),
+        "chunks": job.get("chunks", 0),
+        "createdAt": job["createdAt"].isoformat(),
+        "updatedAt": job["updatedAt"].isoformat(),
+        "finishedAt": job["finishedAt"].isoformat() if job.get("finishedAt") else None,
+        "error": job.get("error"),
+        "cleanup": job.get("cleanup"),
+        "cleanupError": job.get("cleanupError")
+    }
+
+def ensure_indexes():
+    """Create the indexes the hot query paths rely on"""
+    if predictions_collection is None:
+        return
+    predictions_collection.create_index([("userId", 1), ("timestamp", -1)])
+    rollup_store.ensure_indexes()
+
+    # Retention: predictions expire via a TTL index; rollups are kept a week longer
+    # so the oldest week bucket is not dropped while it still has predictions
+    retention = app.config['PREDICTION_RETENTION_DAYS'] * 86400
+    ensure_ttl_index(predictions_collection, "timestamp", retention, "prediction_retention")
+    ensure_ttl_index(rollup_store.collection, "start", retention and retention + 7 * 86400, "rollup_retention")
+    risk_index.ensure_indexes()
+    ensure_ttl_index(risk_index.collection, "timestamp", retention, "risk_retention")
+    ensure_ttl_index(idempotency.collection, "createdAt", app.config['IDEMPOTENCY_TTL_SECONDS'], "idempotency_ttl")
+
+def save_predictions(documents):
+    """Insert prediction documents and fold them into the trend rollups"""
+    with metrics.stage("mongo_insert"):
+        if len(documents) == 1:
+            predictions_collection.insert_one(documents[0])
+        else:
+            predictions_collection.insert_many(documents, ordered=False)
+    # Rollup drift is repairable with `flask rollups-backfill`; never fail the insert for it
+    try:
+        with metrics.stage("rollup_update"):
+            rollup_store.record(documents)
+    except Exception as e:
+        logger.error(f"Failed to update rollups: {e}")
+    # Likewise for the top-risk index (`flask risk-index-backfill`)
+    try:
+        with metrics.stage("risk_index_update"):
+            risk_index.record(documents)
+    except Exception as e:
+        logger.error(f"Failed to update top-risk index: {e}")
+
 def calculate_shap_values(customer_data):
     """Calculate mock SHAP values for feature importance with comprehensive error handling"""
     try:
-        logger.debug(f"🔍 SHAP function called with data type: {type(customer_data)}")
+        logger.debug("🔍 SHAP function called with data type: %s", type(customer_data))
         
         # Handle different input types (dict, pandas DataFrame, etc.)
         if customer_data is None:
@@ -410,7 +735,7 @@ def calculate_shap_values(customer_data):
         payment_method = safe_extract_value(customer_data, 'paymentMethod', '', 'str')
         online_security = safe_extract_value(customer_data, 'onlineSecurity', '', 'str')
         
-        logger.debug(f"🔍 Extracted values - charges: {monthly_charges}, tenure: {tenure}, contract: {contract}")
+        logger.debug("🔍 Extracted values - charges: %s, tenure: %s, contract: %s", monthly_charges, tenure, contract)
         
         # Build features with safe comparisons
         features = []
@@ -507,12 +832,208 @@ def calculate_shap_values(customer_data):
         ]
 
 
+# Inference pipeline stages, shared by the prediction routes and benchmarks/
+
+# Model features, in the order the model was trained on
+EXPECTED_COLUMNS = [
+    'Contract',
+    'Monthly Charge',
+    'Number of Referrals',
+    'Dependents',
+    'Avg Monthly GB Download',
+    'Tenure in Months',
+    'Payment Method',
+    'Online Backup',
+    'Online Security',
+    'Premium Tech Support'
+]
+
+REQUIRED_FIELDS = ['contract', 'monthlyCharges', 'numReferrals', 'dependents',
+                   'totalCharges', 'tenure', 'paymentMethod', 'onlineBackup',
+                   'onlineSecurity', 'techSupport']
+
+# Map input fields to model feature names
+COLUMN_MAPPING = {
+    'contract': 'Contract',
+    'monthlyCharges': 'Monthly Charge',
+    'numReferrals': 'Number of Referrals',
+    'dependents': 'Dependents',
+    'totalCharges': 'Avg Monthly GB Download',
+    'tenure': 'Tenure in Months',
+    'paymentMethod': 'Payment Method',
+    'onlineBackup': 'Online Backup',
+    'onlineSecurity': 'Online Security',
+    'techSupport': 'Premium Tech Support'
+}
+
+# String-valued inputs; the compact schema stores these as dictionary codes
+CATEGORICAL_FIELDS = ['contract', 'dependents', 'paymentMethod', 'onlineBackup',
+                      'onlineSecurity', 'techSupport']
+NUMERIC_FIELDS = [field for field in REQUIRED_FIELDS if field not in CATEGORICAL_FIELDS]
+
+# Compact (v2) prediction documents: customer data and SHAP values packed as float32
+# binary, strings replaced by codes from a dictionary shared by all workers
+prediction_codec = CompactPredictionCodec(
+    FeatureDictionary(
+        mongo.collection("feature_dictionary"),
+        max_values=app.config['DICTIONARY_MAX_VALUES'],
+        max_length=app.config['DICTIONARY_MAX_VALUE_LENGTH']
+    ),
+    fields=REQUIRED_FIELDS,
+    categorical=CATEGORICAL_FIELDS,
+    grouped=analytics.GROUPABLE_FIELDS
+) if mongo.configured else None
+
+def find_missing_fields(data):
+    """Return the required input fields absent from a request payload"""
+    return [field for field in REQUIRED_FIELDS if field not in data]
+
+def map_customer_columns(data):
+    """Rename API input fields to model feature names, dropping unknown keys"""
+    return {COLUMN_MAPPING[k]: v for k, v in data.items() if k in COLUMN_MAPPING}
+
+def build_feature_frame(rows, bundle=None):
+    """Build the model input DataFrame from mapped rows and encode categorical columns"""
+    return encode_feature_frame(pd.DataFrame(rows), bundle)
+
+def encode_feature_frame(customer_data, bundle=None):
+    """Order a frame of model-named columns for the model and encode categorical columns"""
+    encoder = (bundle or default_models).encoder
+    customer_data = customer_data.reindex(columns=EXPECTED_COLUMNS)
+
+    for col in customer_data.columns:
+        if customer_data[col].dtype == object:
+            try:
+                customer_data[col] = encoder.transform(customer_data[col])
+            except Exception as e:
+                logger.warning("Encoding warning for column %s: %s", col, e, extra={"sampled": True})
+                customer_data[col] = 0  # Handle unknowns
+
+    return customer_data
+
+def scale_features(customer_data, bundle=None):
+    """Scale numeric columns in place if a scaler is loaded"""
+    scaler = (bundle or default_models).scaler
+    if scaler:
+        try:
+            numeric_cols = customer_data.select_dtypes(include=[np.number]).columns
+            customer_data[numeric_cols] = scaler.transform(customer_data[numeric_cols])
+        except Exception as e:
+            logger.warning("Scaling warning: %s", e, extra={"sampled": True})
+    return customer_data
+
+# Optional inference processes for the default model; rows travel through shared memory
+inference_pool = InferencePool(
+    model_file,
+    EXPECTED_COLUMNS,
+    processes=app.config['INFERENCE_SERVER_PROCESSES'],
+    slot_rows=app.config['INFERENCE_SERVER_SLOT_ROWS'],
+    timeout=app.config['INFERENCE_SERVER_TIMEOUT']
+) if app.config['INFERENCE_SERVER_ENABLED'] and default_models is not None else None
+
+def predict_probabilities(bundle, frame):
+    """Churn probability per row of a prepared frame, from the inference processes when enabled"""
+    if inference_pool is not None and bundle is default_models:
+        try:
+            return inference_pool.predict(frame)
+        except InferenceUnavailable as e:
+            logger.warning(f"Inference pool unavailable, predicting in-thread: {e}")
+    return bundle.model.predict_proba(frame)[:, 1]
+
+def prediction_record_for(data, probability, user_id):
+    """API record for one scored customer"""
+    return {
+        "id": str(ObjectId()),
+        "timestamp": datetime.utcnow().isoformat(),
+        "customerData": data,
+        "prediction": "Churn" if probability > 0.5 else "No Churn",
+        "probability": probability,
+        "riskLevel": risk_level_for(probability),
+        "shapValues": calculate_shap_values(data),
+        "userId": user_id
+    }
+
+def stored_prediction(record):
+    """Database document for an API record, in the configured storage schema"""
+    document = {**record, "_id": ObjectId(record["id"]), "timestamp": datetime.utcnow()}
+    if app.config['STORAGE_SCHEMA_VERSION'] >= 2:
+        with metrics.stage("storage_encode"):
+            document = prediction_codec.encode(document)
+    return document
+
+def inference_timeout():
+    """Optional X-Request-Timeout header (seconds) shortening the admission deadline;
+    anything but a finite positive number is ignored"""
+    try:
+        timeout = float(request.headers.get('X-Request-Timeout', ''))
+    except ValueError:
+        return None
+    return timeout if math.isfinite(timeout) and timeout > 0 else None
+
+def idempotent(view):
+    """Honour an Idempotency-Key header: the first successful response is replayed for retries.
+
+    Keys are scoped to the endpoint and JWT identity and bound to the request body.
+    Only 2xx responses are recorded, so a failed or shed request can be retried.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is None:
+            return view(*args, **kwargs)
+        if not 0 < len(key) <= 255:
+            return jsonify(format_response(False, error="Idempotency-Key must be 1-255 characters")), 400
+
+        fingerprint = hashlib.blake2b(request.get_data(), digest_size=16).hexdigest()
+        try:
+            with metrics.stage("idempotency"):
+                stored, claim = idempotency.begin(
+                    request.endpoint, get_jwt_identity(), key, fingerprint, app.config['IDEMPOTENCY_WAIT_SECONDS']
+                )
+        except IdempotencyConflict as e:
+            if e.status == 422:
+                return jsonify(format_response(False, error="Idempotency-Key was already used with a different request")), 422
+            response = jsonify(format_response(False, error="A request with this Idempotency-Key is still in progress"))
+            response.headers['Retry-After'] = '1'
+            return response, 409
+        except Exception as e:
+            logger.error(f"Idempotency check failed, processing without it: {e}")
+            return view(*args, **kwargs)
+
+        if stored is not None:
+            response = app.response_class(stored.body, status=stored.status, mimetype=stored.mimetype)
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        except BaseException:
+            idempotency.abandon(claim)
+            raise
+        if 200 <= response.status_code < 300:
+            idempotency.complete(claim, response.status_code, response.get_data(), response.mimetype)
+        else:
+            idempotency.abandon(claim)
+        return response
+    return wrapper
+
+def risk_level_for(probability):
+    if probability >= 0.8:
+        return "Very High"
+    elif probability >= 0.6:
+        return "High"
+    elif probability >= 0.4:
+        return "Medium"
+    return "Low"
+
+
 # Routes with enhanced error handling
 
 @app.route('/api/auth/register', methods=['POST'])
 def register():
     try:
-        data = request.get_json()
+        with metrics.stage("parse"):
+            data = request.get_json()
         if not data:
             return jsonify(format_response(False, error="No data provided")), 400
 
@@ -534,19 +1055,24 @@ def register():
             return jsonify(format_response(False, error="Database connection failed")), 500
 
         # Check if user already exists
-        if users_collection.find_one({"email": email}):
+        with metrics.stage("mongo_find"):
+            existing_user = users_collection.find_one({"email": email})
+        if existing_user:
             return jsonify(format_response(False, error="Email already registered")), 400
 
         # Create new user
+        with metrics.stage("password_hash"):
+            password_hash = password_hasher.hash(password)
         new_user = {
             "name": name,
             "email": email,
-            "password": generate_password_hash(password),
+            "password": password_hash,
             "role": "user",
             "created_at": datetime.utcnow()
         }
 
-        result = users_collection.insert_one(new_user)
+        with metrics.stage("mongo_insert"):
+            result = users_collection.insert_one(new_user)
         user_id = result.inserted_id
 
         # Send welcome email (non-blocking)
@@ -555,8 +1081,6 @@ def register():
         except Exception as email_err:
             logger.warning(f"Welcome email failed: {email_err}")
 
-        access_token = create_access_token(identity=str(user_id))
-
         user_data = {
             "id": str(user_id),
             "name": name,
@@ -564,6 +1088,8 @@ def register():
             "role": "user"
         }
 
+        access_token = create_access_token(identity=str(user_id), additional_claims=user_resolver.claims_for(user_data))
+
         return jsonify(format_response(True, {"token": access_token, "user": user_data}, "Registration successful")), 201
 
     except Exception as e:
@@ -573,7 +1099,8 @@ def register():
 @app.route('/api/auth/login', methods=['POST'])
 def login():
     try:
-        data = request.get_json()
+        with metrics.stage("parse"):
+            data = request.get_json()
         if not data:
             return jsonify(format_response(False, error="No data provided")), 400
 
@@ -586,21 +1113,31 @@ def login():
         if users_collection is None:
             return jsonify(format_response(False, error="Database connection failed")), 500
 
-        user = users_collection.find_one({"email": email})
+        with metrics.stage("mongo_find"):
+            user = users_collection.find_one({"email": email})
 
-        if user and check_password_hash(user['password'], password):
-            access_token = create_access_token(identity=str(user['_id']))
-            user_data = {
-                "id": str(user['_id']),
-                "email": user['email'],
-                "name": user['name'],
-                "role": user['role']
-            }
+        with metrics.stage("password_verify"):
+            password_ok = bool(user) and password_hasher.verify(user['password'], password)
+
+        if password_ok:
+            # Transparently upgrade hashes created with older method/cost settings
+            if password_hasher.needs_rehash(user['password']):
+                try:
+                    users_collection.update_one(
+                        {"_id": user['_id']},
+                        {"$set": {"password": password_hasher.hash(password)}}
+                    )
+                    logger.info("🔐 Password hash upgraded for %s", email)
+                except Exception as rehash_error:
+                    logger.warning("Password rehash failed for %s: %s", email, rehash_error)
+
+            access_token = create_access_token(identity=str(user['_id']), additional_claims=user_resolver.claims_for(user))
+            user_data = user_resolver.to_user_data(user['_id'], user)
             
-            logger.info(f"✅ User logged in: {email}")
+            logger.info("✅ User logged in: %s", email)
             return jsonify(format_response(True, {"token": access_token, "user": user_data}, "Login successful"))
         else:
-            logger.warning(f"⚠️ Failed login attempt: {email}")
+            logger.warning("⚠️ Failed login attempt: %s", email)
             return jsonify(format_response(False, error="Invalid credentials")), 401
 
     except Exception as e:
@@ -612,19 +1149,12 @@ def login():
 def verify_token():
     try:
         user_id = get_jwt_identity()
-        if users_collection is None:
-            return jsonify(format_response(False, error="Database connection failed")), 500
+        user_data = user_resolver.resolve(user_id, get_jwt())
 
-        user = users_collection.find_one({"_id": ObjectId(user_id)})
-
-        if user:
-            user_data = {
-                "id": str(user['_id']),
-                "email": user['email'],
-                "name": user['name'],
-                "role": user['role']
-            }
+        if user_data:
             return jsonify(format_response(True, user_data, "Token verified"))
+        elif users_collection is None:
+            return jsonify(format_response(False, error="Database connection failed")), 500
         else:
             return jsonify(format_response(False, error="User not found")), 404
 
@@ -634,125 +1164,159 @@ def verify_token():
 
 @app.route('/api/predict', methods=['POST'])
 @jwt_required()
+@idempotent
 def predict():
     try:
-        if model is None or encoder is None:
+        bundle = request_models()
+        if bundle is None:
             return jsonify(format_response(False, error="ML models not loaded. Please contact administrator.")), 500
 
-        data = request.get_json()
+        with metrics.stage("parse"):
+            data = request.get_json()
         if not data:
             return jsonify(format_response(False, error="No data provided")), 400
 
         user_id = get_jwt_identity()
 
-        # Define the expected model features
-        expected_columns = [
-            'Contract',
-            'Monthly Charge',
-            'Number of Referrals',
-            'Dependents',
-            'Avg Monthly GB Download',
-            'Tenure in Months',
-            'Payment Method',
-            'Online Backup',
-            'Online Security',
-            'Premium Tech Support'
-        ]
-
         # Required input validation
-        required_fields = ['contract', 'monthlyCharges', 'numReferrals', 'dependents',
-                          'totalCharges', 'tenure', 'paymentMethod', 'onlineBackup',
-                          'onlineSecurity', 'techSupport']
-        
-        missing_fields = [field for field in required_fields if field not in data]
+        missing_fields = find_missing_fields(data)
         if missing_fields:
             return jsonify(format_response(False, error=f"Missing required fields: {', '.join(missing_fields)}")), 400
 
-        # Map input fields to model feature names
-        column_mapping = {
-            'contract': 'Contract',
-            'monthlyCharges': 'Monthly Charge',
-            'numReferrals': 'Number of Referrals',
-            'dependents': 'Dependents',
-            'totalCharges': 'Avg Monthly GB Download',
-            'tenure': 'Tenure in Months',
-            'paymentMethod': 'Payment Method',
-            'onlineBackup': 'Online Backup',
-            'onlineSecurity': 'Online Security',
-            'techSupport': 'Premium Tech Support'
-        }
-
-        renamed_data = {column_mapping[k]: v for k, v in data.items() if k in column_mapping}
+        # Build, encode and scale the model input, then predict (admission-controlled)
+        with inference_admission.admit(INTERACTIVE, inference_timeout()):
+            with metrics.stage("encode"):
+                customer_data = scale_features(build_feature_frame([map_customer_columns(data)], bundle), bundle)
+            with metrics.stage("predict_proba"):
+                probability = float(predict_probabilities(bundle, customer_data)[0])
 
-        # Convert to DataFrame
-        customer_data = pd.DataFrame([renamed_data])
-        customer_data = customer_data.reindex(columns=expected_columns)
-
-        # Encode categorical columns
-        for col in customer_data.columns:
-            if customer_data[col].dtype == object:
-                try:
-                    customer_data[col] = encoder.transform(customer_data[col])
-                except Exception as e:
-                    logger.warning(f"Encoding warning for column {col}: {e}")
-                    customer_data[col] = 0  # Handle unknowns
-
-        # Scale numeric columns if scaler exists
-        if scaler:
-            try:
-                numeric_cols = customer_data.select_dtypes(include=[np.number]).columns
-                customer_data[numeric_cols] = scaler.transform(customer_data[numeric_cols])
-            except Exception as e:
-                logger.warning(f"Scaling warning: {e}")
-
-        # Make prediction
-        prediction_proba = model.predict_proba(customer_data)[0]
-        prediction_label = "Churn" if prediction_proba[1] > 0.5 else "No Churn"
-        probability = float(prediction_proba[1])
-
-        # Calculate risk level
-        if probability >= 0.8:
-            risk_level = "Very High"
-        elif probability >= 0.6:
-            risk_level = "High"
-        elif probability >= 0.4:
-            risk_level = "Medium"
-        else:
-            risk_level = "Low"
-
-        # SHAP values
-        shap_values = calculate_shap_values(data)
-
-        # Create prediction record
-        prediction_record = {
-            "id": str(ObjectId()),
-            "timestamp": datetime.utcnow().isoformat(),
-            "customerData": data,
-            "prediction": prediction_label,
-            "probability": probability,
-            "riskLevel": risk_level,
-            "shapValues": shap_values,
-            "userId": user_id
-        }
+        # SHAP values and prediction record
+        with metrics.stage("shap"):
+            prediction_record = prediction_record_for(data, probability, user_id)
 
         # Save to database
         if predictions_collection is not None:
             try:
-                predictions_collection.insert_one({
-                    **prediction_record,
-                    "_id": ObjectId(prediction_record["id"]),
-                    "timestamp": datetime.utcnow()
-                })
-                logger.info(f"✅ Prediction saved for user {user_id}")
+                save_predictions([stored_prediction(prediction_record)])
+                prediction_events.publish(user_id, "predictions", {"predictions": [prediction_record]})
+                logger.info("✅ Prediction saved for user %s", user_id, extra={"sampled": True})
             except Exception as e:
                 logger.error(f"Failed to save prediction: {e}")
 
         return jsonify(format_response(True, prediction_record, "Prediction completed successfully"))
 
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error(f"Prediction error: {e}")
         return jsonify(format_response(False, error="Prediction failed. Please try again.")), 500
 
+@app.route('/api/predict/batch', methods=['POST'])
+@jwt_required()
+@idempotent
+def predict_batch():
+    """Score {"customers": [...]} in one model call; queued behind interactive predictions"""
+    try:
+        bundle = request_models()
+        if bundle is None:
+            return jsonify(format_response(False, error="ML models not loaded. Please contact administrator.")), 500
+
+        with metrics.stage("parse"):
+            data = request.get_json(silent=True) or {}
+        customers = data.get("customers")
+        if not isinstance(customers, list) or not customers:
+            return jsonify(format_response(False, error="customers must be a non-empty list")), 400
+        max_size = app.config['PREDICT_BATCH_MAX_SIZE']
+        if len(customers) > max_size:
+            return jsonify(format_response(False, error=f"At most {max_size} customers per batch")), 400
+
+        for index, customer in enumerate(customers):
+            if not isinstance(customer, dict):
+                return jsonify(format_response(False, error=f"customers[{index}] must be an object")), 400
+            missing_fields = find_missing_fields(customer)
+            if missing_fields:
+                return jsonify(format_response(
+                    False, error=f"customers[{index}]: missing required fields: {', '.join(missing_fields)}"
+                )), 400
+
+        user_id = get_jwt_identity()
+        with inference_admission.admit(BATCH, inference_timeout()):
+            with metrics.stage("encode"):
+                frame = scale_features(build_feature_frame([map_customer_columns(c) for c in customers], bundle), bundle)
+            with metrics.stage("predict_proba"):
+                probabilities = predict_probabilities(bundle, frame)
+
+        with metrics.stage("shap"):
+            records = [prediction_record_for(c, float(p), user_id) for c, p in zip(customers, probabilities)]
+
+        if predictions_collection is not None:
+            try:
+                save_predictions([stored_prediction(record) for record in records])
+                prediction_events.publish(user_id, "predictions", {"predictions": records})
+                logger.info(f"✅ {len(records)} batch predictions saved for user {user_id}")
+            except Exception as e:
+                logger.error(f"Failed to save batch predictions: {e}")
+
+        return jsonify(format_response(True, {"predictions": records, "count": len(records)},
+                                       "Batch prediction completed successfully"))
+
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        logger.error(f"Batch prediction error: {e}")
+        return jsonify(format_response(False, error="Batch prediction failed. Please try again.")), 500
+
+@app.route('/api/predict/what-if', methods=['POST'])
+@jwt_required()
+def predict_what_if():
+    """Probability surface over {"customer": {...}, "variations": {field: values | range}}; nothing is stored"""
+    try:
+        bundle = request_models()
+        if bundle is None:
+            return jsonify(format_response(False, error="ML models not loaded. Please contact administrator.")), 500
+
+        with metrics.stage("parse"):
+            data = request.get_json(silent=True) or {}
+        customer = data.get("customer")
+        if not isinstance(customer, dict):
+            return jsonify(format_response(False, error="customer must be an object")), 400
+        missing_fields = find_missing_fields(customer)
+        if missing_fields:
+            return jsonify(format_response(False, error=f"Missing required fields: {', '.join(missing_fields)}")), 400
+
+        try:
+            dimensions = grid_dimensions(
+                customer, data.get("variations"), REQUIRED_FIELDS, NUMERIC_FIELDS, app.config['WHAT_IF_MAX_POINTS']
+            )
+            base_row = map_customer_columns({
+                field: float(value) if field in NUMERIC_FIELDS else value for field, value in customer.items()
+            })
+        except (TypeError, ValueError) as e:
+            return jsonify(format_response(False, error=str(e) or "Numeric fields must be numbers")), 400
+
+        with inference_admission.admit(BATCH, inference_timeout()):
+            with metrics.stage("predict_proba"):
+                base_probability, probabilities, scored = score_grid(
+                    base_row,
+                    [(COLUMN_MAPPING[field], values) for field, values in dimensions],
+                    prepare=lambda frame: scale_features(encode_feature_frame(frame, bundle), bundle),
+                    predict=lambda frame: predict_probabilities(bundle, frame)
+                )
+
+        return jsonify(format_response(True, {
+            "baseProbability": base_probability,
+            "dimensions": [{"field": field, "values": values.tolist()} for field, values in dimensions],
+            "shape": [len(values) for _, values in dimensions],
+            "probabilities": np.round(probabilities.astype(float), 6).tolist(),
+            "scoredRows": scored
+        }))
+
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        logger.error(f"What-if analysis error: {e}")
+        return jsonify(format_response(False, error="What-if analysis failed. Please try again.")), 500
+
 @app.route('/api/history', methods=['GET'])
 @jwt_required()
 def get_history():
@@ -773,8 +1337,16 @@ def get_history():
         sort_order = request.args.get('sortOrder', 'desc')
         prediction_filter = request.args.get('prediction')
 
+        include_archived = request.args.get('includeArchived', 'false').lower() == 'true'
+        try:
+            start, end = date_range_args()
+        except ValueError:
+            return jsonify(format_response(False, error="from and to must be ISO dates")), 400
+        if include_archived and not prediction_archive.available:
+            return jsonify(format_response(False, error="Archived history is not available on this server")), 400
+
         # Build query
-        query = {"userId": user_id}
+        query = history_query(user_id, start, end)
         if prediction_filter and prediction_filter != 'All':
             query["prediction"] = prediction_filter
 
@@ -782,155 +1354,549 @@ def get_history():
         sort_direction = -1 if sort_order == 'desc' else 1
         sort_field = sort_by if sort_by in ['timestamp', 'probability', 'prediction'] else 'timestamp'
 
+        # Short-circuit unchanged pages before running the full query
+        marker_count, marker_latest = prediction_change_marker(user_id)
+        etag = make_etag("history", user_id, marker_count, marker_latest,
+                         page, limit, sort_field, sort_direction, query.get("prediction"),
+                         include_archived, start, end)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
         # Get total count and predictions
-        total = predictions_collection.count_documents(query)
-        predictions = list(predictions_collection.find(query)
-                          .sort(sort_field, sort_direction)
-                          .skip((page - 1) * limit)
-                          .limit(limit))
+        if len(query) > 1:
+            with metrics.stage("mongo_count"):
+                total = predictions_collection.count_documents(query)
+        else:
+            total = marker_count
+        skip = (page - 1) * limit
+
+        if include_archived:
+            # The page lies within the first skip + limit rows of each source
+            with metrics.stage("mongo_find"):
+                live = list(predictions_collection.find(query).sort(sort_field, sort_direction).limit(skip + limit))
+            with metrics.stage("archive_read"):
+                archived, archived_total = prediction_archive.top(
+                    user_id, skip + limit, sort_field, sort_direction == -1, start, end, query.get("prediction")
+                )
+            merged = sorted(live + archived, key=lambda p: p[sort_field], reverse=sort_direction == -1)
+            predictions = merged[skip:skip + limit]
+            total += archived_total
+        else:
+            with metrics.stage("mongo_find"):
+                predictions = list(predictions_collection.find(query)
+                                  .sort(sort_field, sort_direction)
+                                  .skip(skip)
+                                  .limit(limit))
 
         # Format predictions
-        formatted_predictions = []
-        for pred in predictions:
-            formatted_pred = {
-                "id": str(pred["_id"]),
-                "timestamp": pred["timestamp"].isoformat() if isinstance(pred["timestamp"], datetime) else pred["timestamp"],
-                "customerData": pred["customerData"],
-                "prediction": pred["prediction"],
-                "probability": pred["probability"],
-                "riskLevel": pred.get("riskLevel", "Unknown"),
-                "shapValues": pred.get("shapValues", [])
-            }
-            formatted_predictions.append(formatted_pred)
+        formatted_predictions = [format_history_record(pred) for pred in predictions]
 
-        return jsonify(format_response(True, {
+        return with_etag(jsonify(format_response(True, {
             "predictions": formatted_predictions,
             "total": total,
             "page": page,
             "limit": limit,
             "totalPages": (total + limit - 1) // limit
-        }))
+        })), etag)
 
     except Exception as e:
         logger.error(f"History retrieval error: {e}")
         return jsonify(format_response(False, error="Failed to retrieve history")), 500
 
+EXPORT_COLUMNS = ['id', 'timestamp', 'prediction', 'probability', 'riskLevel'] + REQUIRED_FIELDS
+
+@app.route('/api/history/export', methods=['GET'])
+@jwt_required()
+def export_history():
+    """Stream the user's predictions as CSV, oldest first; ?includeArchived=true adds archived ones"""
+    try:
+        if predictions_collection is None:
+            return jsonify(format_response(False, error="Database connection failed")), 500
+
+        user_id = get_jwt_identity()
+        include_archived = request.args.get('includeArchived', 'false').lower() == 'true'
+        try:
+            start, end = date_range_args()
+        except ValueError:
+            return jsonify(format_response(False, error="from and to must be ISO dates")), 400
+        if include_archived and not prediction_archive.available:
+            return jsonify(format_response(False, error="Archived history is not available on this server")), 400
+        query = history_query(user_id, start, end)
+
+        def rows():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(EXPORT_COLUMNS)
+            sources = []
+            if include_archived:
+                sources.append(prediction_archive.records(user_id, start, end))
+            sources.append(predictions_collection.find(query).sort("timestamp", 1).batch_size(1000))
+            for source in sources:
+                for count, pred in enumerate(source, 1):
+                    record = format_history_record(pred)
+                    customer = record["customerData"] or {}
+                    writer.writerow([record[c] for c in EXPORT_COLUMNS[:5]] + [customer.get(f, "") for f in REQUIRED_FIELDS])
+                    if count % 500 == 0:
+                        yield buffer.getvalue()
+                        buffer.seek(0)
+                        buffer.truncate()
+            yield buffer.getvalue()
+
+        return Response(stream_with_context(rows()), mimetype='text/csv',
+                        headers={'Content-Disposition': 'attachment; filename=predictions.csv'})
+
+    except Exception as e:
+        logger.error(f"History export error: {e}")
+        return jsonify(format_response(False, error="Failed to export history")), 500
+
 @app.route('/api/dashboard/stats', methods=['GET'])
 @jwt_required()
 def get_dashboard_stats():
     try:
         if predictions_collection is None:
             # Return default stats if database not available
-            return jsonify(format_response(True, {
-                "totalPredictions": 0,
-                "churnRate": 0,
-                "avgProbability": 0,
-                "highRiskCustomers": 0,
-                "predictionAccuracy": 84.5,
-                "precision": 69.2,
-                "recall": 72.8,
-                "f1Score": 70.9,
-                "auc": 89.7
-            }))
+            return jsonify(format_response(True, dashboard_stats(None)))
 
         user_id = get_jwt_identity()
 
-        # Get all predictions for user
-        predictions = list(predictions_collection.find({"userId": user_id}))
-
-        if not predictions:
-            return jsonify(format_response(True, {
-                "totalPredictions": 0,
-                "churnRate": 0,
-                "avgProbability": 0,
-                "highRiskCustomers": 0,
-                "predictionAccuracy": 84.5,
-                "precision": 69.2,
-                "recall": 72.8,
-                "f1Score": 70.9,
-                "auc": 89.7
-            }))
+        marker_count, marker_latest = prediction_change_marker(user_id)
+        etag = make_etag("dashboard", user_id, marker_count, marker_latest)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        return with_etag(jsonify(format_response(True, dashboard_stats(user_id))), etag)
 
+    except Exception as e:
+        logger.error(f"Dashboard stats error: {e}")
+        return jsonify(format_response(False, error="Failed to retrieve dashboard stats")), 500
+
+def dashboard_stats(user_id):
+    """Dashboard statistics over a user's stored predictions (zeros without a database)"""
+    stats = {
+        "totalPredictions": 0,
+        "churnRate": 0,
+        "avgProbability": 0,
+        "highRiskCustomers": 0,
+        "predictionAccuracy": 84.5,
+        "precision": 69.2,
+        "recall": 72.8,
+        "f1Score": 70.9,
+        "auc": 89.7
+    }
+    if predictions_collection is None:
+        return stats
+
+    # Get all predictions for user
+    with metrics.stage("mongo_find"):
+        predictions = list(predictions_collection.find(
+            {"userId": user_id}, {"_id": 0, "prediction": 1, "probability": 1}
+        ))
+
+    if predictions:
         total_predictions = len(predictions)
         churn_predictions = sum(1 for p in predictions if p["prediction"] == "Churn")
         churn_rate = (churn_predictions / total_predictions) * 100
         avg_probability = sum(p["probability"] for p in predictions) / total_predictions
         high_risk_customers = sum(1 for p in predictions if p["probability"] > 0.7)
 
-        stats = {
+        stats.update({
             "totalPredictions": total_predictions,
             "churnRate": round(churn_rate, 1),
             "avgProbability": round(avg_probability, 3),
             "highRiskCustomers": high_risk_customers,
-            "predictionAccuracy": 84.5,
-            "precision": 69.2,
-            "recall": 72.8,
-            "f1Score": 70.9,
-            "auc": 89.7
-        }
+        })
+    return stats
+
+def newest_prediction_id(user_id):
+    latest = predictions_collection.find_one({"userId": user_id}, {"_id": 1}, sort=[("timestamp", -1)])
+    return latest["_id"] if latest else None
+
+@app.route('/api/stream', methods=['GET'])
+@jwt_required(locations=["headers", "query_string"])
+def stream_predictions():
+    """Server-Sent Events for the dashboard: new predictions, refreshed stats and heartbeats.
+
+    EventSource cannot set headers, so the token may be passed as ``?jwt=``. Events:
+    ``predictions`` ({"predictions": [...]}), ``stats`` (as /api/dashboard/stats) and
+    ``resync`` (events were missed, e.g. dropped or created on another worker:
+    refetch history). The server closes each stream after STREAM_MAX_SECONDS and
+    EventSource reconnects.
+    """
+    user_id = get_jwt_identity()
+    subscription = prediction_events.subscribe(user_id)
+    if subscription is None:
+        response = jsonify(format_response(False, error="Too many live streams on this server, retry shortly"))
+        response.headers['Retry-After'] = str(int(app.config['STREAM_HEARTBEAT_SECONDS']))
+        return response, 503
+
+    heartbeat = app.config['STREAM_HEARTBEAT_SECONDS']
+    stats_interval = app.config['STREAM_STATS_INTERVAL']
+    lifetime = app.config['STREAM_MAX_SECONDS']
+
+    def stats():
+        return dashboard_stats(user_id)
+
+    def events():
+        yield f"retry: {int(heartbeat * 1000)}\n\n"
+        with metrics.stage("mongo_find"):
+            seen = newest_prediction_id(user_id) if predictions_collection is not None else None
+        # Stats are computed once per user per STREAM_STATS_INTERVAL and shared by all of their streams
+        started = last_stats = time.monotonic()
+        message, _ = prediction_events.shared(user_id, "stats", started - stats_interval, stats, publish=False)
+        yield message
+        pending_since = None  # when this stream first saw a change its stats don't reflect yet
+        while True:
+            now = time.monotonic()
+            if now - started >= lifetime:
+                return
+            # Stats are refreshed at most every STREAM_STATS_INTERVAL, however many predictions arrive
+            wait = max(0.0, last_stats + stats_interval - now) if pending_since is not None else heartbeat
+            messages, dropped, changed_at = subscription.next(min(wait, lifetime - (now - started)))
+            yield from messages
+            if dropped:
+                yield sse_message("resync", {"reason": "dropped"})
+            if pending_since is None and (changed_at is not None or dropped):
+                # From when the data changed, not when this thread woke, so stats another stream
+                # computed in between are reused
+                pending_since = changed_at if changed_at is not None else time.monotonic()
+
+            now = time.monotonic()
+            if pending_since is not None and now - last_stats >= stats_interval:
+                with metrics.stage("mongo_find"):
+                    seen = newest_prediction_id(user_id) if predictions_collection is not None else None
+                # Published to every stream of the user, this one included, unless another stream already did
+                message, delivered = prediction_events.shared(user_id, "stats", pending_since, stats)
+                if not delivered:
+                    yield message
+                last_stats, pending_since = now, None
+            elif not messages and not dropped and pending_since is None and now - started < lifetime:
+                # Idle: predictions made through other workers never reach this one's broker
+                with metrics.stage("mongo_find"):
+                    latest = newest_prediction_id(user_id) if predictions_collection is not None else None
+                if latest != seen:
+                    yield sse_message("resync", {"reason": "external"})
+                    pending_since = time.monotonic()
+                else:
+                    yield ": heartbeat\n\n"
+
+    response = Response(stream_with_context(events()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    # Runs even if the client goes away before the generator starts
+    response.call_on_close(lambda: prediction_events.unsubscribe(subscription))
+    return response
+
+# Chart data, aggregated in MongoDB so payloads stay constant-size
+@app.route('/api/analytics/probability-histogram', methods=['GET'])
+@jwt_required()
+def get_probability_histogram():
+    try:
+        if predictions_collection is None:
+            return jsonify(format_response(False, error="Database connection failed")), 500
+
+        user_id = get_jwt_identity()
+        bins = max(1, min(int(request.args.get('bins', 10)), analytics.MAX_BINS))
+
+        marker_count, marker_latest = prediction_change_marker(user_id)
+        etag = make_etag("histogram", user_id, marker_count, marker_latest, bins)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        with metrics.stage("mongo_aggregate"):
+            rows = list(predictions_collection.aggregate(analytics.histogram_pipeline(user_id, bins)))
 
-        return jsonify(format_response(True, stats))
+        return with_etag(jsonify(format_response(True, {
+            "bins": analytics.format_histogram(rows, bins),
+            "total": marker_count
+        })), etag)
 
+    except ValueError:
+        return jsonify(format_response(False, error="bins must be an integer")), 400
     except Exception as e:
-        logger.error(f"Dashboard stats error: {e}")
-        return jsonify(format_response(False, error="Failed to retrieve dashboard stats")), 500
+        logger.error(f"Probability histogram error: {e}")
+        return jsonify(format_response(False, error="Failed to compute probability histogram")), 500
+
+@app.route('/api/analytics/churn-rate', methods=['GET'])
+@jwt_required()
+def get_churn_rate_breakdown():
+    try:
+        if predictions_collection is None:
+            return jsonify(format_response(False, error="Database connection failed")), 500
+
+        user_id = get_jwt_identity()
+        group_by = request.args.get('groupBy', 'contract')
+        if group_by not in analytics.GROUPABLE_FIELDS:
+            return jsonify(format_response(
+                False, error=f"groupBy must be one of: {', '.join(analytics.GROUPABLE_FIELDS)}"
+            )), 400
+
+        marker_count, marker_latest = prediction_change_marker(user_id)
+        etag = make_etag("churn-rate", user_id, marker_count, marker_latest, group_by)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        with metrics.stage("mongo_aggregate"):
+            rows = list(predictions_collection.aggregate(
+                analytics.churn_rate_pipeline(user_id, group_by, prediction_codec.group_key(group_by))
+            ))
+        with metrics.stage("storage_decode"):
+            groups = analytics.format_churn_rates(
+                rows, group_by, lambda code: prediction_codec.dictionary.value(f"field:{group_by}", code)
+            )
+
+        return with_etag(jsonify(format_response(True, {
+            "groupBy": group_by,
+            "groups": groups,
+            "total": marker_count
+        })), etag)
+
+    except Exception as e:
+        logger.error(f"Churn rate breakdown error: {e}")
+        return jsonify(format_response(False, error="Failed to compute churn rates")), 500
+
+@app.route('/api/analytics/trend', methods=['GET'])
+@jwt_required()
+def get_churn_trend():
+    try:
+        if rollup_store is None:
+            return jsonify(format_response(False, error="Database connection failed")), 500
+
+        user_id = get_jwt_identity()
+        period = request.args.get('period', 'day')
+        if period not in PERIODS:
+            return jsonify(format_response(False, error=f"period must be one of: {', '.join(PERIODS)}")), 400
+        limit = max(1, min(int(request.args.get('limit', 30)), 366))
+
+        with metrics.stage("mongo_find"):
+            buckets = rollup_store.trend(user_id, period, limit)
+
+        return jsonify(format_response(True, {"period": period, "buckets": buckets}))
+
+    except ValueError:
+        return jsonify(format_response(False, error="limit must be an integer")), 400
+    except Exception as e:
+        logger.error(f"Churn trend error: {e}")
+        return jsonify(format_response(False, error="Failed to load churn trend")), 500
+
+@app.route('/api/analytics/top-risk', methods=['GET'])
+@jwt_required()
+def get_top_risk_customers():
+    """The k customers whose latest prediction has the highest churn probability"""
+    try:
+        if risk_index is None:
+            return jsonify(format_response(False, error="Database connection failed")), 500
+
+        user_id = get_jwt_identity()
+        k = max(1, min(int(request.args.get('k', 10)), app.config['TOP_RISK_MAX_K']))
+
+        with metrics.stage("mongo_find"):
+            entries = risk_index.top(user_id, k)
+
+        return jsonify(format_response(True, {
+            "customers": [
+                {
+                    "customerId": entry["customerId"],
+                    "predictionId": str(entry["predictionId"]),
+                    "timestamp": entry["timestamp"].isoformat(),
+                    "prediction": entry["prediction"],
+                    "probability": entry["probability"],
+                    "riskLevel": entry["riskLevel"],
+                    "customerData": entry["customerData"],
+                }
+                for entry in entries
+            ],
+            "k": k
+        }, message=None if entries else "No customer ids recorded: include customerId in /api/predict input to track customers"))
+
+    except ValueError:
+        return jsonify(format_response(False, error="k must be an integer")), 400
+    except Exception as e:
+        logger.error(f"Top risk customers error: {e}")
+        return jsonify(format_response(False, error="Failed to load top risk customers")), 500
+
+@app.route('/api/analytics/tenure-scatter', methods=['GET'])
+@jwt_required()
+def get_tenure_scatter():
+    try:
+        if predictions_collection is None:
+            return jsonify(format_response(False, error="Database connection failed")), 500
+
+        user_id = get_jwt_identity()
+        points = max(1, min(int(request.args.get('points', 500)), analytics.MAX_SCATTER_POINTS))
+
+        # No ETag: the sample is random on every call
+        with metrics.stage("mongo_count"):
+            total = predictions_collection.count_documents({"userId": user_id})
+        with metrics.stage("mongo_aggregate"):
+            rows = list(predictions_collection.aggregate(analytics.scatter_pipeline(user_id, points)))
+        with metrics.stage("storage_decode"):
+            rows = analytics.format_scatter(rows, prediction_codec.decode_customer)
+
+        return jsonify(format_response(True, {
+            "points": rows,
+            "total": total,
+            "sampled": total > points
+        }))
+
+    except ValueError:
+        return jsonify(format_response(False, error="points must be an integer")), 400
+    except Exception as e:
+        logger.error(f"Tenure scatter error: {e}")
+        return jsonify(format_response(False, error="Failed to sample tenure scatter")), 500
 
 @app.route('/api/history', methods=['DELETE'])
 @jwt_required()
 def clear_history():
+    """Start a background deletion of all history, or of ?userId=<id> only (admin only)"""
     try:
-        if predictions_collection is None:
+        if deletion_jobs is None:
             return jsonify(format_response(False, error="Database connection failed")), 500
 
         user_id = get_jwt_identity()
 
         # Check if user is admin
-        user = users_collection.find_one({"_id": ObjectId(user_id)})
+        user = user_resolver.resolve(user_id, get_jwt())
         if not user or user.get("role") != "admin":
             return jsonify(format_response(False, error="Admin access required")), 403
 
-        # Clear all predictions
-        result = predictions_collection.delete_many({})
-        
-        logger.info(f"🗑️ History cleared by admin {user_id}, deleted {result.deleted_count} records")
+        scope_user = request.args.get('userId') or None
+        job = deletion_jobs.start(requested_by=user_id, user_id=scope_user)
 
-        return jsonify(format_response(True, {
-            "deletedCount": result.deleted_count
-        }, "History cleared successfully"))
+        logger.info(f"🗑️ History deletion {job['_id']} started by admin {user_id} "
+                    f"(scope: {scope_user or 'all users'})")
+
+        return jsonify(format_response(True, format_deletion_job(job), "History deletion started")), 202
 
     except Exception as e:
         logger.error(f"Clear history error: {e}")
         return jsonify(format_response(False, error="Failed to clear history")), 500
 
+@app.route('/api/history/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_history_job(job_id):
+    try:
+        if deletion_jobs is None:
+            return jsonify(format_response(False, error="Database connection failed")), 500
+
+        user = user_resolver.resolve(get_jwt_identity(), get_jwt())
+        if not user or user.get("role") != "admin":
+            return jsonify(format_response(False, error="Admin access required")), 403
+
+        job = deletion_jobs.get(job_id)
+        if job is None:
+            return jsonify(format_response(False, error="Job not found")), 404
+        return jsonify(format_response(True, format_deletion_job(job)))
+
+    except Exception as e:
+        logger.error(f"Get history job error: {e}")
+        return jsonify(format_response(False, error="Failed to load job status")), 500
+
+@app.route('/api/admin/profile', methods=['POST'])
+@jwt_required()
+def start_profile():
+    """Profile this worker for a duration or for its next N requests (admin only)"""
+    try:
+        user = user_resolver.resolve(get_jwt_identity(), get_jwt())
+        if not user or user.get("role") != "admin":
+            return jsonify(format_response(False, error="Admin access required")), 403
+
+        data = request.get_json(silent=True) or {}
+        try:
+            duration = float(data["duration"]) if "duration" in data else None
+            requests_count = int(data["requests"]) if "requests" in data else None
+            interval = float(data.get("intervalMs", 5)) / 1000
+        except (TypeError, ValueError):
+            return jsonify(format_response(False, error="Invalid duration, requests or intervalMs")), 400
+        if duration is None and requests_count is None:
+            duration = 10.0
+        if (duration is not None and duration <= 0) or (requests_count is not None and requests_count < 1):
+            return jsonify(format_response(False, error="duration and requests must be positive")), 400
+
+        try:
+            session_id = profiler.start(duration=duration, requests=requests_count, interval=interval)
+        except RuntimeError as busy:
+            return jsonify(format_response(False, error=str(busy))), 409
+
+        return jsonify(format_response(True, {
+            "id": session_id,
+            "pid": os.getpid(),
+            "duration": duration,
+            "requests": requests_count
+        }, "Profiling started")), 202
+
+    except Exception as e:
+        logger.error(f"Start profile error: {e}")
+        return jsonify(format_response(False, error="Failed to start profiler")), 500
+
+@app.route('/api/admin/profile/<session_id>', methods=['GET'])
+@jwt_required()
+def get_profile(session_id):
+    """Return a finished profile's per-function summary and collapsed stacks (admin only)"""
+    try:
+        user = user_resolver.resolve(get_jwt_identity(), get_jwt())
+        if not user or user.get("role") != "admin":
+            return jsonify(format_response(False, error="Admin access required")), 403
+
+        result = profiler.load(session_id)
+        if result is None:
+            return jsonify(format_response(False, error="Profile not found or still running")), 404
+
+        if request.args.get('format') == 'collapsed':
+            return Response(result["collapsed"], mimetype='text/plain')
+        return jsonify(format_response(True, result))
+
+    except Exception as e:
+        logger.error(f"Get profile error: {e}")
+        return jsonify(format_response(False, error="Failed to load profile")), 500
+
+# Dependency checks for readiness; run by the health refresher thread, never by a probe
+def check_database():
+    if not mongo.configured:
+        return False, "not_configured"
+    mongo.ping()
+    return True, "connected"
+
+def check_models():
+    if model is None or encoder is None:
+        return False, "not_loaded"
+    return True, "loaded"
+
+def check_smtp():
+    if all([notification_service.smtp_host, notification_service.smtp_user, notification_service.smtp_pass]):
+        return True, "configured"
+    return False, "not_configured"
+
+health_monitor = HealthMonitor(
+    {"database": check_database, "models": check_models, "smtp": check_smtp},
+    optional=("smtp",),
+    interval=app.config['HEALTH_CHECK_INTERVAL']
+)
+
 # Fix: Enhanced health check endpoint
 @app.route('/api/health', methods=['GET'])
 def health_check():
+    """Summary for humans and the frontend, served from the cached readiness snapshot"""
     try:
-        db_status = "connected"
-        if client is not None:
-            try:
-                client.admin.command('ping')
-            except Exception:
-                db_status = "disconnected"
-        else:
-            db_status = "not_configured"
+        snapshot = health_monitor.snapshot()
+        checks = snapshot["checks"]
 
-        # ✅ FIXED: Proper None checking for models
-        models_status = "loaded" if (model is not None and encoder is not None) else "not_loaded"
-        
         health_data = {
-            "status": "healthy",
+            "status": "healthy" if snapshot["ready"] else "degraded",
             "timestamp": datetime.utcnow().isoformat(),
-            "database": db_status,
-            "models": models_status,
+            "database": checks["database"]["detail"] if checks["database"]["ok"] else "disconnected",
+            "models": checks["models"]["detail"],
+            "modelVersion": model_version,
+            "checkedAt": snapshot["checkedAt"],
             "version": "1.0.0",
             "environment": os.getenv('FLASK_ENV', 'production'),
             "cors_enabled": True,
             "api_base": "/api"
         }
-        
+        if not mongo.configured:
+            health_data["database"] = "not_configured"
+
         return jsonify(health_data), 200
-        
+
     except Exception as e:
         logger.error(f"Health check error: {e}")
         return jsonify({
@@ -939,6 +1905,23 @@ def health_check():
             "error": str(e)
         }), 500
 
+@app.route('/api/health/live', methods=['GET'])
+def liveness_probe():
+    """Liveness: the worker answers requests; no dependency is consulted"""
+    return jsonify(health_monitor.liveness()), 200
+
+@app.route('/api/health/ready', methods=['GET'])
+def readiness_probe():
+    """Readiness: last background check of Mongo, models and SMTP; 503 when a required one fails"""
+    snapshot = health_monitor.snapshot()
+    body = dict(snapshot, status="ready" if snapshot["ready"] else "not_ready", modelVersion=model_version)
+    return jsonify(body), 200 if snapshot["ready"] else 503
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 # Fix: Additional utility endpoints for debugging
 
 @app.route('/api/config', methods=['GET'])
@@ -956,7 +1939,7 @@ def get_config():
             ],
             "environment": os.getenv('FLASK_ENV', 'production'),
             "models_loaded": bool(model and encoder),
-            "database_connected": bool(db),
+            "database_connected": mongo.available,
             "timestamp": datetime.utcnow().isoformat()
         })
     except Exception as e:
@@ -1002,6 +1985,27 @@ def forbidden(error):
         response.headers.add('Access-Control-Allow-Origin', origin)
     return response
 
+@app.errorhandler(DatabaseUnavailable)
+def database_unavailable(error):
+    response = jsonify(format_response(False, error="Database temporarily unavailable"))
+    response.status_code = 503
+    response.headers['Retry-After'] = str(int(app.config['MONGO_RETRY_INTERVAL']))
+    origin = request.headers.get('Origin')
+    if origin and (origin.endswith('.vercel.app') or 'localhost' in origin):
+        response.headers.add('Access-Control-Allow-Origin', origin)
+    return response
+
+@app.errorhandler(AdmissionRejected)
+def admission_rejected(error):
+    message = "Too many prediction requests queued" if error.status == 429 else "Prediction capacity exhausted"
+    response = jsonify(format_response(False, error=f"{message}, please retry later"))
+    response.status_code = error.status
+    response.headers['Retry-After'] = str(error.retry_after)
+    origin = request.headers.get('Origin')
+    if origin and (origin.endswith('.vercel.app') or 'localhost' in origin):
+        response.headers.add('Access-Control-Allow-Origin', origin)
+    return response
+
 # Fix: Add a test endpoint for CORS verification
 @app.route('/api/test-cors', methods=['GET', 'POST', 'OPTIONS'])
 def test_cors():
@@ -1014,22 +2018,108 @@ def test_cors():
         "headers": dict(request.headers)
     })
 
+# Maintenance commands: flask --app app rollups-backfill / rollups-check / archive-predictions /
+# risk-index-backfill / revoke-tokens
+@app.cli.command("rollups-backfill")
+@click.option("--user", "user_id", default=None, help="Only rebuild this user's buckets")
+def rollups_backfill_command(user_id):
+    """Rebuild trend rollups from the predictions collection"""
+    if rollup_store is None:
+        raise click.ClickException("MONGO_URI is not configured")
+    written = rollup_store.backfill(predictions_collection, user_id, archived=archived_records(user_id))
+    click.echo(f"Wrote {written} rollup buckets")
+
+@app.cli.command("rollups-check")
+@click.option("--user", "user_id", default=None, help="Only check this user's buckets")
+def rollups_check_command(user_id):
+    """Compare trend rollups with a full recompute; exits 1 on mismatch"""
+    if rollup_store is None:
+        raise click.ClickException("MONGO_URI is not configured")
+    mismatches = rollup_store.check(predictions_collection, user_id, archived=archived_records(user_id))
+    for mismatch in mismatches[:20]:
+        click.echo(f"{mismatch['userId']} {mismatch['period']} {mismatch['start']}: "
+                   f"expected {mismatch['expected']}, stored {mismatch['stored']}")
+    if mismatches:
+        raise click.ClickException(f"{len(mismatches)} rollup buckets differ from predictions")
+    click.echo("Rollups match predictions")
+
+@app.cli.command("archive-predictions")
+@click.option("--older-than-days", type=int, default=None, help="Defaults to ARCHIVE_AFTER_DAYS")
+@click.option("--user", "user_id", default=None, help="Only archive this user's predictions")
+def archive_predictions_command(older_than_days, user_id):
+    """Move old predictions from MongoDB into partitioned Parquet files"""
+    if predictions_collection is None:
+        raise click.ClickException("MONGO_URI is not configured")
+    if not prediction_archive.available:
+        raise click.ClickException("pyarrow is not installed")
+    days = older_than_days if older_than_days is not None else app.config['ARCHIVE_AFTER_DAYS']
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    stats = prediction_archive.archive(predictions_collection, cutoff, user_id)
+    click.echo(f"Archived {stats['archived']} predictions older than {cutoff:%Y-%m-%d} "
+               f"into {stats['files']} files; removed {stats['deleted']} from MongoDB")
+
+@app.cli.command("risk-index-backfill")
+@click.option("--user", "user_id", default=None, help="Only rebuild this user's customers")
+def risk_index_backfill_command(user_id):
+    """Rebuild the top-risk customer index from stored (and archived) predictions"""
+    if risk_index is None:
+        raise click.ClickException("MONGO_URI is not configured")
+    read = risk_index.backfill(predictions_collection, user_id, archived=archived_records(user_id))
+    click.echo(f"Indexed the latest prediction per customer from {read} predictions")
+
+@app.cli.command("revoke-tokens")
+@click.argument("email")
+def revoke_tokens_command(email):
+    """Revoke every token issued to a user so far (after a role change or compromise)"""
+    if users_collection is None:
+        raise click.ClickException("MONGO_URI is not configured")
+    user = users_collection.find_one({"email": email.lower()}, {"_id": 1})
+    if user is None:
+        raise click.ClickException(f"No user with email {email}")
+    user_resolver.invalidate(str(user["_id"]))
+    click.echo(f"Revoked tokens for {email}; workers stop accepting them within {app.config['USER_CACHE_TTL']:.0f}s")
+
+# Indexes and the admin user need MongoDB, so they are set up on the first request of
+# each worker rather than at import; while the database is down this is retried every
+# MONGO_RETRY_INTERVAL seconds
+database_setup_lock = threading.Lock()
+database_setup = {"done": False, "next_attempt": 0.0}
+# Probes and metrics never wait on the database
+DATABASE_SETUP_EXEMPT = {"liveness_probe", "readiness_probe", "get_metrics"}
+
+@app.before_request
+def ensure_database_setup():
+    if database_setup["done"] or time.monotonic() < database_setup["next_attempt"]:
+        return
+    if request.endpoint in DATABASE_SETUP_EXEMPT:
+        return
+    if not database_setup_lock.acquire(blocking=False):
+        return  # another request thread is running it
+    try:
+        if database_setup["done"]:
+            return
+        try:
+            ensure_indexes()
+        except Exception as index_error:
+            logger.warning(f"⚠️ Index creation failed: {index_error}")
+            database_setup["next_attempt"] = time.monotonic() + app.config['MONGO_RETRY_INTERVAL']
+            return
+        init_admin_user()
+        logger.info("👤 Admin user initialization completed")
+        database_setup["done"] = True
+    finally:
+        database_setup_lock.release()
+
 # Fix: Application startup initialization (replaces @app.before_first_request)
 def initialize_application():
     """Initialize application components on startup"""
     try:
         logger.info("🚀 ChurnPredict API starting up...")
         logger.info(f"🌍 Environment: {os.getenv('FLASK_ENV', 'production')}")
-        logger.info(f"🔗 Database: {'Connected' if db is not None else 'Not connected'}")
+        logger.info(f"🔗 Database: {'Configured' if mongo.configured else 'Not configured'}")
         logger.info(f"🤖 Models: {'Loaded' if (model is not None and encoder is not None) else 'Not loaded'}")
         logger.info(f"📧 Email: {'Configured' if os.getenv('SMTP_SERVER') else 'Not configured'}")
-        
-        try:
-            init_admin_user()
-            logger.info("👤 Admin user initialization completed")
-        except Exception as admin_error:
-            logger.warning(f"👤 Admin user initialization failed: {admin_error}")
-        
+        logger.info("🗄️ Indexes and the admin user are set up on each worker's first request")
         logger.info("✅ Application initialization completed")
         
     except Exception as e:
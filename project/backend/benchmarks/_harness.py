@@ -0,0 +1,70 @@
+"""Shared helpers for benchmarks that need the Flask app without a real MongoDB"""
+import os
+import sys
+import inspect
+import logging
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_CUSTOMER = {
+    "contract": "Month-to-month",
+    "monthlyCharges": 80,
+    "numReferrals": 0,
+    "dependents": "No",
+    "totalCharges": 20,
+    "tenure": 3,
+    "paymentMethod": "Electronic Check",
+    "onlineBackup": "No",
+    "onlineSecurity": "No",
+    "techSupport": "No"
+}
+
+
+def patch_mongomock_bulk():
+    """Let mongomock's bulk builder take the ``sort`` argument pymongo >= 4.11 passes to it.
+
+    Without this every ``bulk_write`` of UpdateOne/ReplaceOne (rollups, the top-risk
+    index) raises TypeError under mongomock, so those writes never run in benchmarks.
+    """
+    from mongomock.collection import BulkOperationBuilder
+
+    for name in ("add_update", "add_replace"):
+        original = getattr(BulkOperationBuilder, name)
+        if "sort" in inspect.signature(original).parameters:
+            continue
+
+        def accept_sort(self, *args, sort=None, _original=original, **kwargs):
+            if sort is not None:
+                raise NotImplementedError("mongomock bulk writes do not support sort")
+            return _original(self, *args, **kwargs)
+
+        setattr(BulkOperationBuilder, name, accept_sort)
+
+
+def load_app(quiet=True, use_mongomock=True):
+    """Import ``app`` (by default against an in-memory mongomock client) and return the module"""
+    os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017/churn_prediction")
+    # Benchmarks drive one account from one address; keep the rate limiter out of the way
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    if use_mongomock:
+        import mongomock
+        import pymongo
+        pymongo.MongoClient = mongomock.MongoClient
+        patch_mongomock_bulk()
+
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    os.chdir(BACKEND_DIR)
+
+    if quiet:
+        logging.disable(logging.WARNING)
+    import app as app_module
+    if quiet:
+        logging.disable(logging.NOTSET)
+        logging.getLogger().setLevel(logging.ERROR)
+    return app_module
+
+
+def login(client, email="admin@churnpredict.com", password="admin123"):
+    response = client.post("/api/auth/login", json={"email": email, "password": password})
+    return response.get_json()["data"]["token"]
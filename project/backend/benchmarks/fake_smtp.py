@@ -0,0 +1,124 @@
+"""
+Minimal threaded SMTP sink for local load tests: accepts EHLO, STARTTLS (when
+given a certificate), AUTH, MAIL, RCPT and DATA, and only counts messages.
+
+    python benchmarks/fake_smtp.py --port 2525
+"""
+import argparse
+import os
+import socketserver
+import ssl
+import subprocess
+import tempfile
+import threading
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.in_data = False
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+        self.wfile.flush()
+
+    def handle(self):
+        self.reply("220 fake-smtp ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            if self.in_data:
+                if line.rstrip(b"\r\n") == b".":
+                    self.in_data = False
+                    self.server.record_message()
+                    self.reply("250 OK: queued")
+                continue
+
+            command = line.decode(errors="replace").strip().split(" ", 1)[0].upper()
+            if command == "EHLO":
+                self.reply("250-fake-smtp")
+                if self.server.ssl_context and not isinstance(self.connection, ssl.SSLSocket):
+                    self.reply("250-STARTTLS")
+                self.reply("250 AUTH PLAIN LOGIN")
+            elif command == "HELO":
+                self.reply("250 fake-smtp")
+            elif command == "STARTTLS" and self.server.ssl_context:
+                self.reply("220 Ready to start TLS")
+                self.connection = self.server.ssl_context.wrap_socket(self.connection, server_side=True)
+                self.rfile = self.connection.makefile("rb")
+                self.wfile = self.connection.makefile("wb")
+            elif command == "AUTH":
+                self.reply("235 Authentication successful")
+            elif command == "DATA":
+                self.in_data = True
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            elif command in ("MAIL", "RCPT", "RSET", "NOOP"):
+                self.reply("250 OK")
+            else:
+                self.reply("502 Command not implemented")
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0, certfile=None, keyfile=None):
+        super().__init__((host, port), _SMTPHandler)
+        self.ssl_context = None
+        if certfile:
+            self.ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            self.ssl_context.load_cert_chain(certfile, keyfile)
+        self.messages = 0
+        self._lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def record_message(self):
+        with self._lock:
+            self.messages += 1
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+
+def self_signed_certificate(directory):
+    """Create a throwaway certificate with the openssl CLI; returns (certfile, keyfile) or (None, None)"""
+    certfile = os.path.join(directory, "smtp-cert.pem")
+    keyfile = os.path.join(directory, "smtp-key.pem")
+    try:
+        subprocess.run(
+            ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+             "-subj", "/CN=localhost", "-keyout", keyfile, "-out", certfile],
+            check=True, capture_output=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return certfile, keyfile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        certfile, keyfile = self_signed_certificate(tmp)
+        server = FakeSMTPServer(args.host, args.port, certfile, keyfile)
+        print(f"Fake SMTP listening on {args.host}:{server.port} (STARTTLS {'on' if certfile else 'off'})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print(f"{server.messages} messages received")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Bytes on the wire and server CPU per request for /api/history and
+/api/dashboard/stats: uncompressed, gzip, brotli (if the module is installed)
+and a conditional request answered with 304 Not Modified.
+
+    python benchmarks/http_caching.py --predictions 2000 --requests 200
+
+CPU is process time spent inside the Flask test client, so it covers routing,
+the Mongo queries (mongomock), serialization and compression, but no socket I/O.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _harness import load_app, login  # noqa: E402
+from inference_pipeline import synthetic_customers  # noqa: E402
+
+
+def seed_predictions(app_module, user_id, count, rng):
+    now = datetime.utcnow()
+    documents = []
+    for i, customer in enumerate(synthetic_customers(count, rng)):
+        probability = rng.random()
+        documents.append({
+            "_id": ObjectId(),
+            "timestamp": now - timedelta(minutes=i),
+            "customerData": customer,
+            "prediction": "Churn" if probability > 0.5 else "No Churn",
+            "probability": probability,
+            "riskLevel": app_module.risk_level_for(probability),
+            "shapValues": [
+                {"feature": name, "value": rng.uniform(-0.3, 0.3), "impact": "positive"}
+                for name in ("Monthly Charges", "Tenure", "Contract Type", "Payment Method", "Online Security")
+            ],
+            "userId": user_id,
+        })
+    app_module.predictions_collection.insert_many(documents)
+
+
+def measure(client, path, headers, num_requests):
+    wire_bytes = 0
+    status = None
+    start = time.process_time()
+    for _ in range(num_requests):
+        response = client.get(path, headers=headers)
+        wire_bytes = len(response.get_data())
+        status = response.status_code
+    cpu = (time.process_time() - start) / num_requests
+    return status, wire_bytes, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--predictions", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=100, help="history page size")
+    args = parser.parse_args()
+
+    app_module = load_app()
+    from services import http_cache
+
+    client = app_module.app.test_client()
+    token = login(client)
+    admin = app_module.users_collection.find_one({"email": "admin@churnpredict.com"})
+    seed_predictions(app_module, str(admin["_id"]), args.predictions, random.Random(7))
+    auth = {"Authorization": f"Bearer {token}"}
+
+    encodings = [("identity", None), ("gzip", "gzip")]
+    if http_cache.brotli is not None:
+        encodings.append(("br", "br"))
+
+    print(f"predictions={args.predictions} requests={args.requests}")
+    for path in (f"/api/history?limit={args.limit}", "/api/dashboard/stats"):
+        print(path)
+        for label, accept in encodings:
+            headers = dict(auth, **({"Accept-Encoding": accept} if accept else {}))
+            status, wire_bytes, cpu = measure(client, path, headers, args.requests)
+            print(f"  {label:<10} {status}  {wire_bytes:8d} bytes  {cpu * 1000:7.2f} ms CPU/request")
+        etag = client.get(path, headers=auth).headers["ETag"]
+        status, wire_bytes, cpu = measure(client, path, dict(auth, **{"If-None-Match": etag}), args.requests)
+        print(f"  {'304':<10} {status}  {wire_bytes:8d} bytes  {cpu * 1000:7.2f} ms CPU/request")
+
+
+if __name__ == "__main__":
+    main()
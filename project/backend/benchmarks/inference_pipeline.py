@@ -0,0 +1,183 @@
+"""
+Per-stage microbenchmarks for the prediction pipeline in app.py, using the real
+models/*.pkl files and synthetic customers.
+
+Stages: validate (required fields + column mapping), frame (DataFrame
+construction + encoding), scale, predict_proba, shap, serialize (JSON body).
+
+    # record results for this commit
+    python benchmarks/inference_pipeline.py --output bench-main.json
+
+    # compare against a previous run; exits 1 if any stage regressed
+    python benchmarks/inference_pipeline.py --output bench-new.json --compare bench-main.json --threshold 0.15
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _harness import BACKEND_DIR, load_app  # noqa: E402
+
+DEFAULT_BATCH_SIZES = [1, 10, 100, 1000, 10000, 100000]
+
+CATEGORIES = {
+    "contract": ["Month-to-month", "One Year", "Two Year"],
+    "dependents": ["Yes", "No"],
+    "paymentMethod": ["Electronic Check", "Bank Withdrawal", "Credit Card", "Mailed Check"],
+    "onlineBackup": ["Yes", "No"],
+    "onlineSecurity": ["Yes", "No"],
+    "techSupport": ["Yes", "No"],
+}
+
+
+def synthetic_customers(count, rng):
+    customers = []
+    for _ in range(count):
+        customer = {field: rng.choice(values) for field, values in CATEGORIES.items()}
+        customer.update({
+            "monthlyCharges": round(rng.uniform(18, 120), 2),
+            "numReferrals": rng.randint(0, 10),
+            "totalCharges": round(rng.uniform(0, 90), 1),
+            "tenure": rng.randint(0, 72),
+        })
+        customers.append(customer)
+    return customers
+
+
+def time_stage(func, min_time, min_repeats, max_repeats):
+    """Median wall time of ``func`` over enough repeats to cover ``min_time`` seconds"""
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_repeats and (len(samples) < min_repeats or time.perf_counter() - started < min_time):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), len(samples)
+
+
+def run_pipeline_benchmarks(app_module, batch_sizes, args):
+    rng = random.Random(args.seed)
+    results = {}
+
+    for batch_size in batch_sizes:
+        payloads = synthetic_customers(batch_size, rng)
+        rows = [app_module.map_customer_columns(p) for p in payloads]
+        frame = app_module.build_feature_frame(rows)
+        probabilities = app_module.model.predict_proba(frame)[:, 1]
+        records = [
+            {
+                "customerData": payload,
+                "prediction": "Churn" if probability > 0.5 else "No Churn",
+                "probability": float(probability),
+                "riskLevel": app_module.risk_level_for(probability),
+                "shapValues": app_module.calculate_shap_values(payload),
+            }
+            for payload, probability in zip(payloads, probabilities)
+        ]
+
+        def validate():
+            for payload in payloads:
+                app_module.find_missing_fields(payload)
+                app_module.map_customer_columns(payload)
+
+        def serialize():
+            with app_module.app.app_context():
+                app_module.app.json.dumps(app_module.format_response(True, records))
+
+        stages = {
+            "validate": validate,
+            "frame": lambda: app_module.build_feature_frame(rows),
+            "scale": lambda: app_module.scale_features(frame.copy()),
+            "predict_proba": lambda: app_module.model.predict_proba(frame),
+            "shap": lambda: [app_module.calculate_shap_values(p) for p in payloads],
+            "serialize": serialize,
+        }
+
+        for stage, func in stages.items():
+            median, repeats = time_stage(func, args.min_time, args.min_repeats, args.max_repeats)
+            results.setdefault(stage, {})[str(batch_size)] = {
+                "median_s": median,
+                "per_row_us": median / batch_size * 1e6,
+                "repeats": repeats,
+            }
+            print(f"{stage:14s} batch={batch_size:>7d}  median={median * 1000:10.3f} ms  "
+                  f"per_row={median / batch_size * 1e6:9.2f} us  (n={repeats})")
+
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except Exception:
+        return None
+
+
+def compare(current, baseline, threshold):
+    """Return (stage, batch, old, new) for every timing that slowed down by more than ``threshold``"""
+    regressions = []
+    for stage, batches in current["results"].items():
+        for batch_size, timing in batches.items():
+            old = baseline.get("results", {}).get(stage, {}).get(batch_size)
+            if old and timing["median_s"] > old["median_s"] * (1 + threshold):
+                regressions.append((stage, batch_size, old["median_s"], timing["median_s"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", default=",".join(map(str, DEFAULT_BATCH_SIZES)))
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds to spend per stage and batch size")
+    parser.add_argument("--min-repeats", type=int, default=3)
+    parser.add_argument("--max-repeats", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="baseline JSON from a previous run")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown ratio before failing")
+    args = parser.parse_args()
+
+    app_module = load_app()
+    if app_module.model is None or app_module.encoder is None:
+        sys.exit("ML models not loaded; check models/*.pkl")
+
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "results": run_pipeline_benchmarks(app_module, batch_sizes, args),
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for stage, batch_size, old, new in regressions:
+            print(f"REGRESSION {stage} batch={batch_size}: {old * 1000:.3f} ms -> {new * 1000:.3f} ms "
+                  f"(+{(new / old - 1) * 100:.0f}%)")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions above {args.threshold:.0%} against {baseline['meta'].get('commit')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+/api/predict and /api/predict/batch throughput at 1, 4 and 16 concurrent clients,
+with inference in the request threads versus in inference processes fed through
+shared memory (INFERENCE_SERVER_ENABLED).
+
+    python benchmarks/inference_server.py --processes 4 --seconds 10
+    python benchmarks/inference_server.py --clients 1 4 16 --batch-size 100 --save
+
+Runs in one process through the Flask test client, so it measures what a
+gunicorn worker can do with its threads; predictions are not saved unless
+--save is given (mongomock inserts would dominate). Probabilities from both
+modes are compared on a sample batch first.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Let every client thread reach the model; the benchmark measures inference, not shedding
+os.environ.setdefault("INFERENCE_MAX_CONCURRENT", "64")
+os.environ.setdefault("INFERENCE_QUEUE_TIMEOUT", "60")
+
+from _harness import load_app, login  # noqa: E402
+from inference_pipeline import synthetic_customers  # noqa: E402
+
+
+def run(app_module, headers, path, bodies, clients, seconds):
+    """Requests per second over ``seconds`` with ``clients`` threads posting ``bodies`` round-robin"""
+    deadline = time.perf_counter() + seconds
+
+    def client(offset):
+        test_client = app_module.app.test_client()
+        count = 0
+        while time.perf_counter() < deadline:
+            response = test_client.post(path, json=bodies[(offset + count) % len(bodies)], headers=headers)
+            assert response.status_code == 200, response.get_json()
+            count += 1
+        return count
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        total = sum(pool.map(client, range(clients)))
+    return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--save", action="store_true", help="also insert predictions (mongomock)")
+    args = parser.parse_args()
+
+    app_module = load_app()
+    from services.inference_service import InferencePool
+
+    pool = InferencePool(app_module.model_file, app_module.EXPECTED_COLUMNS, processes=args.processes)
+    pool.start()
+    if not args.save:
+        app_module.predictions_collection = None
+
+    client = app_module.app.test_client()
+    headers = {"Authorization": f"Bearer {login(client)}"}
+    rng = random.Random(7)
+    singles = synthetic_customers(200, rng)
+    batches = [{"customers": synthetic_customers(args.batch_size, rng)} for _ in range(20)]
+
+    frame = app_module.scale_features(app_module.build_feature_frame(
+        [app_module.map_customer_columns(c) for c in synthetic_customers(10000, rng)]
+    ))
+    expected = app_module.model.predict_proba(frame)[:, 1]
+    difference = float(np.max(np.abs(pool.predict(frame) - expected)))
+    print(f"processes={args.processes} cpus={os.cpu_count()} batch_size={args.batch_size} "
+          f"max |in-thread - pool| over 10000 rows = {difference:.2e}")
+
+    print(f"{'endpoint':<8} {'clients':>7} {'in-thread req/s':>16} {'pool req/s':>11} {'speedup':>8}")
+    for label, path, bodies in (("predict", "/api/predict", singles), ("batch", "/api/predict/batch", batches)):
+        for clients in args.clients:
+            app_module.inference_pool = None
+            in_thread = run(app_module, headers, path, bodies, clients, args.seconds)
+            app_module.inference_pool = pool
+            pooled = run(app_module, headers, path, bodies, clients, args.seconds)
+            print(f"{label:<8} {clients:>7} {in_thread:>16.1f} {pooled:>11.1f} {pooled / in_thread:>7.2f}x")
+
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Serialization cost of typical API payloads with Flask's default provider,
+FastJSONProvider on the stdlib fallback, and FastJSONProvider on orjson.
+
+Payloads: a /api/history page (100 predictions with customerData and
+shapValues) and a 10 000-row batch-prediction result carrying numpy floats,
+ObjectIds and datetimes.
+
+    python benchmarks/json_serialization.py
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import services.json_provider as json_provider  # noqa: E402
+from inference_pipeline import synthetic_customers  # noqa: E402
+
+
+def history_page(rng, size=100):
+    return {"success": True, "data": {
+        "predictions": [{
+            "id": str(ObjectId()),
+            "timestamp": datetime.utcnow().isoformat(),
+            "customerData": customer,
+            "prediction": "Churn",
+            "probability": float(rng.random()),
+            "riskLevel": "High",
+            "shapValues": [
+                {"feature": name, "value": float(rng.normal()), "impact": "positive"}
+                for name in ("Monthly Charges", "Tenure", "Contract Type", "Payment Method", "Online Security")
+            ],
+        } for customer in synthetic_customers(size, random.Random(1))],
+        "total": 5000, "page": 1, "limit": size, "totalPages": 50,
+    }}
+
+
+def batch_result(rng, size=10000):
+    probabilities = rng.random(size).astype(np.float32)
+    return {"success": True, "data": {"results": [{
+        "_id": ObjectId(),
+        "timestamp": datetime.utcnow(),
+        "probability": probability,
+        "prediction": "Churn" if probability > 0.5 else "No Churn",
+    } for probability in probabilities]}}
+
+
+def to_plain(obj):
+    """What callers must do by hand before handing a payload to the default provider"""
+    if isinstance(obj, dict):
+        return {k: to_plain(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [to_plain(v) for v in obj]
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return obj
+
+
+def timed(func, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    payloads = {"history page (100)": history_page(rng), "batch result (10k)": batch_result(rng)}
+
+    app = Flask(__name__)
+    default = DefaultJSONProvider(app)
+    fast = json_provider.FastJSONProvider(app)
+    orjson_module = json_provider.orjson
+
+    with app.app_context():
+        for name, payload in payloads.items():
+            results = [("flask default (+ manual conversion)",
+                        timed(lambda: default.response(to_plain(payload)), args.repeats))]
+            json_provider.orjson = None
+            results.append(("FastJSONProvider, stdlib", timed(lambda: fast.response(payload), args.repeats)))
+            json_provider.orjson = orjson_module
+            if orjson_module is not None:
+                results.append(("FastJSONProvider, orjson", timed(lambda: fast.response(payload), args.repeats)))
+
+            size = len(fast.response(payload).get_data())
+            print(f"{name} ({size / 1024:.0f} KiB)")
+            baseline = results[0][1]
+            for label, seconds in results:
+                print(f"  {label:38s} {seconds * 1000:8.2f} ms  {baseline / seconds:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+End-to-end load test: starts the app under gunicorn with a MongoDB stand-in
+and a fake SMTP server, drives a weighted traffic mix, and reports throughput
+and p50/p95/p99 latency per endpoint. Needs no network access.
+
+    python benchmarks/loadtest.py --duration 30 --clients 16 --workers 1 --threads 8 \\
+        --mix login=1,verify=2,predict=6,history=3,dashboard=2
+
+Pass --mongo-uri mongodb://localhost:27017 to use a local mongod instead of
+mongomock (required for consistent data with --workers > 1).
+
+Predictions carry a customerId, so their latency includes the rollup and
+top-risk index writes. After the run the trend rollups written under load are
+compared with a full recompute (what ``flask rollups-check`` does); a mismatch fails the run.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _harness import BACKEND_DIR  # noqa: E402
+from fake_smtp import FakeSMTPServer, self_signed_certificate  # noqa: E402
+from inference_pipeline import synthetic_customers  # noqa: E402
+
+DEFAULT_MIX = "login=1,verify=2,predict=6,history=3,dashboard=2"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ApiClient:
+    """Keep-alive HTTP client for one simulated user"""
+
+    def __init__(self, port):
+        self.port = port
+        self.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        self.token = None
+
+    def request(self, method, path, body=None):
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        payload = json.dumps(body) if body is not None else None
+        try:
+            self.conn.request(method, path, body=payload, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+        except (http.client.HTTPException, OSError):
+            self.conn.close()
+            self.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+            raise
+        return response.status, data
+
+
+class Scenario:
+    """The traffic mix; each action returns the status code of its request"""
+
+    def __init__(self, email, password, rng):
+        self.email = email
+        self.password = password
+        self.rng = rng
+
+    def login(self, client):
+        status, data = client.request("POST", "/api/auth/login", {"email": self.email, "password": self.password})
+        if status == 200:
+            client.token = json.loads(data)["data"]["token"]
+        return status
+
+    def verify(self, client):
+        return client.request("GET", "/api/auth/verify")[0]
+
+    def predict(self, client):
+        # A customerId puts each prediction through the top-risk index as well as the rollups
+        customer = {**synthetic_customers(1, self.rng)[0], "customerId": f"CUST-{self.rng.randrange(1000):04d}"}
+        return client.request("POST", "/api/predict", customer)[0]
+
+    def history(self, client):
+        page = self.rng.randint(1, 5)
+        return client.request("GET", f"/api/history?page={page}&limit=10")[0]
+
+    def dashboard(self, client):
+        return client.request("GET", "/api/dashboard/stats")[0]
+
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(","):
+        name, weight = part.split("=")
+        if not hasattr(Scenario, name):
+            raise SystemExit(f"Unknown action in --mix: {name}")
+        mix[name] = float(weight)
+    return mix
+
+
+def start_server(args, smtp_port):
+    port = free_port()
+    env = dict(os.environ)
+    env.update({
+        "SECRET_KEY": "loadtest-secret",
+        "FLASK_ENV": "production",
+        "SMTP_SERVER": "127.0.0.1",
+        "SMTP_PORT": str(smtp_port),
+        "SMTP_USERNAME": "loadtest",
+        "SMTP_PASSWORD": "loadtest",
+        "FROM_EMAIL": "loadtest@churnpredict.local",
+    })
+    # Every simulated client shares one account and IP; measure capacity, not the limiter
+    env.setdefault("RATE_LIMIT_ENABLED", "false")
+    if args.mongo_uri:
+        env["LOADTEST_MONGO_URI"] = args.mongo_uri
+    command = [
+        sys.executable, "-m", "gunicorn", "--chdir", os.path.join(BACKEND_DIR, "benchmarks"),
+        "loadtest_app:app", "--bind", f"127.0.0.1:{port}",
+        "--workers", str(args.workers), "--threads", str(args.threads),
+        "--log-level", "warning", "--timeout", "120",
+    ]
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL if args.quiet else None,
+                               stderr=subprocess.DEVNULL if args.quiet else None)
+
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit("gunicorn exited during startup")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/api/health")
+            if conn.getresponse().status == 200:
+                return process, port
+        except OSError:
+            time.sleep(0.5)
+    process.terminate()
+    raise SystemExit("gunicorn did not become healthy within 120 s")
+
+
+def run_load(port, args, mix):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def user(index):
+        rng = random.Random(args.seed + index)
+        email = f"loadtest{index}@churnpredict.local"
+        scenario = Scenario(email, "loadtest-password", rng)
+        client = ApiClient(port)
+        try:
+            client.request("POST", "/api/auth/register", {"name": f"Load Test {index}", "email": email,
+                                                          "password": "loadtest-password"})
+            if scenario.login(client) != 200:
+                raise RuntimeError(f"login failed for {email}")
+            for _ in range(args.seed_predictions):
+                scenario.predict(client)
+            ready.wait()
+        except Exception as e:
+            # Release everyone else (and the main thread) instead of leaving them on the barrier
+            if not isinstance(e, threading.BrokenBarrierError):
+                setup_errors.append(f"user {index}: {type(e).__name__}: {e}")
+            ready.abort()
+            return
+
+        while not stop.is_set():
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                status = getattr(scenario, name)(client)
+            except (http.client.HTTPException, OSError):
+                status = None
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples[name].append(elapsed)
+                if status is None or status >= 400:
+                    errors[name] += 1
+
+    setup_errors = []
+    ready = threading.Barrier(args.clients + 1)
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    try:
+        ready.wait(timeout=args.setup_timeout)
+    except threading.BrokenBarrierError:
+        stop.set()
+        ready.abort()
+        raise SystemExit("client setup failed: " + ("; ".join(setup_errors[:3]) or
+                                                    f"not ready within {args.setup_timeout:.0f} s"))
+    started = time.perf_counter()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=60)
+    elapsed = time.perf_counter() - started
+
+    report = {}
+    for name in names:
+        ms = np.array(samples[name]) * 1000
+        report[name] = {
+            "requests": int(len(ms)),
+            "errors": errors[name],
+            "throughput_rps": len(ms) / elapsed,
+            "p50_ms": float(np.percentile(ms, 50)) if len(ms) else None,
+            "p95_ms": float(np.percentile(ms, 95)) if len(ms) else None,
+            "p99_ms": float(np.percentile(ms, 99)) if len(ms) else None,
+        }
+    report["total"] = {
+        "requests": sum(r["requests"] for r in report.values()),
+        "errors": sum(errors.values()),
+        "throughput_rps": sum(len(s) for s in samples.values()) / elapsed,
+    }
+    return report
+
+
+def check_rollups(port):
+    """Rollup buckets that differ from a recompute of the predictions (one worker's view with mongomock)"""
+    status, data = ApiClient(port).request("GET", "/_loadtest/rollups-check")
+    if status != 200:
+        raise SystemExit(f"rollups-check failed with HTTP {status}")
+    return json.loads(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--clients", type=int, default=16, help="concurrent simulated users")
+    parser.add_argument("--workers", type=int, default=1, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="comma-separated action=weight pairs")
+    parser.add_argument("--seed-predictions", type=int, default=20, help="predictions created per user before timing")
+    parser.add_argument("--setup-timeout", type=float, default=300, help="seconds allowed for registering and seeding")
+    parser.add_argument("--mongo-uri", help="use this MongoDB instead of mongomock")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    parser.add_argument("--quiet", action="store_true", help="hide gunicorn output")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    with tempfile.TemporaryDirectory() as tmp:
+        certfile, keyfile = self_signed_certificate(tmp)
+        smtp = FakeSMTPServer(certfile=certfile, keyfile=keyfile).start()
+        process, port = start_server(args, smtp.port)
+        try:
+            report = run_load(port, args, mix)
+            rollups = check_rollups(port)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+            smtp.shutdown()
+
+    print(f"clients={args.clients} workers={args.workers} threads={args.threads} duration={args.duration}s "
+          f"mongo={'mongomock' if not args.mongo_uri else args.mongo_uri} emails={smtp.messages}")
+    print(f"{'endpoint':10s} {'requests':>9s} {'errors':>7s} {'req/s':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s}")
+    for name in mix:
+        r = report[name]
+        if not r["requests"]:
+            continue
+        print(f"{name:10s} {r['requests']:9d} {r['errors']:7d} {r['throughput_rps']:8.1f} "
+              f"{r['p50_ms']:8.1f} {r['p95_ms']:8.1f} {r['p99_ms']:8.1f}")
+    total = report["total"]
+    print(f"{'total':10s} {total['requests']:9d} {total['errors']:7d} {total['throughput_rps']:8.1f}")
+    print(f"rollups-check: {'ok' if not rollups['mismatches'] else str(rollups['mismatches']) + ' buckets differ'}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "emails": smtp.messages, "endpoints": report, "rollups": rollups}, f, indent=2)
+    if rollups["mismatches"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""
+WSGI entry point used by loadtest.py: ``gunicorn --chdir benchmarks loadtest_app:app``.
+
+Uses mongomock unless LOADTEST_MONGO_URI points at a real (e.g. local) mongod.
+mongomock is per process, so with several gunicorn workers each worker sees
+only the data written through it.
+"""
+import os
+
+from _harness import load_app
+
+mongo_uri = os.getenv("LOADTEST_MONGO_URI")
+if mongo_uri:
+    os.environ["MONGO_URI"] = mongo_uri
+
+app_module = load_app(quiet=False, use_mongomock=not mongo_uri)
+app = app_module.app
+
+
+@app.route("/_loadtest/rollups-check", methods=["GET"])
+def rollups_check():
+    """``flask rollups-check`` for the worker's own (mongomock) database, so loadtest.py can verify it"""
+    mismatches = app_module.rollup_store.check(app_module.predictions_collection,
+                                               archived=app_module.archived_records())
+    return {"mismatches": len(mismatches), "sample": mismatches[:5]}
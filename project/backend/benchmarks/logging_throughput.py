@@ -0,0 +1,90 @@
+"""
+Caller-side cost of request-path logging: the previous synchronous
+StreamHandler setup (basicConfig + eager f-strings) versus the queue handler
+with a background listener and lazy %-formatting, with several threads
+logging concurrently to a file.
+
+    python benchmarks/logging_throughput.py --threads 8 --records 20000
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.logging_service import TEXT_FORMAT, configure_logging  # noqa: E402
+
+CUSTOMER = {"contract": "Month-to-month", "monthlyCharges": 80, "tenure": 3, "paymentMethod": "Electronic Check"}
+
+
+def reset_root():
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+
+def drive(threads, records, eager):
+    logger = logging.getLogger("bench")
+    per_thread = records // threads
+
+    def work():
+        for i in range(per_thread):
+            if eager:
+                logger.info(f"✅ Prediction saved for user {i}: {CUSTOMER}")
+                logger.debug(f"🔍 Extracted values - {CUSTOMER}")
+            else:
+                logger.info("✅ Prediction saved for user %s: %s", i, CUSTOMER, extra={"sampled": True})
+                logger.debug("🔍 Extracted values - %s", CUSTOMER)
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = []
+
+        with open(os.path.join(tmp, "sync.log"), "w") as stream:
+            reset_root()
+            logging.basicConfig(level=logging.INFO, format=TEXT_FORMAT, stream=stream)
+            results.append(("sync StreamHandler, f-strings", drive(args.threads, args.records, eager=True)))
+
+        for json_format, sample_rate, label in [
+            (False, 1.0, "queue + listener, text"),
+            (True, 1.0, "queue + listener, json"),
+            (False, args.sample_rate, f"queue + listener, sampled {args.sample_rate:g}"),
+        ]:
+            with open(os.path.join(tmp, "queue.log"), "w") as stream:
+                reset_root()
+                listener = configure_logging(logging.INFO, json_format=json_format, queue_size=args.records * 2,
+                                             sample_rate=sample_rate, stream=stream)
+                rate = drive(args.threads, args.records, eager=False)
+                drain_start = time.perf_counter()
+                listener.stop()
+                drain = time.perf_counter() - drain_start
+            results.append((label, rate, drain))
+
+    print(f"threads={args.threads} records={args.records}")
+    for label, rate, *drain in results:
+        suffix = f"  (listener drained backlog in {drain[0] * 1000:.0f} ms)" if drain else ""
+        print(f"{label:34s} {rate:10.0f} records/s on request threads{suffix}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Measure /api/predict latency while a burst of concurrent logins is running,
+with password hashing inline on the request threads versus in the process pool.
+
+    python benchmarks/login_burst.py --duration 10 --login-threads 8 --predict-threads 2
+
+Logins and predictions share one process (Flask test client, mongomock), which
+mirrors a single gunicorn worker running with --threads.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _harness import SAMPLE_CUSTOMER, load_app, login  # noqa: E402
+
+
+def measure(app_module, token, duration, login_threads, predict_threads):
+    stop = threading.Event()
+    latencies = []
+    logins = [0]
+    lock = threading.Lock()
+
+    def login_loop():
+        client = app_module.app.test_client()
+        while not stop.is_set():
+            login(client)
+            with lock:
+                logins[0] += 1
+
+    def predict_loop():
+        client = app_module.app.test_client()
+        headers = {"Authorization": f"Bearer {token}"}
+        while not stop.is_set():
+            start = time.perf_counter()
+            client.post("/api/predict", json=SAMPLE_CUSTOMER, headers=headers)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=login_loop) for _ in range(login_threads)]
+    threads += [threading.Thread(target=predict_loop) for _ in range(predict_threads)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    ms = np.array(latencies) * 1000
+    return {
+        "predictions": len(ms),
+        "logins_per_s": logins[0] / duration,
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p99_ms": float(np.percentile(ms, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--login-threads", type=int, default=8)
+    parser.add_argument("--predict-threads", type=int, default=2)
+    parser.add_argument("--pool-workers", type=int, default=2)
+    args = parser.parse_args()
+
+    app_module = load_app()
+    from services.password_service import PasswordHasher
+
+    method = app_module.app.config["PASSWORD_HASH_METHOD"]
+    token = login(app_module.app.test_client())
+
+    scenarios = [
+        ("no logins", 0, PasswordHasher(method, workers=0)),
+        ("inline hashing", args.login_threads, PasswordHasher(method, workers=0)),
+        ("process pool", args.login_threads, PasswordHasher(method, workers=args.pool_workers)),
+    ]
+    print(f"hash method={method} cpus={os.cpu_count()} duration={args.duration}s")
+    for name, login_threads, hasher in scenarios:
+        app_module.password_hasher = hasher
+        result = measure(app_module, token, args.duration, login_threads, args.predict_threads)
+        hasher.shutdown()
+        print(f"{name:15s} predict p50={result['p50_ms']:7.1f} ms  p99={result['p99_ms']:7.1f} ms  "
+              f"({result['predictions']} predictions, {result['logins_per_s']:.1f} logins/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Per-call overhead of the metrics instrumentation: one stage timer, the
+request hooks (one histogram observation + one counter), and the total for a
+/api/predict request, which records 7 stages on top of the hooks.
+
+    python benchmarks/metrics_overhead.py --iterations 200000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+
+from services.metrics_service import MetricsRegistry  # noqa: E402
+
+PREDICT_STAGES = 7
+
+
+def per_call_us(func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200000)
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+    app = Flask(__name__)
+
+    def empty():
+        pass
+
+    def stage():
+        with registry.stage("predict_proba"):
+            pass
+
+    def request_hooks():
+        registry.observe("churn_request_duration_seconds", 0.004, endpoint="predict")
+        registry.inc("churn_requests_total", endpoint="predict", method="POST", status=200)
+
+    with app.test_request_context("/api/predict", method="POST"):
+        baseline = per_call_us(empty, args.iterations)
+        stage_us = per_call_us(stage, args.iterations) - baseline
+        hooks_us = per_call_us(request_hooks, args.iterations) - baseline
+
+    print(f"stage timer (inside request):  {stage_us:6.2f} us/call")
+    print(f"request hooks:                 {hooks_us:6.2f} us/request")
+    print(f"/api/predict total:            {hooks_us + PREDICT_STAGES * stage_us:6.2f} us/request")
+    start = time.perf_counter()
+    registry.render()
+    render_ms = (time.perf_counter() - start) * 1e3
+    print(f"render ({len(registry.snapshot()['histograms'])} series):            {render_ms:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Count Mongo round trips needed to resolve notification settings for a batch
+of predictions, with and without the per-worker settings cache.
+
+    python benchmarks/settings_cache_roundtrips.py --predictions 10000 --users 200
+"""
+import argparse
+import os
+import random
+import sys
+
+import mongomock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.cache_service import NotificationSettingsCache  # noqa: E402
+
+DEFAULT_SETTINGS = {
+    "emailEnabled": True,
+    "smsEnabled": False,
+    "threshold": "0.7",
+    "frequency": "immediate",
+    "emailAddress": None,
+    "phoneNumber": None
+}
+
+
+class CountingCollection:
+    """Wraps a collection and counts every call that reaches the server"""
+
+    ROUND_TRIP_METHODS = {"find_one", "find", "insert_one", "insert_many", "update_one"}
+
+    def __init__(self, collection):
+        self._collection = collection
+        self.calls = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name in self.ROUND_TRIP_METHODS:
+            def counted(*args, **kwargs):
+                self.calls += 1
+                return attr(*args, **kwargs)
+            return counted
+        return attr
+
+
+def make_batch(num_predictions, num_users):
+    user_ids = [f"user-{i}" for i in range(num_users)]
+    return [
+        {"userId": random.choice(user_ids), "probability": random.random()}
+        for _ in range(num_predictions)
+    ]
+
+
+def uncached_lookup(collection, predictions):
+    """The pre-cache route logic: one find_one per prediction plus an insert per miss"""
+    for prediction in predictions:
+        settings = collection.find_one({"user_id": prediction["userId"]}, {"_id": 0})
+        if not settings:
+            collection.insert_one({"user_id": prediction["userId"], **DEFAULT_SETTINGS})
+
+
+def cached_lookup(cache, predictions):
+    """The route logic with the settings cache: one find_one (plus insert) per user per TTL"""
+    for prediction in predictions:
+        cache.get(prediction["userId"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--predictions", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    predictions = make_batch(args.predictions, args.users)
+
+    baseline = CountingCollection(mongomock.MongoClient().db.notification_settings)
+    uncached_lookup(baseline, predictions)
+
+    cached = CountingCollection(mongomock.MongoClient().db.notification_settings)
+    cache = NotificationSettingsCache(cached, DEFAULT_SETTINGS, maxsize=args.users * 2)
+    cached_lookup(cache, predictions)
+    cold_calls = cached.calls
+    cached_lookup(cache, predictions)
+    warm_calls = cached.calls - cold_calls
+
+    print(f"predictions={args.predictions} users={args.users}")
+    print(f"uncached round trips:          {baseline.calls}")
+    print(f"settings cache, cold:          {cold_calls}")
+    print(f"settings cache, warm:          {warm_calls}")
+    if cold_calls:
+        print(f"reduction (cold):              {baseline.calls / cold_calls:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Original (v1) vs compact (v2) prediction documents: BSON size per document,
+collection size at --rows, and the time to serve one /api/history page.
+
+    python benchmarks/storage_format.py --rows 1000000 --history-rows 20000
+    python benchmarks/storage_format.py --rows 1000000 --mongo-uri mongodb://localhost:27017
+
+Without --mongo-uri, collection size is extrapolated from the mean BSON size
+(uncompressed dataSize; WiredTiger compresses both further) and history is timed
+through the Flask test client on mongomock with --history-rows predictions for
+one user, so it measures fetch + decode + serialization rather than disk reads.
+With --mongo-uri, --rows documents of each schema are written to scratch
+databases, collStats is reported and history pages are read with the real
+(userId, timestamp) index; the scratch databases are dropped afterwards.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import bson
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _harness import load_app, login  # noqa: E402
+from http_caching import seed_predictions  # noqa: E402
+
+
+def documents(app_module, user_id, count, rng, compact):
+    """Seeded v1 documents, encoded to v2 when ``compact``"""
+    collection = app_module.predictions_collection
+    collection.delete_many({})
+    seed_predictions(app_module, user_id, count, rng)
+    docs = list(collection.find({}))
+    collection.delete_many({})
+    return [app_module.prediction_codec.encode(d) for d in docs] if compact else docs
+
+
+def mean_bson_size(docs):
+    return statistics.mean(len(bson.encode(d)) for d in docs)
+
+
+def time_history(client, headers, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        response = client.get("/api/history?limit=100", headers=headers)
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.status_code
+    return statistics.median(samples)
+
+
+def run_mongomock(app_module, args):
+    client = app_module.app.test_client()
+    token = login(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    user_id = str(app_module.users_collection.find_one({"email": "admin@churnpredict.com"})["_id"])
+
+    print(f"rows={args.rows:,} (extrapolated) history_rows={args.history_rows:,}")
+    for label, compact in (("v1", False), ("v2", True)):
+        docs = documents(app_module, user_id, args.history_rows, random.Random(7), compact)
+        size = mean_bson_size(docs)
+        app_module.predictions_collection.insert_many(docs)
+        elapsed = time_history(client, headers, args.repeats)
+        app_module.predictions_collection.delete_many({})
+        print(f"  {label}  {size:7.1f} B/doc  {size * args.rows / 2 ** 20:9.1f} MiB collection  "
+              f"{elapsed * 1000:7.2f} ms/history page")
+
+
+def run_mongo(app_module, args):
+    import pymongo
+    client = pymongo.MongoClient(args.mongo_uri)
+    user_id = "storage-benchmark"
+    sample = {
+        label: documents(app_module, user_id, args.batch, random.Random(7), compact)
+        for label, compact in (("v1", False), ("v2", True))
+    }
+    print(f"rows={args.rows:,}")
+    for label, batch in sample.items():
+        database = client[f"churn_storage_bench_{label}"]
+        collection = database.predictions
+        collection.drop()
+        collection.create_index([("userId", 1), ("timestamp", -1)])
+        for _ in range(0, args.rows, args.batch):
+            collection.insert_many([{k: v for k, v in d.items() if k != "_id"} for d in batch], ordered=False)
+        stats = database.command("collStats", "predictions")
+        samples = []
+        for page in range(args.repeats):
+            start = time.perf_counter()
+            rows = list(collection.find({"userId": user_id}).sort("timestamp", -1).skip(page * 100).limit(100))
+            [app_module.format_history_record(r) for r in rows]
+            samples.append(time.perf_counter() - start)
+        print(f"  {label}  {stats['avgObjSize']:7.1f} B/doc  {stats['size'] / 2 ** 20:9.1f} MiB data  "
+              f"{stats['storageSize'] / 2 ** 20:9.1f} MiB on disk  "
+              f"{statistics.median(samples) * 1000:7.2f} ms/history page")
+        client.drop_database(database.name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--history-rows", type=int, default=20000, help="predictions seeded for mongomock timing")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=10000, help="insert batch size with --mongo-uri")
+    parser.add_argument("--mongo-uri", help="measure against a real MongoDB instead of extrapolating")
+    args = parser.parse_args()
+
+    app_module = load_app()
+    if args.mongo_uri:
+        run_mongo(app_module, args)
+    else:
+        run_mongomock(app_module, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Measure /api/auth/verify requests per second and users-collection reads per
+request, comparing the legacy path (token without identity claims, no user
+cache, one find_one per request) against the per-worker user cache, which reads
+each user at most once per USER_CACHE_TTL.
+
+    python benchmarks/verify_throughput.py --requests 5000 --threads 8
+
+Runs against mongomock, so the "before" figure understates the real cost:
+with a networked MongoDB each read also adds a server round trip.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _harness import load_app, login  # noqa: E402
+
+
+def run(app_module, token, num_requests, threads):
+    headers = {"Authorization": f"Bearer {token}"}
+    per_thread = num_requests // threads
+
+    def worker(_):
+        client = app_module.app.test_client()
+        for _ in range(per_thread):
+            response = client.get("/api/auth/verify", headers=headers)
+            assert response.status_code == 200, response.get_json()
+
+    reads_before = app_module.user_resolver.db_reads
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, range(threads)))
+    elapsed = time.perf_counter() - start
+    total = per_thread * threads
+    reads = app_module.user_resolver.db_reads - reads_before
+    return total / elapsed, reads / total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    app_module = load_app()
+    from flask_jwt_extended import create_access_token
+    from services.auth_service import UserResolver
+
+    client = app_module.app.test_client()
+    claims_token = login(client)
+    admin = app_module.users_collection.find_one({"email": "admin@churnpredict.com"})
+    with app_module.app.app_context():
+        legacy_token = create_access_token(identity=str(admin["_id"]))
+
+    resolver = app_module.user_resolver
+    app_module.user_resolver = UserResolver(app_module.users_collection, ttl=0)
+    before_rps, before_reads = run(app_module, legacy_token, args.requests, args.threads)
+    app_module.user_resolver = resolver
+    after_rps, after_reads = run(app_module, claims_token, args.requests, args.threads)
+
+    print(f"requests={args.requests} threads={args.threads}")
+    print(f"before (find_one per request):  {before_rps:8.0f} req/s  {before_reads:.3f} users reads/request")
+    print(f"after  (per-worker user cache): {after_rps:8.0f} req/s  {after_reads:.3f} users reads/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Latency of /api/predict/what-if for growing grids, through the Flask test client
+with the real model. Grids vary numeric fields only, so every point is a distinct
+model row (the worst case); categorical variations whose values encode alike are
+scored once.
+
+    python benchmarks/what_if.py --repeats 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _harness import SAMPLE_CUSTOMER, load_app, login  # noqa: E402
+
+GRIDS = {
+    1000: {"monthlyCharges": {"start": 20, "stop": 119, "step": 1}, "tenure": {"start": 0, "stop": 9, "step": 1}},
+    10000: {"monthlyCharges": {"start": 20, "stop": 119, "step": 1}, "tenure": {"start": 0, "stop": 99, "step": 1}},
+    43200: {
+        "contract": ["Month-to-month", "One year", "Two year"],
+        "monthlyCharges": {"start": 20, "stop": 119.5, "step": 0.5},
+        "tenure": {"start": 0, "stop": 71, "step": 1},
+    },
+    50000: {"monthlyCharges": {"start": 20, "stop": 119.8, "step": 0.2}, "tenure": {"start": 0, "stop": 99, "step": 1}},
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    app_module = load_app()
+    app_module.app.config['WHAT_IF_MAX_POINTS'] = max(GRIDS)
+    client = app_module.app.test_client()
+    headers = {"Authorization": f"Bearer {login(client)}"}
+
+    for points, variations in GRIDS.items():
+        samples = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            response = client.post("/api/predict/what-if", json={"customer": SAMPLE_CUSTOMER, "variations": variations},
+                                   headers=headers)
+            samples.append(time.perf_counter() - start)
+        data = response.get_json()["data"]
+        print(f"points={points:<6d} scored={data['scoredRows']:<6d} {len(response.get_data()):8d} bytes  "
+              f"{statistics.median(samples) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import timedelta
 from dotenv import load_dotenv
 load_dotenv()
@@ -25,6 +26,141 @@ class Config:
     TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN')
     TWILIO_PHONE_NUMBER = os.getenv('TWILIO_PHONE_NUMBER')
 
+    # Notification settings cache (per worker)
+    SETTINGS_CACHE_MAXSIZE = int(os.getenv('SETTINGS_CACHE_MAXSIZE', 10000))
+    SETTINGS_CACHE_TTL = float(os.getenv('SETTINGS_CACHE_TTL', 300))
+
+    # Authenticated user cache (per worker)
+    USER_CACHE_MAXSIZE = int(os.getenv('USER_CACHE_MAXSIZE', 10000))
+    USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', 60))
+
+    # Password hashing: any werkzeug method string, e.g. "scrypt" or "pbkdf2:sha256:600000"
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+
+    # Metrics: set METRICS_DIR to a shared directory to aggregate across gunicorn workers
+    METRICS_DIR = os.getenv('METRICS_DIR')
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+
+    # On-demand sampling profiler output
+    PROFILE_DIR = os.getenv('PROFILE_DIR') or os.path.join(tempfile.gettempdir(), 'churn-profiles')
+    PROFILE_MAX_DURATION = float(os.getenv('PROFILE_MAX_DURATION', 60))
+    PROFILE_MAX_REQUESTS = int(os.getenv('PROFILE_MAX_REQUESTS', 1000))
+
+    # Logging: LOG_FORMAT is "text" or "json"; LOG_SAMPLE_RATE applies to per-prediction records
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+    LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', 1.0))
+
+    # Response compression (gzip, or brotli when the module is installed)
+    COMPRESS_ENABLED = os.getenv('COMPRESS_ENABLED', 'true').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))
+
+    # Readiness checks run in the background every HEALTH_CHECK_INTERVAL seconds
+    HEALTH_CHECK_INTERVAL = float(os.getenv('HEALTH_CHECK_INTERVAL', 10))
+
+    # MongoDB client (created lazily in each worker); timeouts in milliseconds
+    MONGO_DB_NAME = os.getenv('MONGO_DB_NAME', 'churn_prediction')
+    MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', 50))
+    MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', 0))
+    MONGO_MAX_IDLE_TIME_MS = int(os.getenv('MONGO_MAX_IDLE_TIME_MS', 300000))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 2000))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 5000))
+    MONGO_SOCKET_TIMEOUT_MS = int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', 10000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000))
+    MONGO_COMPRESSORS = os.getenv('MONGO_COMPRESSORS', 'zstd,snappy,zlib')
+    MONGO_READ_PREFERENCE = os.getenv('MONGO_READ_PREFERENCE', 'primary')
+    MONGO_READ_CONCERN = os.getenv('MONGO_READ_CONCERN', 'local')
+    MONGO_WRITE_CONCERN = os.getenv('MONGO_WRITE_CONCERN', '1')
+    MONGO_WRITE_TIMEOUT_MS = int(os.getenv('MONGO_WRITE_TIMEOUT_MS', 5000))
+    # Seconds to fail fast after a connection error before trying MongoDB again
+    MONGO_RETRY_INTERVAL = float(os.getenv('MONGO_RETRY_INTERVAL', 5))
+
+    # History deletion jobs and retention (0 days keeps predictions forever)
+    HISTORY_DELETE_CHUNK_SIZE = int(os.getenv('HISTORY_DELETE_CHUNK_SIZE', 1000))
+    HISTORY_DELETE_PAUSE = float(os.getenv('HISTORY_DELETE_PAUSE', 0.05))
+    PREDICTION_RETENTION_DAYS = int(os.getenv('PREDICTION_RETENTION_DAYS', 0))
+
+    # Cold storage: predictions older than ARCHIVE_AFTER_DAYS move to Parquet under ARCHIVE_DIR
+    ARCHIVE_DIR = os.getenv('ARCHIVE_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'archive')
+    ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 180))
+    ARCHIVE_ROW_GROUP_SIZE = int(os.getenv('ARCHIVE_ROW_GROUP_SIZE', 10000))
+
+    # Inference admission control (per worker): at most INFERENCE_MAX_CONCURRENT requests run
+    # the model, INFERENCE_MAX_QUEUE more wait up to INFERENCE_QUEUE_TIMEOUT seconds
+    INFERENCE_MAX_CONCURRENT = int(os.getenv('INFERENCE_MAX_CONCURRENT', os.cpu_count() or 1))
+    INFERENCE_MAX_QUEUE = int(os.getenv('INFERENCE_MAX_QUEUE', 32))
+    INFERENCE_QUEUE_TIMEOUT = float(os.getenv('INFERENCE_QUEUE_TIMEOUT', 2.0))
+    PREDICT_BATCH_MAX_SIZE = int(os.getenv('PREDICT_BATCH_MAX_SIZE', 1000))
+    WHAT_IF_MAX_POINTS = int(os.getenv('WHAT_IF_MAX_POINTS', 50000))
+
+    # Inference server mode: INFERENCE_SERVER_PROCESSES processes per worker score the default
+    # model, fed through shared-memory slots of INFERENCE_SERVER_SLOT_ROWS rows each
+    INFERENCE_SERVER_ENABLED = os.getenv('INFERENCE_SERVER_ENABLED', 'false').lower() == 'true'
+    INFERENCE_SERVER_PROCESSES = int(os.getenv('INFERENCE_SERVER_PROCESSES', os.cpu_count() or 1))
+    INFERENCE_SERVER_SLOT_ROWS = int(os.getenv('INFERENCE_SERVER_SLOT_ROWS', 4096))
+    INFERENCE_SERVER_TIMEOUT = float(os.getenv('INFERENCE_SERVER_TIMEOUT', 30))
+
+    # Per-tenant models (model.pkl, encoder.pkl, optional scaler.pkl) under TENANT_MODELS_DIR/<tenant>/,
+    # for users whose document has a "tenant"; each worker keeps the most recently used bundles up to
+    # TENANT_MODELS_MAX_MB (estimated) and drops those idle for TENANT_MODELS_IDLE_SECONDS. Tenants
+    # without a directory or with unloadable models are rechecked every TENANT_MODELS_RETRY_SECONDS
+    TENANT_MODELS_DIR = os.getenv('TENANT_MODELS_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'tenants')
+    TENANT_MODELS_MAX_MB = int(os.getenv('TENANT_MODELS_MAX_MB', 1024))
+    TENANT_MODELS_IDLE_SECONDS = float(os.getenv('TENANT_MODELS_IDLE_SECONDS', 3600))
+    TENANT_MODELS_RETRY_SECONDS = float(os.getenv('TENANT_MODELS_RETRY_SECONDS', 30))
+
+    # Token-bucket rate limits per endpoint, keyed by JWT identity (client IP when anonymous):
+    # "<count>/<second|minute|hour|day>[:burst]", empty to disable one. RATE_LIMIT_STORAGE "file"
+    # shares buckets between the workers on a host through RATE_LIMIT_FILE; "memory" is per worker
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_STORAGE = os.getenv('RATE_LIMIT_STORAGE', 'file')
+    RATE_LIMIT_FILE = os.getenv('RATE_LIMIT_FILE') or os.path.join(tempfile.gettempdir(), 'churn-rate-limits.bin')
+    RATE_LIMIT_SLOTS = int(os.getenv('RATE_LIMIT_SLOTS', 65536))
+    # Behind a reverse proxy, take the client IP from X-Forwarded-For
+    RATE_LIMIT_TRUST_FORWARDED = os.getenv('RATE_LIMIT_TRUST_FORWARDED', 'false').lower() == 'true'
+    RATE_LIMITS = {
+        'login': os.getenv('RATE_LIMIT_LOGIN', '10/minute:5'),
+        'register': os.getenv('RATE_LIMIT_REGISTER', '5/hour:3'),
+        'predict': os.getenv('RATE_LIMIT_PREDICT', '120/minute:30'),
+        'predict_batch': os.getenv('RATE_LIMIT_PREDICT_BATCH', '10/minute:5'),
+        'predict_what_if': os.getenv('RATE_LIMIT_PREDICT_WHAT_IF', '30/minute:10'),
+    }
+
+    # Idempotency-Key on prediction endpoints: responses are kept IDEMPOTENCY_TTL_SECONDS;
+    # duplicates wait up to IDEMPOTENCY_WAIT_SECONDS for the original (then 409), and a claim
+    # left pending longer than IDEMPOTENCY_LEASE_SECONDS (crashed worker) can be taken over
+    IDEMPOTENCY_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_TTL_SECONDS', 86400))
+    IDEMPOTENCY_WAIT_SECONDS = float(os.getenv('IDEMPOTENCY_WAIT_SECONDS', 10))
+    IDEMPOTENCY_LEASE_SECONDS = float(os.getenv('IDEMPOTENCY_LEASE_SECONDS', 60))
+    # Per-worker replay cache: at most IDEMPOTENCY_CACHE_MB of bodies, and with MongoDB only
+    # bodies up to IDEMPOTENCY_CACHE_MAX_BODY_KB (larger ones are replayed from the database)
+    IDEMPOTENCY_CACHE_MB = int(os.getenv('IDEMPOTENCY_CACHE_MB', 64))
+    IDEMPOTENCY_CACHE_MAX_BODY_KB = int(os.getenv('IDEMPOTENCY_CACHE_MAX_BODY_KB', 64))
+
+    # Live prediction feed (/api/stream): each open stream holds a server thread, so keep
+    # STREAM_MAX_PER_WORKER below the worker's thread count. Per-stream buffers hold
+    # STREAM_BUFFER_SIZE events; beyond that events are dropped and the client told to resync
+    STREAM_MAX_PER_WORKER = int(os.getenv('STREAM_MAX_PER_WORKER', 8))
+    STREAM_BUFFER_SIZE = int(os.getenv('STREAM_BUFFER_SIZE', 64))
+    STREAM_HEARTBEAT_SECONDS = float(os.getenv('STREAM_HEARTBEAT_SECONDS', 15))
+    STREAM_STATS_INTERVAL = float(os.getenv('STREAM_STATS_INTERVAL', 2))
+    STREAM_MAX_SECONDS = float(os.getenv('STREAM_MAX_SECONDS', 600))
+
+    # Top-risk customer list: largest k served, and how long workers cache each user's list
+    TOP_RISK_MAX_K = int(os.getenv('TOP_RISK_MAX_K', 100))
+    TOP_RISK_CACHE_TTL = float(os.getenv('TOP_RISK_CACHE_TTL', 10))
+
+    # Prediction document schema for new writes: 2 packs customer data and SHAP values
+    # into float32 binary (reads understand both), 1 writes the original layout
+    STORAGE_SCHEMA_VERSION = int(os.getenv('STORAGE_SCHEMA_VERSION', 2))
+    # Client-supplied strings get dictionary codes only up to this many per field and this
+    # length; others are stored as plain strings
+    DICTIONARY_MAX_VALUES = int(os.getenv('DICTIONARY_MAX_VALUES', 1000))
+    DICTIONARY_MAX_VALUE_LENGTH = int(os.getenv('DICTIONARY_MAX_VALUE_LENGTH', 64))
+
 class DevelopmentConfig(Config):
     DEBUG = True
     FLASK_ENV = 'development'
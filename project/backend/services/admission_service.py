@@ -0,0 +1,156 @@
+import heapq
+import itertools
+import math
+import threading
+import time
+
+from services.metrics_service import metrics
+
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+
+class AdmissionRejected(Exception):
+    """Raised instead of queueing when the work cannot start in time.
+
+    ``status`` is 429 when the queue is full and 503 when the deadline cannot be
+    met; ``retry_after`` is a whole number of seconds for the Retry-After header.
+    """
+
+    def __init__(self, status, reason, retry_after):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Ticket:
+    __slots__ = ("priority", "granted", "evicted")
+
+    def __init__(self, priority):
+        self.priority = priority
+        self.granted = False
+        self.evicted = False
+
+
+class _Slot:
+    __slots__ = ("controller", "started")
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.started = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.controller._release(time.monotonic() - self.started)
+
+
+class AdmissionController:
+    """Bounded concurrency for model inference with a short priority queue.
+
+    At most ``max_concurrent`` requests run inference at once per worker; up to
+    ``max_queue`` more wait, interactive before batch and FIFO within a priority.
+    A request is rejected up front, rather than left to queue, when the queue is
+    full (429; a queued batch request is evicted instead when an interactive one
+    arrives) or when the estimated wait, from a moving average of inference time,
+    would pass its deadline (503). Waiters whose deadline expires are rejected too.
+    """
+
+    def __init__(self, max_concurrent, max_queue, timeout, name="inference"):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self.name = name
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = []  # heap of (priority, sequence, ticket)
+        self._sequence = itertools.count()
+        self._service_time = 0.05  # EWMA of seconds per admitted request
+
+    def admit(self, priority=INTERACTIVE, timeout=None):
+        """Wait for an inference slot; use the result as a context manager"""
+        started = time.monotonic()
+        deadline = started + min(timeout, self.timeout) if timeout else started + self.timeout
+        label = PRIORITY_NAMES[priority]
+        with self._cond:
+            if self._active < self.max_concurrent and not self._waiting:
+                self._active += 1
+                self._publish()
+                ticket = None
+            else:
+                victim = None
+                if len(self._waiting) >= self.max_queue:
+                    victim = self._victim_for(priority)
+                    if victim is None:
+                        self._reject(429, "queue_full", label, self._estimated_wait(len(self._waiting)))
+                ticket = self._enqueue(priority, label, started, deadline, victim)
+
+        if ticket is not None:
+            self._await(ticket, label, deadline)
+
+        metrics.observe("churn_admission_wait_seconds", time.monotonic() - started, pool=self.name, priority=label)
+        return _Slot(self)
+
+    def _enqueue(self, priority, label, started, deadline, victim=None):
+        # Check the deadline before evicting: a batch waiter is never dropped for a request refused anyway
+        ahead = sum(1 for entry in self._waiting if entry[0] <= priority and entry is not victim)
+        estimate = self._estimated_wait(ahead + 1)
+        if started + estimate > deadline:
+            self._reject(503, "deadline", label, estimate)
+        if victim is not None:
+            self._evict(victim)
+        ticket = _Ticket(priority)
+        heapq.heappush(self._waiting, (priority, next(self._sequence), ticket))
+        self._publish()
+        return ticket
+
+    def _await(self, ticket, label, deadline):
+        with self._cond:
+            while not ticket.granted and not ticket.evicted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiting = [entry for entry in self._waiting if entry[2] is not ticket]
+                    heapq.heapify(self._waiting)
+                    self._publish()
+                    self._reject(503, "timeout", label, self._estimated_wait(len(self._waiting)))
+                self._cond.wait(remaining)
+            if ticket.evicted:
+                self._reject(429, "evicted", label, self._estimated_wait(len(self._waiting)))
+
+    def _victim_for(self, priority):
+        """The newest queued batch request, which a full queue gives up for an interactive one"""
+        if priority != INTERACTIVE:
+            return None
+        batch = [entry for entry in self._waiting if entry[0] == BATCH]
+        return max(batch, key=lambda entry: entry[1]) if batch else None
+
+    def _evict(self, victim):
+        victim[2].evicted = True
+        self._waiting.remove(victim)
+        heapq.heapify(self._waiting)
+        self._cond.notify_all()
+
+    def _release(self, duration):
+        with self._cond:
+            self._service_time += 0.2 * (duration - self._service_time)
+            self._active -= 1
+            while self._waiting and self._active < self.max_concurrent:
+                _, _, ticket = heapq.heappop(self._waiting)
+                ticket.granted = True
+                self._active += 1
+            self._publish()
+            self._cond.notify_all()
+
+    def _estimated_wait(self, position):
+        return position * self._service_time / self.max_concurrent
+
+    def _reject(self, status, reason, label, wait):
+        metrics.inc("churn_admission_rejections_total", pool=self.name, reason=reason, priority=label)
+        raise AdmissionRejected(status, reason, max(1, math.ceil(wait)))
+
+    def _publish(self):
+        metrics.set_gauge("churn_admission_queue_length", len(self._waiting), pool=self.name)
+        metrics.set_gauge("churn_admission_active", self._active, pool=self.name)
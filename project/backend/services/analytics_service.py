@@ -0,0 +1,109 @@
+# Aggregation pipelines behind the dashboard charts. Each builder returns a pipeline
+# over ``predictions`` for one user; the result size depends only on the request
+# parameters (bins, groups, point budget), never on the length of the history.
+# Compact (v2) documents have no ``customerData``; the pipelines read their group
+# codes (``g.<key>``) or packed features instead and the formatters decode them.
+
+GROUPABLE_FIELDS = {
+    "contract": "customerData.contract",
+    "paymentMethod": "customerData.paymentMethod",
+}
+
+MAX_BINS = 100
+MAX_SCATTER_POINTS = 5000
+
+
+def histogram_pipeline(user_id, bins):
+    """Counts per equal-width probability bin; p == 1.0 falls into the last bin"""
+    return [
+        {"$match": {"userId": user_id}},
+        {"$project": {"_id": 0, "bin": {"$min": [{"$floor": {"$multiply": ["$probability", bins]}}, bins - 1]}}},
+        {"$group": {"_id": "$bin", "count": {"$sum": 1}}},
+    ]
+
+
+def format_histogram(rows, bins):
+    counts = {int(row["_id"]): row["count"] for row in rows if row["_id"] is not None}
+    width = 100.0 / bins
+    return [
+        {
+            "bin": f"{i * width:g}-{(i + 1) * width:g}",
+            "lower": round(i / bins, 6),
+            "upper": round((i + 1) / bins, 6),
+            "count": counts.get(i, 0),
+        }
+        for i in range(bins)
+    ]
+
+
+def churn_rate_pipeline(user_id, field, compact_key=None):
+    """Per-group counts; with ``compact_key`` v2 documents group by their dictionary code,
+    or by the raw value kept in ``x`` when it had none"""
+    group = f"${GROUPABLE_FIELDS[field]}"
+    if compact_key:
+        group = {"$ifNull": [group, {"$ifNull": [f"$g.{compact_key}", f"$x.{field}"]}]}
+    return [
+        {"$match": {"userId": user_id}},
+        {"$group": {
+            "_id": group,
+            "total": {"$sum": 1},
+            "churns": {"$sum": {"$cond": [{"$eq": ["$prediction", "Churn"]}, 1, 0]}},
+            "avgProbability": {"$avg": "$probability"},
+        }},
+        {"$sort": {"total": -1}},
+    ]
+
+
+def format_churn_rates(rows, field, decode_code=None):
+    """Rows to API groups; ``decode_code`` maps integer group codes back to values,
+    merging them with groups of the same value from uncompacted documents"""
+    groups = {}
+    for row in rows:
+        value = row["_id"]
+        if decode_code is not None and isinstance(value, int) and not isinstance(value, bool):
+            value = decode_code(value)
+        value = value if value is not None else "Unknown"
+        merged = groups.setdefault(value, {"total": 0, "churns": 0, "probabilitySum": 0.0})
+        merged["total"] += row["total"]
+        merged["churns"] += row["churns"]
+        merged["probabilitySum"] += (row["avgProbability"] or 0.0) * row["total"]
+    return [
+        {
+            field: value,
+            "total": group["total"],
+            "churns": group["churns"],
+            "churnRate": round(group["churns"] / group["total"] * 100, 2) if group["total"] else 0.0,
+            "avgProbability": round(group["probabilitySum"] / group["total"], 4) if group["total"] else 0.0,
+        }
+        for value, group in sorted(groups.items(), key=lambda item: -item[1]["total"])
+    ]
+
+
+def scatter_pipeline(user_id, points):
+    """Uniform random sample of at most ``points`` predictions ($sample keeps a bounded reservoir)"""
+    return [
+        {"$match": {"userId": user_id}},
+        {"$sample": {"size": points}},
+        {"$project": {
+            "_id": 0,
+            "tenure": "$customerData.tenure",
+            "monthlyCharges": "$customerData.monthlyCharges",
+            "probability": 1,
+            "prediction": 1,
+            "f": 1,
+            "x": 1,
+        }},
+    ]
+
+
+def format_scatter(rows, decode_customer):
+    """Fill tenure/monthlyCharges of compact documents from their packed features"""
+    points = []
+    for row in rows:
+        packed, extras = row.pop("f", None), row.pop("x", None)
+        if packed is not None:
+            customer = decode_customer({"f": packed, "x": extras or {}})
+            row["tenure"] = customer.get("tenure")
+            row["monthlyCharges"] = customer.get("monthlyCharges")
+        points.append(row)
+    return points
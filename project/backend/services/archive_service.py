@@ -0,0 +1,261 @@
+import os
+import json
+import shutil
+import logging
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # optional: archival is unavailable without pyarrow
+    pa = pc = pq = None
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("id", "userId", "timestamp", "prediction", "probability", "riskLevel", "customerData", "shapValues")
+
+
+def _schema():
+    return pa.schema([
+        ("id", pa.string()),
+        ("userId", pa.string()),
+        ("timestamp", pa.timestamp("ms")),
+        ("prediction", pa.string()),
+        ("probability", pa.float64()),
+        ("riskLevel", pa.string()),
+        ("customerData", pa.string()),  # JSON; customer fields vary between clients
+        ("shapValues", pa.string()),    # JSON list of {feature, value, impact}
+    ])
+
+
+def _safe(value):
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in str(value))
+
+
+class PredictionArchive:
+    """Cold storage for old predictions as Hive-partitioned Parquet on local disk.
+
+    Layout: ``<root>/date=YYYY-MM-DD/user=<userId>/part-*.parquet``. ``archive()``
+    streams predictions older than a cutoff ordered by (userId, timestamp), so
+    at most one partition file is open at a time, and writes them in row groups
+    of ``row_group_size``. A partition file is renamed into place only after it is
+    complete; its documents are then deleted from MongoDB in ``chunk_size`` batches.
+    Reads memory-map the files of the requested date range only. ``decode`` turns a
+    stored document into the full prediction shape before it is archived.
+    """
+
+    def __init__(self, root, row_group_size=10000, chunk_size=1000, decode=None):
+        self.root = root
+        self.row_group_size = row_group_size
+        self.chunk_size = chunk_size
+        self.decode = decode or (lambda document: document)
+
+    @property
+    def available(self):
+        return pq is not None
+
+    def _require(self):
+        if pq is None:
+            raise RuntimeError("pyarrow is required for prediction archival")
+
+    # Writing
+
+    def archive(self, predictions, cutoff, user_id=None):
+        """Move predictions with timestamp < ``cutoff`` into Parquet; returns counts"""
+        self._require()
+        query = {"timestamp": {"$lt": cutoff}}
+        if user_id:
+            query["userId"] = user_id
+        cursor = predictions.find(query).sort([("userId", ASCENDING), ("timestamp", ASCENDING)]).batch_size(self.row_group_size)
+
+        stats = {"archived": 0, "deleted": 0, "files": 0}
+        partition = writer = None
+        rows, ids = [], []
+
+        def flush_rows():
+            if rows:
+                writer.write_table(pa.Table.from_pylist(rows, schema=_schema()), row_group_size=self.row_group_size)
+                rows.clear()
+
+        def finish_partition():
+            flush_rows()
+            writer.close()
+            os.replace(partition["tmp"], partition["path"])
+            stats["files"] += 1
+            stats["archived"] += len(ids)
+            for i in range(0, len(ids), self.chunk_size):
+                stats["deleted"] += predictions.delete_many({"_id": {"$in": ids[i:i + self.chunk_size]}}).deleted_count
+            ids.clear()
+
+        try:
+            for document in cursor:
+                key = (document.get("userId") or "", document["timestamp"].date())
+                if partition is None or partition["key"] != key:
+                    if partition is not None:
+                        finish_partition()
+                    partition = self._open_partition(key)
+                    writer = pq.ParquetWriter(partition["tmp"], _schema(), compression="zstd")
+                rows.append(self._to_row(document))
+                ids.append(document["_id"])
+                if len(rows) >= self.row_group_size:
+                    flush_rows()
+            if partition is not None:
+                finish_partition()
+        except Exception:
+            if writer is not None and partition is not None and os.path.exists(partition["tmp"]):
+                writer.close()
+                os.remove(partition["tmp"])
+            raise
+        logger.info(f"Archived {stats['archived']} predictions into {stats['files']} files")
+        return stats
+
+    def _open_partition(self, key):
+        user_id, day = key
+        directory = os.path.join(self.root, f"date={day.isoformat()}", f"user={_safe(user_id)}")
+        os.makedirs(directory, exist_ok=True)
+        name = f"part-{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{os.getpid()}.parquet"
+        path = os.path.join(directory, name)
+        return {"key": key, "path": path, "tmp": os.path.join(directory, f".{name}.tmp")}
+
+    def _to_row(self, document):
+        document = self.decode(document)
+        return {
+            "id": str(document["_id"]),
+            "userId": document.get("userId"),
+            "timestamp": document["timestamp"],
+            "prediction": document.get("prediction"),
+            "probability": float(document.get("probability", 0.0)),
+            "riskLevel": document.get("riskLevel", "Unknown"),
+            "customerData": json.dumps(document.get("customerData", {})),
+            "shapValues": json.dumps(document.get("shapValues", [])),
+        }
+
+    # Reading
+
+    def _files(self, user_id=None, start=None, end=None):
+        if not os.path.isdir(self.root):
+            return
+        user_dir = f"user={_safe(user_id)}" if user_id else None
+        for date_dir in sorted(os.listdir(self.root)):
+            if not date_dir.startswith("date="):
+                continue
+            day = datetime.strptime(date_dir[5:], "%Y-%m-%d")
+            if (start and day + timedelta(days=1) <= start) or (end and day >= end):
+                continue
+            date_path = os.path.join(self.root, date_dir)
+            for partition_dir in sorted(os.listdir(date_path)):
+                if user_dir and partition_dir != user_dir:
+                    continue
+                partition_path = os.path.join(date_path, partition_dir)
+                for name in sorted(os.listdir(partition_path)):
+                    if name.endswith(".parquet") and not name.startswith("."):
+                        yield os.path.join(partition_path, name)
+
+    def iter_batches(self, user_id=None, start=None, end=None, prediction=None, columns=COLUMNS):
+        """Yield pyarrow record batches of archived predictions in [start, end)"""
+        self._require()
+        for path in self._files(user_id, start, end):
+            table = pq.read_table(path, columns=list(columns), memory_map=True)
+            yield from self._filter(table, start, end, prediction).to_batches()
+
+    @staticmethod
+    def _filter(table, start=None, end=None, prediction=None):
+        conditions = []
+        if start is not None:
+            conditions.append(pc.greater_equal(table["timestamp"], pa.scalar(start, pa.timestamp("ms"))))
+        if end is not None:
+            conditions.append(pc.less(table["timestamp"], pa.scalar(end, pa.timestamp("ms"))))
+        if prediction is not None:
+            conditions.append(pc.equal(table["prediction"], prediction))
+        if not conditions:
+            return table
+        mask = conditions[0]
+        for condition in conditions[1:]:
+            mask = pc.and_(mask, condition)
+        return table.filter(mask)
+
+    @staticmethod
+    def _decode(row):
+        row["customerData"] = json.loads(row["customerData"])
+        row["shapValues"] = json.loads(row["shapValues"])
+        return row
+
+    def records(self, user_id=None, start=None, end=None, prediction=None):
+        """Archived predictions as dicts shaped like the stored documents"""
+        for batch in self.iter_batches(user_id, start, end, prediction):
+            for row in batch.to_pylist():
+                yield self._decode(row)
+
+    def top(self, user_id, k, sort_field="timestamp", descending=True, start=None, end=None, prediction=None):
+        """The first ``k`` archived predictions in sort order, and the number that matched.
+
+        Only the sort and filter columns are read to rank rows; each file keeps its
+        own top ``k``, and full rows are read just for the row groups of the winners.
+        """
+        self._require()
+        order = "descending" if descending else "ascending"
+        key_columns = sorted({sort_field, "timestamp", "prediction"})
+        paths, candidates, total = [], [], 0
+        for path in self._files(user_id, start, end):
+            table = pq.read_table(path, columns=key_columns, memory_map=True)
+            table = table.append_column("row", pa.array(range(table.num_rows), pa.int64()))
+            table = self._filter(table, start, end, prediction)
+            total += table.num_rows
+            if not table.num_rows:
+                continue
+            table = table.take(pc.sort_indices(table, sort_keys=[(sort_field, order)])[:k])
+            candidates.append(table.select([sort_field, "row"]).append_column(
+                "file", pa.array([len(paths)] * table.num_rows, pa.int32())
+            ))
+            paths.append(path)
+        if not candidates:
+            return [], total
+
+        winners = pa.concat_tables(candidates)
+        winners = winners.take(pc.sort_indices(winners, sort_keys=[(sort_field, order)])[:k]).to_pylist()
+        rows = {}
+        by_file = {}
+        for winner in winners:
+            by_file.setdefault(winner["file"], []).append(winner["row"])
+        for number, wanted in by_file.items():
+            rows.update(((number, row), record) for row, record in self._read_rows(paths[number], wanted))
+        return [self._decode(rows[(winner["file"], winner["row"])]) for winner in winners], total
+
+    @staticmethod
+    def _read_rows(path, wanted):
+        """(row number, record) for the given rows of a file, reading only their row groups"""
+        parquet = pq.ParquetFile(path, memory_map=True)
+        wanted = sorted(wanted)
+        offset, position = 0, 0
+        for group in range(parquet.metadata.num_row_groups):
+            size = parquet.metadata.row_group(group).num_rows
+            local = []
+            while position < len(wanted) and wanted[position] < offset + size:
+                local.append(wanted[position])
+                position += 1
+            if local:
+                table = parquet.read_row_group(group, columns=list(COLUMNS))
+                records = table.take([row - offset for row in local]).to_pylist()
+                yield from zip(local, records)
+            offset += size
+            if position == len(wanted):
+                break
+
+    def count(self, user_id=None, start=None, end=None, prediction=None):
+        self._require()
+        return sum(batch.num_rows for batch in self.iter_batches(
+            user_id, start, end, prediction, columns=("timestamp", "prediction")
+        ))
+
+    def remove(self, user_id=None):
+        """Delete archived files, for one user or all; returns the number of files removed"""
+        removed = 0
+        for path in list(self._files(user_id)):
+            os.remove(path)
+            removed += 1
+        if not user_id and os.path.isdir(self.root):
+            shutil.rmtree(self.root, ignore_errors=True)
+        return removed
@@ -0,0 +1,88 @@
+import threading
+import logging
+from datetime import datetime, timezone
+from bson import ObjectId
+
+from services.cache_service import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# User fields carried in the access token so authorized requests don't need a user lookup
+USER_CLAIMS = ("name", "email", "role")
+# Carried too when the user has one; absent means the default models
+OPTIONAL_CLAIMS = ("tenant",)
+
+
+class UserResolver:
+    """Resolve the current user from a per-worker cache of user documents, or MongoDB.
+
+    Each worker reads a user's document at most once per ``ttl`` seconds, so role
+    changes and deletions take effect within ``ttl``. ``invalidate()`` revokes
+    every token issued so far by setting ``tokensValidAfter`` on the document;
+    older tokens stop resolving in every worker once its cached entry expires.
+    Without a database the identity claims in the token are used as they are.
+    """
+
+    def __init__(self, collection, maxsize=10000, ttl=60.0):
+        self.collection = collection
+        self._users = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.db_reads = 0
+        self._reads_lock = threading.Lock()
+
+    @staticmethod
+    def claims_for(user):
+        """Additional JWT claims for a user document or user_data dict"""
+        return {key: user[key] for key in USER_CLAIMS + OPTIONAL_CLAIMS if user.get(key) is not None}
+
+    @staticmethod
+    def to_user_data(user_id, source):
+        return {
+            "id": str(user_id),
+            "email": source["email"],
+            "name": source["name"],
+            "role": source["role"],
+            "tenant": source.get("tenant")
+        }
+
+    def resolve(self, user_id, claims=None):
+        """Return ``{"id", "email", "name", "role", "tenant"}`` for a user, or None if it
+        can't be found or the token was issued before the user's tokens were revoked"""
+        if self.collection is None:
+            if claims and all(key in claims for key in USER_CLAIMS):
+                return self.to_user_data(user_id, claims)
+            return None
+
+        entry = self._users.get(user_id)
+        if entry is None:
+            entry = self._load(user_id)
+            self._users.set(user_id, entry)
+        user_data, valid_after = entry
+        if user_data is None:
+            return None
+        # iat has one-second resolution: a token from the same second as the revocation is revoked too
+        if valid_after is not None and (claims or {}).get("iat", 0) <= valid_after:
+            return None
+        return dict(user_data)
+
+    def invalidate(self, user_id):
+        """Revoke all tokens issued to a user so far, e.g. after a role change or password reset"""
+        now = datetime.utcnow()
+        if self.collection is not None:
+            self.collection.update_one({"_id": ObjectId(user_id)}, {"$set": {"tokensValidAfter": now}})
+        self._users.invalidate(user_id)
+        logger.info(f"Revoked tokens issued to user {user_id} before {now.isoformat()}")
+
+    def _load(self, user_id):
+        """(user_data, tokensValidAfter as epoch seconds); (None, None) for unknown users"""
+        with self._reads_lock:
+            self.db_reads += 1
+        user = self.collection.find_one(
+            {"_id": ObjectId(user_id)},
+            {"email": 1, "name": 1, "role": 1, "tenant": 1, "tokensValidAfter": 1}
+        )
+        if not user:
+            return None, None
+        valid_after = user.get("tokensValidAfter")
+        if valid_after is not None:
+            valid_after = valid_after.replace(tzinfo=timezone.utc).timestamp()
+        return self.to_user_data(user["_id"], user), valid_after
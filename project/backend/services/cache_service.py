@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded, thread-safe LRU cache whose entries expire after ``ttl`` seconds.
+
+    The cache lives inside a single process, so every gunicorn worker keeps its
+    own copy. Staleness across workers is bounded by ``ttl``. With ``weigh`` (a
+    function of the value) entries are also evicted once their total weight
+    passes ``maxweight``; a value heavier than that on its own is not stored.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300.0, timer=time.monotonic, weigh=None, maxweight=None):
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = float(ttl)
+        self._timer = timer
+        self._weigh = weigh
+        self.maxweight = maxweight
+        self._weight = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        now = self._timer()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at, _ = entry
+            if expires_at <= now:
+                self._pop(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        expires_at = self._timer() + self.ttl
+        weight = self._weigh(value) if self._weigh is not None else 0
+        with self._lock:
+            self._pop(key)
+            if self.maxweight is not None and weight > self.maxweight:
+                return
+            self._data[key] = (value, expires_at, weight)
+            self._weight += weight
+            while len(self._data) > self.maxsize or (self.maxweight is not None and self._weight > self.maxweight):
+                self._pop(next(iter(self._data)))
+
+    def _pop(self, key):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._weight -= entry[2]
+
+    def invalidate(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._weight = 0
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize, "weight": self._weight,
+                    "hits": self.hits, "misses": self.misses}
+
+    def __len__(self):
+        return len(self._data)
+
+
+class NotificationSettingsCache:
+    """Read-through / write-through cache in front of the notification settings collection"""
+
+    def __init__(self, collection, defaults, maxsize=1024, ttl=300.0):
+        self.collection = collection
+        self.defaults = dict(defaults)
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, user_id):
+        """Return settings for a user, creating the default document on first access"""
+        settings = self._cache.get(user_id)
+        if settings is None:
+            settings = self.collection.find_one({"user_id": user_id}, {"_id": 0})
+            if not settings:
+                settings = {"user_id": user_id, **self.defaults}
+                self.collection.insert_one(dict(settings))
+            self._cache.set(user_id, settings)
+        return dict(settings)
+
+    def put(self, user_id, settings):
+        """Persist settings and update the cached copy in the same call"""
+        self.collection.update_one(
+            {"user_id": user_id},
+            {"$set": settings},
+            upsert=True
+        )
+        self._cache.set(user_id, {"user_id": user_id, **settings})
+
+    def invalidate(self, user_id=None):
+        if user_id is None:
+            self._cache.clear()
+        else:
+            self._cache.invalidate(user_id)
+
+    def stats(self):
+        return self._cache.stats()
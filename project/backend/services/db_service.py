@@ -0,0 +1,244 @@
+import os
+import time
+import threading
+import logging
+
+import pymongo
+from pymongo import monitoring
+from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
+
+from services.metrics_service import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseUnavailable(ConnectionFailure):
+    """Raised without touching the network while the database is marked down"""
+
+
+def available_compressors(names):
+    """Drop wire compressors whose optional Python module is not installed"""
+    modules = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+    selected = []
+    for name in (n.strip() for n in names.split(",") if n.strip()):
+        try:
+            __import__(modules.get(name, name))
+        except ImportError:
+            continue
+        selected.append(name)
+    return selected
+
+
+def client_options(config):
+    """MongoClient keyword arguments from the MONGO_* settings in config.py"""
+    write_concern = config['MONGO_WRITE_CONCERN']
+    options = {
+        "maxPoolSize": config['MONGO_MAX_POOL_SIZE'],
+        "minPoolSize": config['MONGO_MIN_POOL_SIZE'],
+        "maxIdleTimeMS": config['MONGO_MAX_IDLE_TIME_MS'],
+        "waitQueueTimeoutMS": config['MONGO_WAIT_QUEUE_TIMEOUT_MS'],
+        "connectTimeoutMS": config['MONGO_CONNECT_TIMEOUT_MS'],
+        "socketTimeoutMS": config['MONGO_SOCKET_TIMEOUT_MS'],
+        "serverSelectionTimeoutMS": config['MONGO_SERVER_SELECTION_TIMEOUT_MS'],
+        "readPreference": config['MONGO_READ_PREFERENCE'],
+        "readConcernLevel": config['MONGO_READ_CONCERN'],
+        "w": int(write_concern) if write_concern.isdigit() else write_concern,
+        "wTimeoutMS": config['MONGO_WRITE_TIMEOUT_MS'],
+    }
+    compressors = available_compressors(config['MONGO_COMPRESSORS'])
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+    return options
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Feeds pool utilization into the metrics registry.
+
+    Gauges: open connections and connections checked out per server; counters:
+    checkouts and failed checkouts by reason (``timeout`` means the wait queue
+    timed out because the pool was exhausted); histogram: checkout wait time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open = {}
+        self._in_use = {}
+        self._waiting = {}
+
+    def _adjust(self, table, address, delta, gauge):
+        server = f"{address[0]}:{address[1]}"
+        with self._lock:
+            value = table[server] = max(0, table.get(server, 0) + delta)
+        metrics.set_gauge(gauge, value, server=server)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        metrics.inc("churn_mongo_pool_cleared_total", server=f"{event.address[0]}:{event.address[1]}")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._adjust(self._open, event.address, 1, "churn_mongo_pool_connections")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._adjust(self._open, event.address, -1, "churn_mongo_pool_connections")
+
+    def connection_check_out_started(self, event):
+        self._waiting[threading.get_ident()] = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        self._waiting.pop(threading.get_ident(), None)
+        metrics.inc("churn_mongo_pool_checkout_failures_total", reason=str(event.reason))
+
+    def connection_checked_out(self, event):
+        started = self._waiting.pop(threading.get_ident(), None)
+        if started is not None:
+            metrics.observe("churn_mongo_pool_wait_seconds", time.perf_counter() - started)
+        metrics.inc("churn_mongo_pool_checkouts_total")
+        self._adjust(self._in_use, event.address, 1, "churn_mongo_pool_in_use")
+
+    def connection_checked_in(self, event):
+        self._adjust(self._in_use, event.address, -1, "churn_mongo_pool_in_use")
+
+
+class LazyCollection:
+    """Stand-in for a pymongo Collection that resolves it through the manager on each use.
+
+    Methods are wrapped so connection errors mark the database down; while it is
+    down, calls fail immediately with DatabaseUnavailable instead of waiting out
+    the server selection timeout.
+    """
+
+    __slots__ = ("_manager", "name")
+
+    def __init__(self, manager, name):
+        self._manager = manager
+        self.name = name
+
+    def __getattr__(self, attr):
+        target = getattr(self._manager.database()[self.name], attr)
+        if not callable(target):
+            return target
+        manager = self._manager
+
+        def call(*args, **kwargs):
+            try:
+                result = target(*args, **kwargs)
+            except ConnectionFailure as e:
+                manager.mark_down(e)
+                raise
+            manager.mark_up()
+            return result
+        return call
+
+    def __getitem__(self, name):
+        return self._manager.database()[self.name][name]
+
+    def __repr__(self):
+        return f"LazyCollection({self._manager.db_name}.{self.name})"
+
+
+class MongoConnectionManager:
+    """Builds the MongoClient on first use in each process.
+
+    Nothing connects at import time, so a gunicorn master that imports the app
+    before forking never hands a client (and its monitor threads) to workers,
+    and an unreachable database no longer breaks the import. After a connection
+    error the database is considered down for ``retry_interval`` seconds; the
+    first call after that goes through and either restores it or extends the window.
+    """
+
+    def __init__(self, uri, db_name="churn_prediction", retry_interval=5.0, **client_options):
+        self.uri = uri
+        self.db_name = db_name
+        self.retry_interval = retry_interval
+        self.client_options = client_options
+        self.pool_listener = PoolMetricsListener()
+        self._lock = threading.Lock()
+        self._client = None
+        self._pid = None
+        self._down_until = 0.0
+        self._reported_up = False
+        self.last_error = None
+
+    @property
+    def configured(self):
+        return bool(self.uri)
+
+    @property
+    def available(self):
+        return self.configured and time.monotonic() >= self._down_until
+
+    def client(self):
+        if not self.configured:
+            raise DatabaseUnavailable("MONGO_URI is not configured")
+        if time.monotonic() < self._down_until:
+            raise DatabaseUnavailable(f"Database unavailable: {self.last_error}")
+        return self._connect()
+
+    def _connect(self):
+        if self._pid != os.getpid() or self._client is None:
+            with self._lock:
+                if self._pid != os.getpid() or self._client is None:
+                    self._client = pymongo.MongoClient(
+                        self.uri,
+                        connect=False,
+                        event_listeners=[self.pool_listener],
+                        **self.client_options
+                    )
+                    self._pid = os.getpid()
+                    logger.info(f"MongoDB client created in worker {self._pid}")
+        return self._client
+
+    def database(self):
+        return self.client()[self.db_name]
+
+    def collection(self, name):
+        """Lazy collection handle, or None when no URI is configured"""
+        return LazyCollection(self, name) if self.configured else None
+
+    def ping(self):
+        """Round trip to the server; used by the readiness refresher to detect recovery"""
+        if not self.configured:
+            raise DatabaseUnavailable("MONGO_URI is not configured")
+        try:
+            self._connect().admin.command('ping')
+        except ConnectionFailure as e:
+            self.mark_down(e)
+            raise
+        self.mark_up()
+
+    def mark_down(self, error):
+        if not self._down_until:
+            level = logging.ERROR if isinstance(error, ServerSelectionTimeoutError) else logging.WARNING
+            logger.log(level, "MongoDB marked unavailable for %.0fs: %s", self.retry_interval, error)
+        self.last_error = str(error)
+        self._down_until = time.monotonic() + self.retry_interval
+        self._reported_up = False
+        metrics.set_gauge("churn_mongo_available", 0)
+
+    def mark_up(self):
+        if self._reported_up:
+            return
+        if self._down_until:
+            logger.info("MongoDB available again")
+        self._down_until = 0.0
+        self.last_error = None
+        self._reported_up = True
+        metrics.set_gauge("churn_mongo_available", 1)
+
+    def close(self):
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+            self._pid = None
@@ -0,0 +1,153 @@
+import json
+import time
+import threading
+from collections import deque
+
+from services.metrics_service import metrics
+
+
+def sse_message(event, data):
+    """One Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'), default=str)}\n\n"
+
+
+class Subscription:
+    """One connected stream: a bounded buffer of formatted messages.
+
+    When the buffer is full new messages are dropped rather than blocking the
+    publisher, and the stream is flagged so the client can be told to resync.
+    """
+
+    __slots__ = ("user_id", "buffer_size", "_messages", "_dropped", "_changed_at", "_lock", "_wakeup")
+
+    def __init__(self, user_id, buffer_size):
+        self.user_id = user_id
+        self.buffer_size = buffer_size
+        self._messages = deque()
+        self._dropped = False
+        self._changed_at = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+
+    def offer(self, message, change=True):
+        """Buffer a message; ``change`` marks it as new data (derived events like stats are not)"""
+        with self._lock:
+            if change and self._changed_at is None:
+                self._changed_at = time.monotonic()
+            if len(self._messages) >= self.buffer_size:
+                self._dropped = True
+                return False
+            self._messages.append(message)
+        self._wakeup.set()
+        return True
+
+    def next(self, timeout):
+        """(messages, dropped, changed_at) once something is buffered, or ([], False, None)
+        after ``timeout`` seconds; ``changed_at`` is when the first new data was offered"""
+        self._wakeup.wait(timeout)
+        with self._lock:
+            self._wakeup.clear()
+            messages, dropped, changed_at = list(self._messages), self._dropped, self._changed_at
+            self._messages.clear()
+            self._dropped, self._changed_at = False, None
+        return messages, dropped, changed_at
+
+
+class _Shared:
+    """Latest computed value of a per-user event, shared by that user's streams"""
+
+    __slots__ = ("lock", "message", "computed_at", "broadcast")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.message = None
+        self.computed_at = float("-inf")
+        self.broadcast = False
+
+
+class EventBroker:
+    """In-process pub/sub from prediction requests to the same user's open streams.
+
+    At most ``max_streams`` streams are open per worker, since each holds a
+    server thread for as long as it is connected. Publishing to a user without
+    streams costs a dict lookup; otherwise the message is serialized once and
+    offered to each stream without waiting. ``shared()`` lets a user's streams
+    share one computation of derived events (dashboard stats) instead of each
+    running its own query.
+    """
+
+    def __init__(self, max_streams=8, buffer_size=64):
+        self.max_streams = max_streams
+        self.buffer_size = buffer_size
+        self._streams = {}  # user id -> set of subscriptions
+        self._shared = {}   # (user id, event) -> _Shared, while the user has streams
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """A new subscription, or None when this worker is at ``max_streams``"""
+        with self._lock:
+            if self._count >= self.max_streams:
+                metrics.inc("churn_stream_rejected_total")
+                return None
+            subscription = Subscription(user_id, self.buffer_size)
+            self._streams.setdefault(user_id, set()).add(subscription)
+            self._count += 1
+            metrics.set_gauge("churn_stream_active", self._count)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            streams = self._streams.get(subscription.user_id)
+            if streams is None or subscription not in streams:
+                return
+            streams.discard(subscription)
+            if not streams:
+                del self._streams[subscription.user_id]
+                for key in [key for key in self._shared if key[0] == subscription.user_id]:
+                    del self._shared[key]
+            self._count -= 1
+            metrics.set_gauge("churn_stream_active", self._count)
+
+    def publish(self, user_id, event, data):
+        """Offer an event to the user's streams; returns how many accepted it"""
+        with self._lock:
+            streams = list(self._streams.get(user_id, ()))
+        if not streams:
+            return 0
+        message = sse_message(event, data)
+        delivered = sum(1 for subscription in streams if subscription.offer(message))
+        metrics.inc("churn_stream_events_total", delivered, event=event)
+        if delivered < len(streams):
+            metrics.inc("churn_stream_events_dropped_total", len(streams) - delivered, event=event)
+        return delivered
+
+    def shared(self, user_id, event, since, compute, publish=True):
+        """The user's latest ``event`` message, recomputed unless one was computed after ``since``.
+
+        ``since`` is a ``time.monotonic()`` value. Only one stream per user computes at
+        a time; the others wait and reuse its result. A newly computed message is
+        published to all of the user's streams when ``publish`` is set. Returns
+        (message, delivered): when ``delivered`` is False the caller sends it itself.
+        """
+        with self._lock:
+            state = self._shared.get((user_id, event))
+            if state is None:
+                state = self._shared[(user_id, event)] = _Shared()
+        with state.lock:
+            if state.computed_at > since:
+                metrics.inc("churn_stream_shared_total", event=event, outcome="reused")
+                return state.message, state.broadcast
+            # Anything stored before this point is included in the computation
+            computed_at = time.monotonic()
+            message = sse_message(event, compute())
+            state.message, state.computed_at, state.broadcast = message, computed_at, publish
+            metrics.inc("churn_stream_shared_total", event=event, outcome="computed")
+        if publish:
+            with self._lock:
+                streams = list(self._streams.get(user_id, ()))
+            delivered = sum(1 for subscription in streams if subscription.offer(message, change=False))
+            metrics.inc("churn_stream_events_total", delivered, event=event)
+            if delivered < len(streams):
+                metrics.inc("churn_stream_events_dropped_total", len(streams) - delivered, event=event)
+        return message, publish
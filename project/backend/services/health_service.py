@@ -0,0 +1,100 @@
+import os
+import time
+import threading
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    """Runs dependency checks on a background thread and serves the last result.
+
+    ``checks`` maps a name to a callable returning ``(ok, detail)``; a check that
+    raises counts as failed with the exception text as its detail. Checks named in
+    ``optional`` are reported but do not affect readiness. Probes read
+    ``snapshot()`` and never touch a dependency themselves. The refresher thread
+    is started on first use in each process, so it survives gunicorn's fork.
+    A snapshot older than ``stale_after`` seconds (refresher stuck) reports not ready.
+    """
+
+    def __init__(self, checks, optional=(), interval=10.0, stale_after=None):
+        self.checks = checks
+        self.optional = set(optional)
+        self.interval = interval
+        self.stale_after = stale_after if stale_after is not None else interval * 3
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._refreshed_at = 0.0
+        self._pid = None
+        self._stop = threading.Event()
+
+    def run_checks(self):
+        results = {}
+        for name, check in self.checks.items():
+            start = time.perf_counter()
+            try:
+                ok, detail = check()
+            except Exception as e:
+                ok, detail = False, str(e)
+            results[name] = {
+                "ok": bool(ok),
+                "detail": detail,
+                "latencyMs": round((time.perf_counter() - start) * 1000, 2),
+                "required": name not in self.optional,
+            }
+        snapshot = {
+            "ready": all(result["ok"] for result in results.values() if result["required"]),
+            "checkedAt": datetime.utcnow().isoformat(),
+            "checks": results,
+        }
+        with self._lock:
+            self._snapshot = snapshot
+            self._refreshed_at = time.monotonic()
+        return snapshot
+
+    def snapshot(self):
+        """Latest check results; runs them inline only if this process has none yet"""
+        self._ensure_started()
+        with self._lock:
+            snapshot, refreshed_at = self._snapshot, self._refreshed_at
+        if snapshot is None:
+            snapshot = self.run_checks()
+            refreshed_at = time.monotonic()
+        age = time.monotonic() - refreshed_at
+        result = dict(snapshot, ageSeconds=round(age, 3))
+        if age > self.stale_after:
+            result["ready"] = False
+            result["stale"] = True
+        return result
+
+    def liveness(self):
+        return {
+            "status": "alive",
+            "pid": os.getpid(),
+            "uptimeSeconds": round(time.time() - self.started_at, 1),
+        }
+
+    def stop(self):
+        self._stop.set()
+
+    def _ensure_started(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            self._stop = threading.Event()
+        threading.Thread(target=self._refresh_loop, name="health-refresher", daemon=True).start()
+
+    def _refresh_loop(self):
+        stop = self._stop
+        while not stop.is_set():
+            try:
+                self.run_checks()
+            except Exception as e:
+                logger.error(f"Health refresh failed: {e}")
+            stop.wait(self.interval)
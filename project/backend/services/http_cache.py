@@ -0,0 +1,67 @@
+import gzip
+import hashlib
+import logging
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_MIMETYPES = ("application/json", "text/plain", "text/html", "text/csv")
+
+
+def make_etag(*parts):
+    """Weak validator from a cheap change marker; the body itself is never hashed"""
+    digest = hashlib.blake2b("|".join(str(part) for part in parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(request, etag):
+    """True if the request's If-None-Match covers ``etag`` (weak comparison)"""
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def choose_encoding(accept_encodings):
+    """Best coding for a parsed Accept-Encoding (``request.accept_encodings``); q=0 refuses it, ties prefer br"""
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    return accept_encodings.best_match(offered)
+
+
+def compress_response(response, accept_encodings, min_size=1024, gzip_level=6, brotli_quality=4):
+    """Compress a buffered response body in place when it is large enough and the client accepts it"""
+    if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+            or response.status_code in (204, 304) or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(accept_encodings)
+    if encoding is None:
+        return response
+
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+
+    if encoding == "br":
+        compressed = brotli.compress(body, quality=brotli_quality)
+    else:
+        compressed = gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    return response
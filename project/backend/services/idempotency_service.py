@@ -0,0 +1,197 @@
+import time
+import threading
+import logging
+from datetime import datetime, timedelta
+
+from bson import Binary
+from pymongo.errors import DuplicateKeyError
+
+from services.cache_service import TTLCache
+from services.metrics_service import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyConflict(Exception):
+    """The key cannot be used for this request: 409 while the original is still
+    running past the wait, 422 when it was first used with a different body."""
+
+    def __init__(self, status, reason):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+
+
+class StoredResponse:
+    __slots__ = ("fingerprint", "status", "body", "mimetype")
+
+    def __init__(self, fingerprint, status, body, mimetype):
+        self.fingerprint = fingerprint
+        self.status = status
+        self.body = body
+        self.mimetype = mimetype
+
+
+class _Flight:
+    """A key being processed in this worker; duplicates wait on ``done``"""
+
+    __slots__ = ("fingerprint", "done")
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+
+
+class Claim:
+    __slots__ = ("key", "fingerprint", "flight")
+
+    def __init__(self, key, fingerprint, flight):
+        self.key = key
+        self.fingerprint = fingerprint
+        self.flight = flight
+
+
+class IdempotencyStore:
+    """First response per (scope, user, Idempotency-Key), replayed for retries.
+
+    ``begin()`` either returns the stored response or a claim for the caller to
+    run the request and ``complete()`` (or ``abandon()``) it. Duplicates that
+    arrive while the first request runs wait for it: on a per-worker event when it
+    runs in the same worker, otherwise by polling its ``pending`` document in
+    ``collection`` (a pending claim whose ``lease`` has passed, e.g. after a
+    crash, is taken over). Completed responses are kept in ``collection``, where
+    a TTL index on ``createdAt`` expires them, and in a local cache bounded to
+    ``cache_bytes`` of bodies. With a collection, bodies over ``max_local_body``
+    bytes (large batch responses) are only kept there and replayed from it.
+    """
+
+    def __init__(self, collection=None, ttl=86400, lease=60.0, poll_interval=0.05, cache_size=10000,
+                 cache_bytes=64 << 20, max_local_body=64 << 10):
+        self.collection = collection
+        self.ttl = ttl
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.max_local_body = max_local_body
+        self._cache = TTLCache(maxsize=cache_size, ttl=ttl, weigh=lambda stored: len(stored.body), maxweight=cache_bytes)
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def begin(self, scope, user_id, key, fingerprint, timeout):
+        """(stored response, None) to replay, or (None, claim) to run the request.
+
+        Raises IdempotencyConflict when the key was used with another body or the
+        original request is still running after ``timeout`` seconds.
+        """
+        key = f"{scope}:{user_id}:{key}"
+        deadline = time.monotonic() + timeout
+        waited = False
+        while True:
+            stored = self._cache.get(key)
+            if stored is not None:
+                return self._replay(stored, fingerprint, waited), None
+
+            with self._lock:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[key] = _Flight(fingerprint)
+            if not leader:
+                if flight.fingerprint != fingerprint:
+                    self._reject(422, "mismatch")
+                waited = True
+                if not flight.done.wait(max(0.0, deadline - time.monotonic())):
+                    self._reject(409, "in_progress")
+                # Completed (now cached) or abandoned (someone may take over)
+                continue
+
+            try:
+                stored = self._claim(key, fingerprint, deadline)
+            except BaseException:
+                self._land(key, flight)
+                raise
+            if stored is None:
+                metrics.inc("churn_idempotency_requests_total", outcome="new")
+                return None, Claim(key, fingerprint, flight)
+            self._remember(key, stored)
+            self._land(key, flight)
+            return self._replay(stored, fingerprint, True), None
+
+    def complete(self, claim, status, body, mimetype):
+        """Store the response of a claimed request; storage errors are logged, not raised"""
+        stored = StoredResponse(claim.fingerprint, status, body, mimetype)
+        self._remember(claim.key, stored)
+        try:
+            if self.collection is not None:
+                self.collection.update_one({"_id": claim.key}, {"$set": {
+                    "state": "done",
+                    "status": status,
+                    "body": Binary(body),
+                    "mimetype": mimetype,
+                }})
+        except Exception as e:
+            logger.error(f"Failed to store idempotent response: {e}")
+        finally:
+            self._land(claim.key, claim.flight)
+
+    def abandon(self, claim):
+        """Release a claim without a stored response, so a retry runs the request again"""
+        try:
+            if self.collection is not None:
+                self.collection.delete_one({"_id": claim.key, "state": "pending"})
+        except Exception as e:
+            logger.error(f"Failed to release idempotency key: {e}")
+        finally:
+            self._land(claim.key, claim.flight)
+
+    def _claim(self, key, fingerprint, deadline):
+        """None once this worker owns the key; the stored response if another worker finished it"""
+        if self.collection is None:
+            return None
+        while True:
+            now = datetime.utcnow()
+            try:
+                self.collection.insert_one({
+                    "_id": key,
+                    "state": "pending",
+                    "fingerprint": fingerprint,
+                    "lease": now + timedelta(seconds=self.lease),
+                    "createdAt": now,
+                })
+                return None
+            except DuplicateKeyError:
+                document = self.collection.find_one({"_id": key})
+            if document is None:
+                continue  # expired or abandoned meanwhile
+            if document["fingerprint"] != fingerprint:
+                self._reject(422, "mismatch")
+            if document["state"] == "done":
+                return StoredResponse(fingerprint, document["status"], bytes(document["body"]), document["mimetype"])
+            if document["lease"] < now and self.collection.find_one_and_update(
+                {"_id": key, "state": "pending", "lease": document["lease"]},
+                {"$set": {"lease": now + timedelta(seconds=self.lease)}}
+            ):
+                return None
+            if time.monotonic() + self.poll_interval > deadline:
+                self._reject(409, "in_progress")
+            time.sleep(self.poll_interval)
+
+    def _remember(self, key, stored):
+        if self.collection is None or len(stored.body) <= self.max_local_body:
+            self._cache.set(key, stored)
+
+    def _land(self, key, flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.done.set()
+
+    def _replay(self, stored, fingerprint, waited):
+        if stored.fingerprint != fingerprint:
+            self._reject(422, "mismatch")
+        metrics.inc("churn_idempotency_requests_total", outcome="waited" if waited else "replayed")
+        return stored
+
+    @staticmethod
+    def _reject(status, reason):
+        metrics.inc("churn_idempotency_requests_total", outcome=reason)
+        raise IdempotencyConflict(status, reason)
@@ -0,0 +1,225 @@
+import os
+import time
+import queue
+import pickle
+import signal
+import atexit
+import logging
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from services.metrics_service import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceUnavailable(Exception):
+    """The pool could not score a request (timeout, dead process); callers predict in-thread instead"""
+
+
+class _Slot:
+    """One shared-memory buffer: ``rows`` x features float32 in, ``rows`` float32 probabilities out"""
+
+    def __init__(self, index, rows, columns, name=None):
+        self.index = index
+        self.rows = rows
+        size = rows * (columns + 1) * 4
+        self.memory = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self.features = np.ndarray((rows, columns), dtype=np.float32, buffer=self.memory.buf)
+        self.probabilities = np.ndarray((rows,), dtype=np.float32, buffer=self.memory.buf, offset=rows * columns * 4)
+        self.done = threading.Event()
+        self.error = None
+
+
+def _serve(model_path, columns, slot_names, slot_rows, tasks, results):
+    """Inference process: score slots named on ``tasks`` until told to stop or orphaned"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    with open(model_path, 'rb') as f:
+        model = pickle.load(f)
+    # One thread per process: the pool is the parallelism
+    if hasattr(model, "set_params"):
+        model.set_params(n_jobs=1)
+    # Attaching registers the segments with the worker's resource tracker again, a no-op
+    slots = [_Slot(i, slot_rows, len(columns), name) for i, name in enumerate(slot_names)]
+    parent = multiprocessing.parent_process()
+    while True:
+        try:
+            task = tasks.get(timeout=1.0)
+        except queue.Empty:
+            if parent is not None and not parent.is_alive():
+                return
+            continue
+        if task is None:
+            return
+        index, count = task
+        slot = slots[index]
+        try:
+            frame = pd.DataFrame(slot.features[:count], columns=columns, copy=False)
+            slot.probabilities[:count] = model.predict_proba(frame)[:, 1]
+            results.put((index, None))
+        except Exception as e:
+            results.put((index, f"{type(e).__name__}: {e}"))
+
+
+class InferencePool:
+    """Model inference in dedicated processes, fed through shared memory.
+
+    ``processes`` children load the model from ``model_path`` themselves and
+    wait for work on a queue that carries only (slot, rows). A request copies
+    its encoded feature matrix into free shared-memory slots of ``slot_rows``
+    rows each (larger inputs are split across slots and scored in parallel) and
+    reads the probabilities back from the same slots, so rows are never pickled
+    either. Inference then runs outside the worker's GIL.
+
+    The processes are started on first use, so each gunicorn worker gets its own,
+    through a fork server rather than by forking the worker: they inherit none of
+    its threads or an OpenMP runtime it already used for in-thread inference, so
+    the pool can be restarted after a failure at any time.
+    """
+
+    def __init__(self, model_path, columns, processes=2, slot_rows=4096, timeout=30.0):
+        self.model_path = model_path
+        self.columns = list(columns)
+        self.processes = max(1, processes)
+        self.slot_rows = slot_rows
+        self.timeout = timeout
+        self._slots = []
+        self._free = None
+        self._workers = []
+        self._tasks = self._results = None
+        self._pid = None
+        self._broken = False
+        self._lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    def start(self):
+        if self._pid == os.getpid() and not self._broken:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and not self._broken:
+                return
+            if self._pid == os.getpid():
+                self._stop()
+            context = multiprocessing.get_context("forkserver")
+            # Preload what the children need instead of __main__, so the server never runs app.py
+            context.set_forkserver_preload(["services.inference_service"])
+            self._slots = [_Slot(i, self.slot_rows, len(self.columns)) for i in range(self.processes * 2)]
+            self._free = queue.Queue()
+            for slot in self._slots:
+                self._free.put(slot)
+            self._tasks, self._results = context.Queue(), context.Queue()
+            self._workers = [
+                context.Process(
+                    target=_serve,
+                    args=(self.model_path, self.columns, [slot.memory.name for slot in self._slots],
+                          self.slot_rows, self._tasks, self._results),
+                    name=f"inference-{i}",
+                    daemon=True
+                )
+                for i in range(self.processes)
+            ]
+            for worker in self._workers:
+                worker.start()
+            self._pid = os.getpid()
+            self._broken = False
+            threading.Thread(target=self._collect, args=(self._results, self._slots, self._workers),
+                             name="inference-results", daemon=True).start()
+            logger.info(f"Started {self.processes} inference processes ({len(self._slots)} slots of {self.slot_rows} rows)")
+
+    def predict(self, frame):
+        """Probability of the positive class per row of an encoded frame (columns in model order)"""
+        self.start()
+        # Slots only ever go back to the queue they came from, even if the pool restarts meanwhile
+        free, tasks = self._free, self._tasks
+        values = frame.to_numpy(dtype=np.float32)
+        probabilities = np.empty(len(values), dtype=np.float32)
+        in_flight = []  # (slot, start, stop), oldest first
+        try:
+            for start in range(0, len(values), self.slot_rows):
+                stop = min(start + self.slot_rows, len(values))
+                # Reuse our own oldest slot rather than wait for one while holding others
+                try:
+                    slot = free.get(block=not in_flight, timeout=self.timeout)
+                except queue.Empty:
+                    if not in_flight:
+                        raise InferenceUnavailable("no free inference slot")
+                    slot = self._finish(free, *in_flight.pop(0), probabilities)
+                slot.features[:stop - start] = values[start:stop]
+                slot.error = None
+                slot.done.clear()
+                in_flight.append((slot, start, stop))
+                tasks.put((slot.index, stop - start))
+            while in_flight:
+                free.put(self._finish(free, *in_flight.pop(0), probabilities))
+        finally:
+            # Scored or not, a slot may still be written by a child: only hand it back once done,
+            # waiting at most one timeout for all of them
+            deadline = time.monotonic() + self.timeout
+            for slot, _, _ in in_flight:
+                if slot.done.wait(max(0.0, deadline - time.monotonic())):
+                    free.put(slot)
+        return probabilities
+
+    def _finish(self, free, slot, start, stop, probabilities):
+        if not slot.done.wait(self.timeout):
+            # The slot can't be reused while a child may still write to it; start over
+            metrics.inc("churn_inference_pool_errors_total", reason="timeout")
+            self._broken = True
+            raise InferenceUnavailable(f"inference timed out after {self.timeout}s")
+        if slot.error is not None:
+            metrics.inc("churn_inference_pool_errors_total", reason="error")
+            error = slot.error
+            free.put(slot)
+            raise InferenceUnavailable(error)
+        probabilities[start:stop] = slot.probabilities[:stop - start]
+        return slot
+
+    def _collect(self, results, slots, workers):
+        # Hands results to the waiting request threads; a dead child fails everything in flight
+        while True:
+            try:
+                index, error = results.get(timeout=1.0)
+            except queue.Empty:
+                if self._pid != os.getpid() or results is not self._results:
+                    return
+                if all(worker.is_alive() for worker in workers):
+                    continue
+                logger.error("An inference process died; restarting the pool on the next request")
+                metrics.inc("churn_inference_pool_errors_total", reason="process_died")
+                self._broken = True
+                for slot in slots:
+                    slot.error = "inference process died"
+                    slot.done.set()
+                return
+            except (EOFError, OSError):
+                return
+            slot = slots[index]
+            slot.error = error
+            slot.done.set()
+
+    def _stop(self):
+        for _ in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers:
+            worker.join(timeout=1.0)
+            if worker.is_alive():
+                worker.terminate()
+        for slot in self._slots:
+            slot.memory.unlink()
+            try:
+                slot.memory.close()
+            except BufferError:
+                pass  # a request thread still holds a view; the mapping goes when it does
+        self._workers, self._slots = [], []
+        self._results = None
+
+    def shutdown(self):
+        with self._lock:
+            if self._pid == os.getpid() and self._workers:
+                self._stop()
+                self._pid = None
@@ -0,0 +1,88 @@
+import json
+import uuid
+import logging
+import dataclasses
+from datetime import date, datetime
+from decimal import Decimal
+
+import numpy as np
+from bson import ObjectId
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib json module
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+def _default(obj):
+    """Conversions shared by both backends (orjson handles datetime and numpy natively)"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, "__html__"):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(JSONProvider):
+    """Flask JSON provider backed by orjson, with the stdlib json module as fallback.
+
+    Both backends serialize ObjectId as its hex string, datetimes as ISO 8601 and
+    numpy scalars/arrays as plain numbers/lists. Keys are not sorted and output is
+    compact unless the app runs in debug mode or ``compact`` is False.
+    """
+
+    compact = None
+    mimetype = "application/json"
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.backend = "orjson" if orjson is not None else "json"
+
+    def _indent(self):
+        return (self.compact is None and self._app.debug) or self.compact is False
+
+    def dumps(self, obj, **kwargs):
+        return self.dumps_bytes(obj, **kwargs).decode("utf-8")
+
+    def dumps_bytes(self, obj, indent=False, **kwargs):
+        if orjson is not None and not kwargs:
+            option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+            if indent:
+                option |= orjson.OPT_INDENT_2
+            try:
+                return orjson.dumps(obj, default=_default, option=option)
+            except TypeError:
+                # e.g. integers beyond 64 bits; let the stdlib path handle or report it
+                pass
+        kwargs.setdefault("default", _default)
+        kwargs.setdefault("ensure_ascii", False)
+        if indent:
+            kwargs.setdefault("indent", 2)
+        else:
+            kwargs.setdefault("separators", (",", ":"))
+        return json.dumps(obj, **kwargs).encode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = self.dumps_bytes(obj, indent=self._indent())
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
@@ -0,0 +1,100 @@
+import sys
+import json
+import queue
+import random
+import atexit
+import logging
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from services.metrics_service import metrics
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands records to a bounded queue without formatting them on the calling thread.
+
+    The stock QueueHandler formats each record in ``prepare()`` so it can be pickled;
+    records here never leave the process, so message interpolation is deferred to the
+    listener thread. When the queue is full the record is dropped and counted in
+    ``churn_log_records_dropped_total`` instead of blocking the request.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            metrics.inc("churn_log_records_dropped_total")
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of records logged with ``extra={"sampled": True}``; others always pass"""
+
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if self.rate >= 1.0 or not getattr(record, "sampled", False):
+            return True
+        return random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(level=logging.INFO, json_format=False, queue_size=10000, sample_rate=1.0, stream=None):
+    """Route all logging through a queue drained by a background listener thread.
+
+    Request threads only create the record and enqueue it; formatting and the write
+    to ``stream`` (stderr by default) happen on the listener. Returns the listener.
+    """
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(sample_rate))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    listener = QueueListener(log_queue, output, respect_handler_level=True)
+    listener.start()
+    atexit.register(_stop_listener, listener)
+    return listener
+
+
+def _stop_listener(listener):
+    # Flush what's queued at interpreter exit; tolerate listeners already stopped
+    if listener._thread is not None:
+        try:
+            listener.stop()
+        except queue.Full:
+            pass
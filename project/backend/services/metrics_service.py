@@ -0,0 +1,252 @@
+import os
+import json
+import time
+import glob
+import threading
+import logging
+from bisect import bisect_left
+
+from flask import has_request_context, request
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds; the +Inf bucket is implicit
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    "churn_request_duration_seconds": "End-to-end request latency per endpoint",
+    "churn_stage_duration_seconds": "Latency of pipeline stages (parsing, encoding, model, Mongo, SMTP/Twilio) per endpoint",
+    "churn_requests_total": "Requests handled per endpoint, method and status",
+    "churn_stage_errors_total": "Stages that raised an exception, per endpoint",
+    "churn_mongo_available": "1 while MongoDB is reachable from this worker, 0 while marked down",
+    "churn_mongo_pool_connections": "Open connections in the MongoDB pool per server",
+    "churn_mongo_pool_in_use": "MongoDB pool connections currently checked out per server",
+    "churn_mongo_pool_checkouts_total": "MongoDB connection checkouts",
+    "churn_mongo_pool_checkout_failures_total": "Failed MongoDB connection checkouts by reason (timeout = pool exhausted)",
+    "churn_mongo_pool_wait_seconds": "Time spent waiting to check out a MongoDB connection",
+    "churn_mongo_pool_cleared_total": "MongoDB pool clears (server marked unknown) per server",
+    "churn_admission_queue_length": "Requests waiting for an inference slot",
+    "churn_admission_active": "Requests currently running inference",
+    "churn_admission_wait_seconds": "Time admitted requests waited for an inference slot, per priority",
+    "churn_admission_rejections_total": "Requests shed by admission control, per reason and priority",
+    "churn_rate_limited_total": "Requests rejected by the per-caller rate limiter, per endpoint",
+    "churn_idempotency_requests_total": "Requests with an Idempotency-Key by outcome (new, replayed, waited, in_progress, mismatch)",
+    "churn_inference_pool_errors_total": "Inference process failures by reason (timeout, error, process_died); requests fall back to in-thread",
+    "churn_password_pool_errors_total": "Password hashing pool restarts by reason (broken, timeout)",
+    "churn_log_records_dropped_total": "Log records dropped because the log queue was full",
+    "churn_stream_active": "Open /api/stream connections on this worker",
+    "churn_stream_rejected_total": "Streams refused because the worker was at STREAM_MAX_PER_WORKER",
+    "churn_stream_events_total": "Events delivered to stream buffers, per event type",
+    "churn_stream_shared_total": "Per-user stream events (stats) computed once and shared, or reused, per outcome",
+    "churn_stream_events_dropped_total": "Events dropped because a stream's buffer was full, per event type",
+    "churn_model_loads_total": "Tenant model loads by outcome (loaded, failed, default = tenant has no models)",
+    "churn_model_load_seconds": "Time to load a tenant's model bundle from disk",
+    "churn_model_evictions_total": "Tenant model bundles evicted from the cache, per reason (memory, idle)",
+    "churn_model_cache_bytes": "Estimated memory held by cached tenant model bundles",
+    "churn_model_cache_tenants": "Tenant model bundles currently cached",
+}
+
+
+def current_endpoint():
+    if has_request_context():
+        return request.endpoint or "unknown"
+    return "background"
+
+
+class MetricsRegistry:
+    """In-process histograms and counters with Prometheus text exposition.
+
+    Each gunicorn worker records into its own registry. When ``directory`` is set,
+    workers periodically write snapshots there (one file per pid) and ``render()``
+    merges every snapshot, so any worker can serve totals for the whole host.
+    Snapshots of exited workers still count towards histograms and counters, but
+    their gauges are dropped, as prometheus_client does for dead processes.
+    Clear the directory on deploy, as with prometheus_client's multiprocess mode.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+        self.directory = None
+        self._flusher = None
+
+    # Recording
+
+    def observe(self, name, value, **labels):
+        self._observe((name, tuple(sorted(labels.items()))), value)
+
+    def _observe(self, key, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._histograms.get(key)
+            if entry is None:
+                entry = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def inc(self, name, amount=1, **labels):
+        self._inc((name, tuple(sorted(labels.items()))), amount)
+
+    def _inc(self, key, amount=1):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        """Gauges are per worker; merged snapshots sum them across workers"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = value
+
+    def stage(self, stage, endpoint=None):
+        """Time a ``with`` block as ``churn_stage_duration_seconds{endpoint, stage}``"""
+        return _StageTimer(self, stage, endpoint or current_endpoint())
+
+    # Cross-worker aggregation
+
+    def configure(self, directory=None, flush_interval=5.0):
+        """Enable snapshot files in ``directory`` and start the background flusher"""
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, args=(flush_interval,), daemon=True)
+            self._flusher.start()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "histograms": [
+                    [name, list(labels), [list(entry[0]), entry[1], entry[2]]]
+                    for (name, labels), entry in self._histograms.items()
+                ],
+                "counters": [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                "gauges": [[name, list(labels), value] for (name, labels), value in self._gauges.items()],
+            }
+
+    def flush(self):
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def _flush_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"Metrics flush failed: {e}")
+
+    def _merged(self):
+        snapshots = []
+        if self.directory:
+            self.flush()
+            for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+                try:
+                    with open(path) as f:
+                        snap = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                pid = os.path.basename(path)[len("metrics-"):-len(".json")]
+                if not _pid_alive(pid):
+                    # A recycled or crashed worker's last gauge values no longer describe anything
+                    snap["gauges"] = []
+                snapshots.append(snap)
+        else:
+            snapshots.append(self.snapshot())
+
+        histograms, counters, gauges = {}, {}, {}
+        for snap in snapshots:
+            for name, labels, (counts, total, count) in snap["histograms"]:
+                key = (name, tuple(tuple(label) for label in labels))
+                entry = histograms.setdefault(key, [[0] * len(counts), 0.0, 0])
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += total
+                entry[2] += count
+            for kind, merged in (("counters", counters), ("gauges", gauges)):
+                for name, labels, value in snap[kind]:
+                    key = (name, tuple(tuple(label) for label in labels))
+                    merged[key] = merged.get(key, 0) + value
+        return histograms, counters, gauges
+
+    # Exposition
+
+    def render(self):
+        """Prometheus text format (version 0.0.4)"""
+        histograms, counters, gauges = self._merged()
+        lines = []
+        seen = set()
+
+        def header(name, kind):
+            if (name, kind) not in seen:
+                seen.add((name, kind))
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        def fmt(labels, extra=None):
+            pairs = list(labels) + ([extra] if extra else [])
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+        for (name, labels), (counts, total, count) in sorted(histograms.items()):
+            header(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{fmt(labels, ('le', repr(bound)))} {cumulative}")
+            lines.append(f"{name}_bucket{fmt(labels, ('le', '+Inf'))} {count}")
+            lines.append(f"{name}_sum{fmt(labels)} {total}")
+            lines.append(f"{name}_count{fmt(labels)} {count}")
+
+        for kind, merged in (("counter", counters), ("gauge", gauges)):
+            for (name, labels), value in sorted(merged.items()):
+                header(name, kind)
+                lines.append(f"{name}{fmt(labels)} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+class _StageTimer:
+    # A plain class rather than @contextmanager keeps the per-call cost down
+    __slots__ = ("registry", "labels", "start")
+
+    def __init__(self, registry, stage, endpoint):
+        self.registry = registry
+        self.labels = (("endpoint", endpoint), ("stage", stage))
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry._observe(("churn_stage_duration_seconds", self.labels), time.perf_counter() - self.start)
+        if exc_type is not None:
+            self.registry._inc(("churn_stage_errors_total", self.labels))
+        return False
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True  # exists, owned by another user
+    return True
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# Global metrics registry instance
+metrics = MetricsRegistry()
@@ -0,0 +1,191 @@
+import os
+import re
+import time
+import pickle
+import threading
+import logging
+from collections import OrderedDict
+
+from services.metrics_service import metrics
+
+logger = logging.getLogger(__name__)
+
+TENANT_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class ModelBundle:
+    """Model, encoder and optional scaler served together, with an estimated memory footprint"""
+
+    __slots__ = ("tenant", "model", "encoder", "scaler", "version", "size")
+
+    def __init__(self, tenant, model, encoder, scaler=None, version=None, size=0):
+        self.tenant = tenant
+        self.model = model
+        self.encoder = encoder
+        self.scaler = scaler
+        self.version = version
+        self.size = size
+
+
+def load_bundle(tenant, directory, fingerprint=None):
+    """Load ``model.pkl``, ``encoder.pkl`` and optional ``scaler.pkl`` from ``directory``.
+
+    The size estimate is the artifacts' pickled size: for tree ensembles the
+    unpickled booster takes about as much memory as its serialized form.
+    """
+    artifacts, size = {}, 0
+    for name, required in (("model", True), ("encoder", True), ("scaler", False)):
+        path = os.path.join(directory, f"{name}.pkl")
+        if not os.path.exists(path):
+            if required:
+                raise FileNotFoundError(f"{path} not found")
+            continue
+        with open(path, 'rb') as f:
+            artifacts[name] = pickle.load(f)
+        size += os.path.getsize(path)
+    version = fingerprint(os.path.join(directory, "model.pkl")) if fingerprint else None
+    return ModelBundle(tenant, artifacts["model"], artifacts["encoder"], artifacts.get("scaler"), version, size)
+
+
+class _Loading:
+    __slots__ = ("done", "bundle", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.bundle = None
+        self.error = None
+
+    def result(self):
+        if self.error is not None:
+            raise self.error
+        return self.bundle
+
+
+class TenantModels:
+    """Per-tenant model bundles, loaded on first use and kept in a memory-bounded LRU.
+
+    A tenant's bundle lives in ``directory/<tenant>/``; tenants without one (and
+    requests without a tenant) get ``default``. Loaded bundles are evicted least
+    recently used first once their estimated sizes pass ``max_bytes`` (the bundle
+    just loaded is always kept), and when unused for ``idle_seconds``. Concurrent
+    requests for a tenant that is not loaded yet wait on a single load.
+
+    Tenants without a directory, and tenants whose models failed to load, are
+    remembered for ``retry_seconds`` (up to ``max_unserved`` of them), so their
+    requests neither re-check the disk nor re-read a broken pickle each time.
+    """
+
+    def __init__(self, directory, default=None, max_bytes=1 << 30, idle_seconds=3600.0, loader=None,
+                 retry_seconds=30.0, max_unserved=10000):
+        self.directory = directory
+        self.default = default
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self.loader = loader or load_bundle
+        self.retry_seconds = retry_seconds
+        self.max_unserved = max_unserved
+        self._bundles = OrderedDict()  # tenant -> [bundle, last used]
+        self._unserved = OrderedDict()  # tenant -> (retry at, load error or None for the default)
+        self._loading = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, tenant):
+        """The bundle serving ``tenant``; None when neither it nor the default is available"""
+        if not tenant:
+            return self.default
+        if not TENANT_NAME.match(tenant):
+            raise ValueError(f"Invalid tenant name {tenant!r}")
+
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._bundles.get(tenant)
+            if entry is not None:
+                entry[1] = now
+                self._bundles.move_to_end(tenant)
+                return entry[0]
+            unserved = self._unserved.get(tenant)
+            if unserved is not None and unserved[0] > now:
+                if unserved[1] is not None:
+                    raise unserved[1].with_traceback(None)
+                return self.default
+            loading = self._loading.get(tenant)
+            leader = loading is None
+            if leader:
+                loading = self._loading[tenant] = _Loading()
+
+        if not leader:
+            loading.done.wait()
+            return loading.result()
+
+        bundle = None
+        try:
+            bundle = self._load(tenant)
+        except Exception as e:
+            loading.error = e
+        with self._lock:
+            del self._loading[tenant]
+            if bundle is not None:
+                self._unserved.pop(tenant, None)
+                self._store(tenant, bundle, time.monotonic())
+                loading.bundle = bundle
+            else:
+                self._remember_unserved(tenant, loading.error)
+                loading.bundle = self.default
+        loading.done.set()
+        return loading.result()
+
+    def _remember_unserved(self, tenant, error):
+        previous = self._unserved.pop(tenant, None)
+        if error is None and (previous is None or previous[1] is not None):
+            # Counted when a tenant starts resolving to the default, not on every recheck
+            metrics.inc("churn_model_loads_total", outcome="default")
+        self._unserved[tenant] = (time.monotonic() + self.retry_seconds, error)
+        while len(self._unserved) > self.max_unserved:
+            self._unserved.popitem(last=False)
+
+    def _load(self, tenant):
+        """The tenant's own bundle; None when it has no directory"""
+        directory = os.path.join(self.directory, tenant)
+        if not os.path.isdir(directory):
+            return None
+        started = time.perf_counter()
+        try:
+            bundle = self.loader(tenant, directory)
+        except Exception:
+            metrics.inc("churn_model_loads_total", outcome="failed")
+            logger.exception(f"Failed to load models for tenant {tenant}")
+            raise
+        metrics.inc("churn_model_loads_total", outcome="loaded")
+        metrics.observe("churn_model_load_seconds", time.perf_counter() - started)
+        logger.info(f"Loaded models for tenant {tenant} ({bundle.size / 2 ** 20:.1f} MiB, version {bundle.version})")
+        return bundle
+
+    def _store(self, tenant, bundle, now):
+        self._bundles[tenant] = [bundle, now]
+        self._bytes += bundle.size
+        while self._bytes > self.max_bytes and len(self._bundles) > 1:
+            self._evict(next(iter(self._bundles)), "memory")
+        if bundle.size > self.max_bytes:
+            logger.warning(f"Models for tenant {tenant} ({bundle.size} bytes) exceed the cache limit of {self.max_bytes}")
+        self._publish()
+
+    def _expire(self, now):
+        # Ordered by last use, so idle entries are at the front
+        while self._bundles:
+            tenant, (_, last_used) = next(iter(self._bundles.items()))
+            if now - last_used < self.idle_seconds:
+                break
+            self._evict(tenant, "idle")
+            self._publish()
+
+    def _evict(self, tenant, reason):
+        bundle, _ = self._bundles.pop(tenant)
+        self._bytes -= bundle.size
+        metrics.inc("churn_model_evictions_total", reason=reason)
+        logger.info(f"Evicted models for tenant {tenant} ({reason})")
+
+    def _publish(self):
+        metrics.set_gauge("churn_model_cache_bytes", self._bytes)
+        metrics.set_gauge("churn_model_cache_tenants", len(self._bundles))
@@ -4,6 +4,7 @@ from email.mime.multipart import MIMEMultipart
 from twilio.rest import Client
 import os
 import logging
+from services.metrics_service import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -43,13 +44,14 @@ class NotificationService:
             html_body = self._create_email_template(message, prediction_data)
             msg.attach(MIMEText(html_body, 'html'))
             
-            server = smtplib.SMTP(self.smtp_host, self.smtp_port)
-            server.starttls()
-            server.login(self.smtp_user, self.smtp_pass)
-            
-            text = msg.as_string()
-            server.sendmail(self.smtp_user, to_email, text)
-            server.quit()
+            with metrics.stage("smtp_send"):
+                server = smtplib.SMTP(self.smtp_host, self.smtp_port)
+                server.starttls()
+                server.login(self.smtp_user, self.smtp_pass)
+
+                text = msg.as_string()
+                server.sendmail(self.smtp_user, to_email, text)
+                server.quit()
             
             logger.info(f"Email alert sent to {to_email}")
             return True
@@ -65,11 +67,12 @@ class NotificationService:
             return False
             
         try:
-            self.twilio_client.messages.create(
-                body=message,
-                from_=self.twilio_phone,
-                to=to_phone
-            )
+            with metrics.stage("twilio_send"):
+                self.twilio_client.messages.create(
+                    body=message,
+                    from_=self.twilio_phone,
+                    to=to_phone
+                )
             
             logger.info(f"SMS alert sent to {to_phone}")
             return True
@@ -0,0 +1,101 @@
+import threading
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from services.metrics_service import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHasher:
+    """Hash and verify passwords in a dedicated process pool.
+
+    Request threads only wait on a future, so a burst of logins doesn't compete
+    with prediction threads for the worker's GIL and CPU. ``method`` is any werkzeug
+    method string, e.g. ``scrypt`` or ``pbkdf2:sha256:600000``; the cost is part
+    of the string. ``workers=0`` hashes inline on the calling thread.
+
+    A pool whose process died is replaced and the call retried once; a call that
+    still can't be served, or that times out, hashes inline instead of failing.
+    """
+
+    def __init__(self, method="scrypt", workers=2, timeout=30.0):
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # werkzeug expands defaults (scrypt -> scrypt:32768:8:1), so let it expand the method once
+        self._method_prefix = generate_password_hash("", method).split("$", 1)[0]
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, stored_hash, password):
+        return self._run(check_password_hash, stored_hash, password)
+
+    def needs_rehash(self, stored_hash):
+        """True when a stored hash was produced with different method or cost parameters"""
+        return stored_hash.split("$", 1)[0] != self._method_prefix
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def _run(self, func, *args):
+        if self.workers <= 0:
+            return func(*args)
+        for _ in range(2):
+            pool = self._executor()
+            try:
+                future = pool.submit(func, *args)
+            except (BrokenProcessPool, RuntimeError):
+                # Broken, or shut down by another thread that found it broken
+                self._discard(pool, "broken")
+                continue
+            try:
+                return future.result(timeout=self.timeout)
+            except BrokenProcessPool:
+                self._discard(pool, "broken")
+            except FutureTimeout:
+                # The job can't be cancelled once running; kill the pool so its process is freed
+                future.cancel()
+                self._discard(pool, "timeout", terminate=True)
+                break
+        return func(*args)
+
+    def _discard(self, pool, reason, terminate=False):
+        """Drop ``pool`` so the next call starts a fresh one; in-flight calls on it retry there"""
+        with self._pool_lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+        logger.warning(f"Password hashing pool {reason}; restarting it")
+        metrics.inc("churn_password_pool_errors_total", reason=reason)
+        if terminate:
+            for process in list((getattr(pool, "_processes", None) or {}).values()):
+                process.terminate()
+        pool.shutdown(wait=False)
+
+    def _executor(self):
+        # Created on first use so each gunicorn worker gets its own pool after fork.
+        # fork rather than forkserver/spawn: those re-run app.py in every child when
+        # it is started as a script. Forking a worker whose log listener, health and
+        # metrics threads are running is safe here because a child only ever runs
+        # werkzeug's hash functions (hashlib, no OpenMP) on arguments it unpickles:
+        # it never logs, touches Mongo or the metrics registry, so it can't block on a
+        # lock one of those threads held at fork time.
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("fork")
+                    )
+                    logger.info(f"Started password hashing pool with {self.workers} processes ({self.method})")
+        return self._pool
@@ -0,0 +1,168 @@
+import os
+import sys
+import json
+import time
+import threading
+import logging
+from collections import Counter
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class SamplingProfiler:
+    """On-demand statistical profiler for a single worker process.
+
+    While a session runs, a background thread snapshots the Python stacks of the
+    profiled threads every ``interval`` seconds. A session covers either a fixed
+    duration (all threads) or the next N requests handled by this worker (only the
+    threads serving them). When no session is running there is no sampler thread
+    and the request hooks only read ``active``.
+
+    Each finished session writes ``<id>.collapsed`` (one ``frame;frame;... count``
+    line per stack, the input format of flamegraph.pl and speedscope) and
+    ``<id>.json`` (per-function self/total sample counts) to ``output_dir``.
+    """
+
+    def __init__(self, output_dir, max_duration=60.0, max_requests=1000, top_functions=50):
+        self.output_dir = output_dir
+        self.max_duration = max_duration
+        self.max_requests = max_requests
+        self.top_functions = top_functions
+        self.active = False
+        self._lock = threading.Lock()
+        self._session = None
+
+    def start(self, duration=None, requests=None, interval=0.005):
+        """Start a session and return its id; raises RuntimeError if one is already running"""
+        if requests is None and duration is None:
+            raise ValueError("Either duration or requests is required")
+        with self._lock:
+            if self.active:
+                raise RuntimeError("A profiling session is already running in this worker")
+            session_id = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{os.getpid()}"
+            self._session = {
+                "id": session_id,
+                "mode": "requests" if requests is not None else "duration",
+                "remaining": min(int(requests), self.max_requests) if requests is not None else 0,
+                "requests": 0,
+                "threads": set(),
+                "deadline": time.monotonic() + min(float(duration or self.max_duration), self.max_duration),
+                "interval": max(0.001, float(interval)),
+                "stop": threading.Event(),
+                "started_at": datetime.utcnow().isoformat(),
+            }
+            self.active = True
+        threading.Thread(target=self._sample, args=(self._session,), name="sampling-profiler", daemon=True).start()
+        logger.info(f"Profiling session {session_id} started ({self._session['mode']})")
+        return session_id
+
+    def enter_request(self):
+        session = self._session
+        if session is None or session["mode"] != "requests":
+            return
+        with self._lock:
+            if session["remaining"] > 0:
+                session["remaining"] -= 1
+                session["requests"] += 1
+                session["threads"].add(threading.get_ident())
+
+    def exit_request(self):
+        session = self._session
+        if session is None or session["mode"] != "requests":
+            return
+        with self._lock:
+            session["threads"].discard(threading.get_ident())
+            if session["remaining"] == 0 and not session["threads"]:
+                session["stop"].set()
+
+    def load(self, session_id):
+        """Return a finished session's summary and collapsed stacks, or None"""
+        if not session_id.replace("-", "").replace("T", "").isalnum():
+            return None
+        summary_path = os.path.join(self.output_dir, f"{session_id}.json")
+        if not os.path.exists(summary_path):
+            return None
+        with open(summary_path) as f:
+            summary = json.load(f)
+        with open(os.path.join(self.output_dir, f"{session_id}.collapsed")) as f:
+            summary["collapsed"] = f.read()
+        return summary
+
+    def _sample(self, session):
+        own_ident = threading.get_ident()
+        stacks = Counter()
+        samples = 0
+        try:
+            while not session["stop"].is_set() and time.monotonic() < session["deadline"]:
+                if session["mode"] == "requests":
+                    with self._lock:
+                        targets = set(session["threads"])
+                else:
+                    targets = None
+                for ident, frame in sys._current_frames().items():
+                    if ident == own_ident or (targets is not None and ident not in targets):
+                        continue
+                    stacks[self._stack(frame)] += 1
+                    samples += 1
+                session["stop"].wait(session["interval"])
+        finally:
+            with self._lock:
+                self.active = False
+                self._session = None
+            try:
+                self._write(session, stacks, samples)
+            except Exception as e:
+                logger.error(f"Failed to write profile {session['id']}: {e}")
+
+    @staticmethod
+    def _stack(frame):
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append((code.co_filename, code.co_firstlineno, code.co_name))
+            frame = frame.f_back
+        frames.reverse()
+        return tuple(frames)
+
+    def _write(self, session, stacks, samples):
+        os.makedirs(self.output_dir, exist_ok=True)
+        self_counts = Counter()
+        total_counts = Counter()
+        lines = []
+        for stack, count in stacks.items():
+            self_counts[stack[-1]] += count
+            for frame in set(stack):
+                total_counts[frame] += count
+            lines.append(";".join(f"{os.path.basename(f)}:{name}" for f, _, name in stack) + f" {count}")
+
+        def describe(frame):
+            filename, line, name = frame
+            return {
+                "function": name,
+                "file": filename,
+                "line": line,
+                "self": self_counts[frame],
+                "total": total_counts[frame],
+                "selfPercent": round(100.0 * self_counts[frame] / samples, 2) if samples else 0.0,
+                "totalPercent": round(100.0 * total_counts[frame] / samples, 2) if samples else 0.0,
+            }
+
+        summary = {
+            "id": session["id"],
+            "pid": os.getpid(),
+            "mode": session["mode"],
+            "requests": session["requests"],
+            "startedAt": session["started_at"],
+            "finishedAt": datetime.utcnow().isoformat(),
+            "intervalMs": session["interval"] * 1000,
+            "samples": samples,
+            "functions": [describe(frame) for frame, _ in self_counts.most_common(self.top_functions)],
+            "cumulative": [describe(frame) for frame, _ in total_counts.most_common(self.top_functions)],
+        }
+
+        with open(os.path.join(self.output_dir, f"{session['id']}.collapsed"), "w") as f:
+            f.write("\n".join(sorted(lines)) + "\n")
+        with open(os.path.join(self.output_dir, f"{session['id']}.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+        logger.info(f"Profiling session {session['id']} finished: {samples} samples")
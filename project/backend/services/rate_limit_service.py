@@ -0,0 +1,163 @@
+import os
+import re
+import mmap
+import math
+import time
+import fcntl
+import struct
+import hashlib
+import threading
+
+PERIODS = {"s": 1, "second": 1, "m": 60, "minute": 60, "h": 3600, "hour": 3600, "d": 86400, "day": 86400}
+_LIMIT = re.compile(r"^\s*(\d+)\s*/\s*([a-z]+)\s*(?::\s*(\d+))?\s*$")
+
+
+def parse_limit(spec):
+    """``"60/minute"`` or ``"60/minute:10"`` (burst) -> (tokens per second, burst); None if empty"""
+    if not spec:
+        return None
+    match = _LIMIT.match(spec.lower())
+    if not match or match.group(2) not in PERIODS:
+        raise ValueError(f"Invalid rate limit {spec!r}; expected <count>/<second|minute|hour|day>[:burst]")
+    count, period, burst = int(match.group(1)), PERIODS[match.group(2)], match.group(3)
+    return count / period, int(burst) if burst else count
+
+
+def _refill(tokens, last, now, rate, burst):
+    """Token bucket step: returns (allowed, tokens left, refill time to store, seconds until the next token).
+
+    ``now`` was read before the lock, so a concurrent caller may already have
+    stored a later time; never move it backwards, or that interval is credited twice.
+    """
+    now = max(now, last)
+    tokens = min(burst, tokens + (now - last) * rate)
+    if tokens >= 1.0:
+        return True, tokens - 1.0, now, 0.0
+    return False, tokens, now, (1.0 - tokens) / rate
+
+
+class MemoryBuckets:
+    """Buckets in a dict; limits hold per process only. Past ``max_keys`` callers
+    the dict is cleared rather than grown, which refills every bucket."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def take(self, key, rate, burst, now):
+        with self._lock:
+            if len(self._buckets) >= self.max_keys and key not in self._buckets:
+                self._buckets.clear()
+            tokens, last = self._buckets.get(key, (burst, now))
+            allowed, tokens, now, wait = _refill(tokens, last, now, rate, burst)
+            self._buckets[key] = (tokens, now)
+            return allowed, tokens, wait
+
+
+class FileBuckets:
+    """Buckets in a memory-mapped file shared by every worker on the host.
+
+    The file is a header holding a random per-install secret followed by a fixed
+    table of ``slots`` records (key hash, tokens, last refill time, time the
+    bucket is full again). Keys are hashed with the secret, so slot collisions
+    can't be precomputed. A key probes at most ``probe`` slots, so a check is O(1)
+    and the file never grows. When all are taken by other keys, a bucket that has
+    already refilled is reused; failing that, the stalest one is taken over with
+    its tokens, so evicting a bucket never hands out a fresh burst. Updates hold
+    an exclusive ``flock`` on the file (plus a thread lock, since flock does not
+    exclude threads of one process) for the few microseconds of the read-modify-write.
+    """
+
+    RECORD = struct.Struct("<Qddd")
+    HEADER = struct.Struct("<8s16s8x")
+    MAGIC = b"CHRNRL02"
+
+    def __init__(self, path, slots=65536, probe=8):
+        self.path = path
+        self.slots = slots
+        self.probe = probe
+        self._lock = threading.Lock()
+        self._pid = None
+        self._file = self._map = None
+        self._secret = None
+
+    def _open(self):
+        # Reopen after fork so each worker has its own descriptor (and its own flock)
+        if self._pid == os.getpid():
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        size = self.HEADER.size + self.slots * self.RECORD.size
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            header = os.pread(fd, self.HEADER.size, 0)
+            if os.fstat(fd).st_size != size or not header.startswith(self.MAGIC):
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+                header = self.HEADER.pack(self.MAGIC, os.urandom(16))
+                os.pwrite(fd, header, 0)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        self._secret = self.HEADER.unpack(header)[1]
+        self._file = fd
+        self._map = mmap.mmap(fd, size)
+        self._pid = os.getpid()
+
+    def _slot(self, key_hash, now, burst):
+        """Offset of the key's record and its (tokens, last); claims a slot if the key is new"""
+        start = key_hash % self.slots
+        refilled = stalest = None
+        for i in range(self.probe):
+            offset = self.HEADER.size + ((start + i) % self.slots) * self.RECORD.size
+            stored, tokens, last, full_at = self.RECORD.unpack_from(self._map, offset)
+            if stored == key_hash:
+                return offset, tokens, last
+            if stored == 0:
+                return offset, float(burst), now
+            if full_at <= now and (refilled is None or last < refilled[1]):
+                refilled = (offset, last)
+            if stalest is None or last < stalest[2]:
+                stalest = (offset, tokens, last)
+        if refilled is not None:
+            # Its owner would be back at a full bucket anyway; nothing is lost by reusing it
+            return refilled[0], float(burst), now
+        return stalest
+
+    def take(self, key, rate, burst, now):
+        with self._lock:
+            self._open()
+            key_hash = int.from_bytes(
+                hashlib.blake2b(key.encode(), digest_size=8, key=self._secret).digest(), "little"
+            ) or 1
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+            try:
+                offset, tokens, last = self._slot(key_hash, now, burst)
+                allowed, tokens, now, wait = _refill(tokens, last, now, rate, burst)
+                self.RECORD.pack_into(self._map, offset, key_hash, tokens, now, now + (burst - tokens) / rate)
+            finally:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+        return allowed, tokens, wait
+
+
+class RateLimiter:
+    """Per-scope token buckets, keyed by caller (user id or client IP).
+
+    ``limits`` maps a scope name to (tokens per second, burst). A check costs one
+    hash and one bucket update regardless of the number of callers.
+    """
+
+    def __init__(self, buckets, limits):
+        self.buckets = buckets
+        self.limits = {scope: limit for scope, limit in limits.items() if limit}
+
+    def check(self, scope, caller):
+        """(allowed, limit, remaining, retry_after seconds) for one request; None if ``scope`` is unlimited"""
+        limit = self.limits.get(scope)
+        if limit is None:
+            return None
+        rate, burst = limit
+        allowed, tokens, wait = self.buckets.take(f"{scope}:{caller}", rate, burst, time.time())
+        return allowed, burst, int(tokens), max(1, math.ceil(wait)) if not allowed else 0
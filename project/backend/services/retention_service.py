@@ -0,0 +1,125 @@
+import os
+import time
+import uuid
+import threading
+import logging
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING
+
+logger = logging.getLogger(__name__)
+
+
+def ensure_ttl_index(collection, field, seconds, name):
+    """Create, retune or drop a TTL index so it matches ``seconds`` (0 disables it)"""
+    existing = collection.index_information().get(name)
+    if not seconds:
+        if existing:
+            collection.drop_index(name)
+            logger.info(f"Dropped TTL index {name}")
+        return
+    if existing is None:
+        collection.create_index([(field, ASCENDING)], name=name, expireAfterSeconds=int(seconds))
+        logger.info(f"Created TTL index {name} ({seconds}s)")
+    elif existing.get("expireAfterSeconds") != int(seconds):
+        collection.database.command(
+            "collMod", collection.name, index={"name": name, "expireAfterSeconds": int(seconds)}
+        )
+        logger.info(f"Changed TTL index {name} to {seconds}s")
+
+
+class HistoryDeletionJobs:
+    """Deletes predictions in the background, one bounded ``_id`` range at a time.
+
+    Each chunk looks up the next ``chunk_size`` ids in ``_id`` order (within the
+    job's user scope, up to the newest id that existed when the job started, so
+    predictions made meanwhile survive) and deletes that range. After each chunk
+    the job sleeps at least as long as the chunk took and never less than
+    ``pause``, keeping the database at most half busy with deletes. Progress is
+    stored in ``jobs_collection`` so any worker can report it; ``on_finished`` is
+    called with the user scope once a job has completed, and its outcome is
+    recorded separately as ``cleanup`` (running, completed or failed).
+    """
+
+    def __init__(self, predictions, jobs_collection, chunk_size=1000, pause=0.05, on_finished=None):
+        self.predictions = predictions
+        self.jobs = jobs_collection
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.on_finished = on_finished
+
+    def start(self, requested_by, user_id=None):
+        """Record a job and run it on a background thread; returns the job document"""
+        query = {"userId": user_id} if user_id else {}
+        newest = self.predictions.find_one(query, {"_id": 1}, sort=[("_id", DESCENDING)])
+        job = {
+            "_id": uuid.uuid4().hex,
+            "status": "running" if newest else "completed",
+            "userId": user_id,
+            "requestedBy": requested_by,
+            "upToId": newest["_id"] if newest else None,
+            "deleted": 0,
+            "chunks": 0,
+            "createdAt": datetime.utcnow(),
+            "updatedAt": datetime.utcnow(),
+            "finishedAt": None if newest else datetime.utcnow(),
+            "worker": os.getpid(),
+            "error": None,
+        }
+        self.jobs.insert_one(job)
+        if newest:
+            threading.Thread(target=self._run, args=(job,), name=f"history-delete-{job['_id'][:8]}", daemon=True).start()
+        return job
+
+    def get(self, job_id):
+        return self.jobs.find_one({"_id": job_id})
+
+    def _run(self, job):
+        scope = {"userId": job["userId"]} if job["userId"] else {}
+        upper = job["upToId"]
+        id_range = {"$lte": upper}
+        deleted = chunks = 0
+        try:
+            while True:
+                started = time.perf_counter()
+                ids = [
+                    document["_id"] for document in
+                    self.predictions.find({**scope, "_id": id_range}, {"_id": 1})
+                    .sort("_id", ASCENDING).limit(self.chunk_size)
+                ]
+                if not ids:
+                    break
+                # Resume after this chunk so other users' ids are not rescanned
+                id_range = {"$gt": ids[-1], "$lte": upper}
+                result = self.predictions.delete_many({**scope, "_id": {"$gte": ids[0], "$lte": ids[-1]}})
+                deleted += result.deleted_count
+                chunks += 1
+                self.jobs.update_one({"_id": job["_id"]}, {"$set": {
+                    "deleted": deleted, "chunks": chunks, "updatedAt": datetime.utcnow()
+                }})
+                time.sleep(max(self.pause, time.perf_counter() - started))
+
+            self.jobs.update_one({"_id": job["_id"]}, {"$set": {
+                "status": "completed", "deleted": deleted, "chunks": chunks,
+                "cleanup": "running" if self.on_finished is not None else None,
+                "updatedAt": datetime.utcnow(), "finishedAt": datetime.utcnow()
+            }})
+            logger.info(f"History deletion {job['_id']} completed: {deleted} predictions in {chunks} chunks")
+        except Exception as e:
+            logger.error(f"History deletion {job['_id']} failed after {deleted} predictions: {e}")
+            self.jobs.update_one({"_id": job["_id"]}, {"$set": {
+                "status": "failed", "deleted": deleted, "chunks": chunks, "error": str(e),
+                "updatedAt": datetime.utcnow(), "finishedAt": datetime.utcnow()
+            }})
+            return
+
+        if self.on_finished is None:
+            return
+        # The deletes stand either way; a cleanup failure is reported on its own
+        try:
+            self.on_finished(job["userId"])
+            cleanup = {"cleanup": "completed"}
+        except Exception as e:
+            logger.error(f"Cleanup after history deletion {job['_id']} failed: {e}")
+            cleanup = {"cleanup": "failed", "cleanupError": str(e)}
+        self.jobs.update_one({"_id": job["_id"]}, {"$set": {**cleanup, "updatedAt": datetime.utcnow()}})
@@ -0,0 +1,176 @@
+import itertools
+import time
+import threading
+import logging
+from bisect import insort
+from collections import OrderedDict
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+MAX_CUSTOMER_ID_LENGTH = 128
+
+
+def customer_key(customer_data):
+    """``customerId`` from the prediction input; None when the prediction names no customer"""
+    customer_id = (customer_data or {}).get("customerId")
+    return None if customer_id in (None, "") else str(customer_id)[:MAX_CUSTOMER_ID_LENGTH]
+
+
+class _CachedTop:
+    __slots__ = ("entries", "complete", "expires")
+
+    def __init__(self, entries, complete, expires):
+        self.entries = entries    # [(-probability, customerId, entry)], best first
+        self.complete = complete  # True when entries hold every customer of the user
+        self.expires = expires
+
+
+class TopRiskIndex:
+    """Latest prediction per (user, customer), served highest probability first.
+
+    Only predictions whose input carries a ``customerId`` are indexed: without
+    one there is no way to tell a new customer from a changed one, and every
+    prediction would become a customer of its own.
+    ``collection`` holds one document per customer, replaced only by a newer
+    prediction, with an index on (userId, probability) so the top K is an index
+    scan of K entries whatever the history size. Each worker caches the top
+    ``cache_size`` per user for ``cache_ttl`` seconds (LRU over ``max_users``)
+    and folds its own inserts into the cached list; inserts from other workers
+    show up once the entry expires.
+    """
+
+    def __init__(self, collection, decode=None, cache_size=100, cache_ttl=10.0, max_users=1000):
+        self.collection = collection
+        self.decode = decode or (lambda document: document)
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.max_users = max_users
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def ensure_indexes(self):
+        self.collection.create_index([("userId", ASCENDING), ("customerId", ASCENDING)], unique=True)
+        self.collection.create_index([("userId", ASCENDING), ("probability", DESCENDING)])
+
+    def _entry(self, document):
+        prediction = self.decode(document)
+        return {
+            "userId": prediction["userId"],
+            "customerId": customer_key(prediction.get("customerData")),
+            "predictionId": prediction["_id"] if "_id" in prediction else prediction["id"],
+            "timestamp": prediction["timestamp"],
+            "prediction": prediction["prediction"],
+            "probability": float(prediction["probability"]),
+            "riskLevel": prediction.get("riskLevel", "Unknown"),
+            "customerData": prediction.get("customerData", {}),
+        }
+
+    def record(self, predictions):
+        """Fold stored prediction documents (either schema) into the index; returns entries written"""
+        latest = {}
+        for document in predictions:
+            if not document.get("userId"):
+                continue
+            entry = self._entry(document)
+            if entry["customerId"] is None:
+                continue
+            key = (entry["userId"], entry["customerId"])
+            if key not in latest or latest[key]["timestamp"] <= entry["timestamp"]:
+                latest[key] = entry
+        if not latest:
+            return 0
+
+        # A newer stored entry makes the filter miss; the upsert then hits the unique index and is skipped
+        entries = list(latest.values())
+        operations = [
+            UpdateOne(
+                {"userId": entry["userId"], "customerId": entry["customerId"], "timestamp": {"$lte": entry["timestamp"]}},
+                {"$set": entry},
+                upsert=True
+            )
+            for entry in entries
+        ]
+        skipped = set()
+        try:
+            self.collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != DUPLICATE_KEY for error in errors):
+                raise
+            skipped = {error["index"] for error in errors}
+
+        with self._lock:
+            for entry in (entry for i, entry in enumerate(entries) if i not in skipped):
+                cached = self._cache.get(entry["userId"])
+                if cached is not None:
+                    self._apply(cached, entry)
+        return len(entries) - len(skipped)
+
+    def _apply(self, cached, entry):
+        """Update a cached top list for a customer's new latest prediction.
+
+        Customers outside the list score at most the list's last entry, so the
+        new entry belongs in the list when it scores at least that much (or the
+        list is complete); otherwise the list stays a correct, shorter prefix.
+        """
+        floor = -cached.entries[-1][0] if cached.entries else float("-inf")
+        cached.entries = [item for item in cached.entries if item[1] != entry["customerId"]]
+        if cached.complete or entry["probability"] >= floor:
+            insort(cached.entries, (-entry["probability"], entry["customerId"], entry))
+            if len(cached.entries) > self.cache_size:
+                cached.entries.pop()
+                cached.complete = False
+
+    def top(self, user_id, k):
+        """The ``k`` customers with the highest latest probability"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(user_id)
+            if cached is not None and cached.expires > now and (cached.complete or len(cached.entries) >= k):
+                self._cache.move_to_end(user_id)
+                return [item[2] for item in cached.entries[:k]]
+
+        size = max(k, self.cache_size)
+        documents = list(
+            self.collection.find({"userId": user_id}, {"_id": 0}).sort("probability", DESCENDING).limit(size)
+        )
+        entries = [(-d["probability"], d["customerId"], d) for d in documents]
+        entries.sort(key=lambda item: item[:2])
+        with self._lock:
+            self._cache[user_id] = _CachedTop(entries, len(documents) < size, now + self.cache_ttl)
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self.max_users:
+                self._cache.popitem(last=False)
+        return [item[2] for item in entries[:k]]
+
+    def remove(self, user_id=None):
+        with self._lock:
+            if user_id:
+                self._cache.pop(user_id, None)
+            else:
+                self._cache.clear()
+        return self.collection.delete_many({"userId": user_id} if user_id else {}).deleted_count
+
+    def backfill(self, predictions_collection, user_id=None, batch_size=1000, archived=()):
+        """Rebuild the index from stored predictions (plus ``archived`` records); returns predictions read.
+
+        Order does not matter: an entry is only ever replaced by a newer prediction.
+        """
+        self.remove(user_id)
+        cursor = predictions_collection.find({"userId": user_id} if user_id else {}).batch_size(batch_size)
+        batch, total = [], 0
+        for document in itertools.chain(archived, cursor):
+            batch.append(document)
+            if len(batch) >= batch_size:
+                total += len(batch)
+                self.record(batch)
+                batch = []
+        if batch:
+            total += len(batch)
+            self.record(batch)
+        logger.info(f"Top-risk backfill read {total} predictions")
+        return total
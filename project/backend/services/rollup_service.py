@@ -0,0 +1,184 @@
+import logging
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ("day", "week")
+
+
+def bucket_start(timestamp, period):
+    """Start of the UTC day, or of the ISO week (Monday), containing ``timestamp``"""
+    day = datetime(timestamp.year, timestamp.month, timestamp.day)
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+class RollupStore:
+    """Per-user churn counts per day and per week, kept current with ``$inc`` upserts.
+
+    One document per (userId, period, start) holds ``count``, ``churns`` and
+    ``probabilitySum``; trend queries read a handful of these instead of scanning
+    predictions. ``backfill()`` rebuilds them from predictions before writes are
+    enabled, ``rebuild()`` does so while they are, and ``check()`` compares them
+    with a full recompute.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def ensure_indexes(self):
+        self.collection.create_index(
+            [("userId", ASCENDING), ("period", ASCENDING), ("start", ASCENDING)], unique=True
+        )
+
+    @staticmethod
+    def _accumulate(predictions, totals=None):
+        totals = {} if totals is None else totals
+        for prediction in predictions:
+            timestamp = prediction["timestamp"]
+            churned = 1 if prediction["prediction"] == "Churn" else 0
+            probability = float(prediction["probability"])
+            for period in PERIODS:
+                key = (prediction["userId"], period, bucket_start(timestamp, period))
+                entry = totals.get(key)
+                if entry is None:
+                    entry = totals[key] = [0, 0, 0.0]
+                entry[0] += 1
+                entry[1] += churned
+                entry[2] += probability
+        return totals
+
+    def record(self, predictions):
+        """Add stored predictions (dicts with userId, timestamp, prediction, probability)"""
+        totals = self._accumulate(predictions)
+        if not totals:
+            return 0
+        self.collection.bulk_write([
+            UpdateOne(
+                {"userId": user_id, "period": period, "start": start},
+                {"$inc": {"count": count, "churns": churns, "probabilitySum": probability_sum}},
+                upsert=True
+            )
+            for (user_id, period, start), (count, churns, probability_sum) in totals.items()
+        ], ordered=False)
+        return len(totals)
+
+    def trend(self, user_id, period="day", limit=30):
+        """The most recent ``limit`` buckets, oldest first"""
+        documents = list(
+            self.collection.find({"userId": user_id, "period": period}, {"_id": 0})
+            .sort("start", DESCENDING)
+            .limit(limit)
+        )
+        documents.reverse()
+        return [
+            {
+                "date": document["start"].date().isoformat(),
+                "predictions": document["count"],
+                "churns": document["churns"],
+                "churnRate": round(document["churns"] / document["count"] * 100, 2) if document["count"] else 0.0,
+                "avgProbability": round(document["probabilitySum"] / document["count"], 4) if document["count"] else 0.0,
+            }
+            for document in documents
+        ]
+
+    def remove(self, user_id=None):
+        return self.collection.delete_many({"userId": user_id} if user_id else {}).deleted_count
+
+    def recompute(self, predictions_collection, user_id=None, batch_size=5000, archived=()):
+        """Bucket totals computed from scratch by streaming predictions (plus ``archived`` records)"""
+        cursor = predictions_collection.find(
+            {"userId": user_id} if user_id else {},
+            {"_id": 0, "userId": 1, "timestamp": 1, "prediction": 1, "probability": 1},
+            batch_size=batch_size
+        )
+        totals = self._accumulate(p for p in cursor if p.get("userId") and isinstance(p.get("timestamp"), datetime))
+        return self._accumulate((p for p in archived if p.get("userId")), totals)
+
+    def backfill(self, predictions_collection, user_id=None, archived=()):
+        """Replace the rollups in scope with a full recompute; returns the number of buckets written.
+
+        Predictions inserted while this runs may be counted twice or not at all, so
+        run it before enabling writes or follow it with ``check()``.
+        """
+        totals = self.recompute(predictions_collection, user_id, archived=archived)
+        self.remove(user_id)
+        documents = [
+            {"userId": uid, "period": period, "start": start,
+             "count": count, "churns": churns, "probabilitySum": probability_sum}
+            for (uid, period, start), (count, churns, probability_sum) in totals.items()
+        ]
+        for i in range(0, len(documents), 1000):
+            self.collection.insert_many(documents[i:i + 1000], ordered=False)
+        logger.info(f"Rollup backfill wrote {len(documents)} buckets")
+        return len(documents)
+
+    def rebuild(self, predictions_collection, user_id=None, archived=(), attempts=5):
+        """Bring the rollups in scope in line with a full recompute while inserts continue.
+
+        Each bucket is overwritten with ``$set`` (or deleted when it no longer has
+        predictions) only if its ``count`` still matches what was read before the
+        recompute. Every insert bumps ``count``, so a bucket touched in between is
+        left alone and retried with a fresh recompute. Returns the buckets changed;
+        raises RuntimeError when some keep changing for ``attempts`` rounds.
+        """
+        changed, pending = 0, None
+        for _ in range(attempts):
+            scope = {"userId": user_id} if user_id else {}
+            stored = {
+                (d["userId"], d["period"], d["start"]): d.get("count")
+                for d in self.collection.find(scope, {"_id": 0, "userId": 1, "period": 1, "start": 1, "count": 1})
+            }
+            totals = self.recompute(predictions_collection, user_id, archived=archived)
+            keys = stored.keys() | totals.keys()
+            conflicts = set()
+            for key in keys if pending is None else pending & keys:
+                uid, period, start = key
+                bucket = {"userId": uid, "period": period, "start": start}
+                seen = stored.get(key)
+                guard = {**bucket, "count": seen if seen is not None else {"$exists": False}}
+                try:
+                    if key not in totals:
+                        result = self.collection.delete_one(guard)
+                        done = result.deleted_count
+                    else:
+                        count, churns, probability_sum = totals[key]
+                        result = self.collection.update_one(guard, {"$set": {
+                            "count": count, "churns": churns, "probabilitySum": probability_sum
+                        }}, upsert=True)
+                        done = result.matched_count or result.upserted_id is not None
+                except DuplicateKeyError:
+                    done = False  # created by an insert since the read
+                if done:
+                    changed += 1
+                else:
+                    conflicts.add(key)
+            if not conflicts:
+                logger.info(f"Rollup rebuild updated {changed} buckets")
+                return changed
+            pending = conflicts
+        raise RuntimeError(f"{len(pending)} rollup buckets kept changing during rebuild")
+
+    def check(self, predictions_collection, user_id=None, tolerance=1e-6, archived=()):
+        """Buckets whose stored totals differ from a full recompute"""
+        expected = self.recompute(predictions_collection, user_id, archived=archived)
+        stored = {
+            (d["userId"], d["period"], d["start"]): [d.get("count", 0), d.get("churns", 0), d.get("probabilitySum", 0.0)]
+            for d in self.collection.find({"userId": user_id} if user_id else {}, {"_id": 0})
+        }
+        mismatches = []
+        for key in expected.keys() | stored.keys():
+            want = expected.get(key, [0, 0, 0.0])
+            have = stored.get(key, [0, 0, 0.0])
+            if want[0] != have[0] or want[1] != have[1] or abs(want[2] - have[2]) > tolerance * max(1, want[0]):
+                user, period, start = key
+                mismatches.append({
+                    "userId": user, "period": period, "start": start.isoformat(),
+                    "expected": {"count": want[0], "churns": want[1], "probabilitySum": want[2]},
+                    "stored": {"count": have[0], "churns": have[1], "probabilitySum": have[2]},
+                })
+        return mismatches
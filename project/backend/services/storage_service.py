@@ -0,0 +1,212 @@
+import threading
+
+import numpy as np
+from bson import Binary
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+COMPACT_VERSION = 2
+
+RISK_LEVELS = ("Low", "Medium", "High", "Very High", "Unknown")
+IMPACTS = ("negative", "positive", "neutral")
+
+# Per customer field: value kind + value; kinds below
+FEATURE_DTYPE = np.dtype([("kind", "u1"), ("value", "<f4")])
+KIND_FLOAT, KIND_INT, KIND_CATEGORY, KIND_NONE, KIND_ABSENT = 0, 1, 2, 3, 4
+
+# Per SHAP entry: feature-name code, impact code, value
+SHAP_DTYPE = np.dtype([("name", "<u2"), ("impact", "u1"), ("value", "<f4")])
+
+MAX_EXACT_INT = 1 << 24  # largest integer float32 represents exactly
+
+
+def _float32_to_python(value):
+    """Shortest decimal that round-trips through float32, so 80.35 reads back as 80.35"""
+    return float(str(np.float32(value)))
+
+
+class FeatureDictionary:
+    """Append-only value <-> code tables shared by every worker.
+
+    One document per namespace holds the ``values`` array; a value's code is its
+    position. New values are appended with ``$addToSet``, which never reorders
+    the array, so codes handed out by any worker stay valid. Tables are cached
+    per process and reloaded when an unknown code is seen.
+
+    Values come from clients, so each table stops growing at ``max_values``
+    entries and values longer than ``max_length`` are never added; ``code()``
+    returns None for those and callers store the value uncoded.
+    """
+
+    def __init__(self, collection, max_values=1000, max_length=64):
+        self.collection = collection
+        self.max_values = max_values
+        self.max_length = max_length
+        self._lock = threading.Lock()
+        self._tables = {}
+
+    def _store(self, namespace, values):
+        with self._lock:
+            current = self._tables.get(namespace)
+            if current is None or len(values) > len(current[0]):
+                self._tables[namespace] = (list(values), {v: i for i, v in enumerate(values)})
+            return self._tables[namespace]
+
+    def code(self, namespace, value):
+        """The value's code, adding it if there is room; None when it can't be coded"""
+        table = self._tables.get(namespace)
+        if table is not None:
+            code = table[1].get(value)
+            if code is not None:
+                return code
+            if len(table[0]) >= self.max_values:
+                return None
+        if len(value) > self.max_length:
+            return None
+        try:
+            # Only matches while the array has room; a full table falls through to the upsert's duplicate key
+            document = self.collection.find_one_and_update(
+                {"_id": namespace, f"values.{self.max_values - 1}": {"$exists": False}},
+                {"$addToSet": {"values": value}},
+                upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            document = self.collection.find_one({"_id": namespace}) or {"values": []}
+        return self._store(namespace, document["values"])[1].get(value)
+
+    def value(self, namespace, code):
+        table = self._tables.get(namespace)
+        if table is None or code >= len(table[0]):
+            document = self.collection.find_one({"_id": namespace}) or {"values": []}
+            table = self._store(namespace, document["values"])
+        return table[0][code]
+
+
+class CompactPredictionCodec:
+    """Encodes stored predictions in the compact (v2) schema and decodes them back.
+
+    Fields that queries, indexes and aggregations use keep their names and types:
+    ``userId``, ``timestamp``, ``prediction``, ``probability``. Everything else is
+    packed:
+
+    - ``f``: one (kind, float32) pair per entry of ``fields``; strings of
+      ``categorical`` fields are stored as codes in the shared dictionary
+      (namespace ``field:<name>``), so its size is bounded by their vocabulary
+    - ``x``: customer fields outside ``fields`` or not representable above (including
+      strings the dictionary has no room for), as-is
+    - ``s``: one (name code, impact code, float32) triple per SHAP entry
+    - ``r``: index into RISK_LEVELS
+    - ``g``: dictionary codes of ``grouped`` fields, readable by aggregation pipelines
+      (values that could not be coded are only in ``x``)
+
+    ``decode()`` returns the legacy document shape, so callers see no difference;
+    documents without ``v == 2`` pass through unchanged. Numbers keep float32
+    precision (about 7 significant digits).
+    """
+
+    def __init__(self, dictionary, fields, categorical=(), grouped=()):
+        self.dictionary = dictionary
+        self.fields = list(fields)
+        self.categorical = set(categorical) | set(grouped)
+        self.grouped = {field: f"g{i}" for i, field in enumerate(grouped)}
+
+    def group_key(self, field):
+        return self.grouped[field]
+
+    def encode(self, record):
+        customer = record.get("customerData") or {}
+        features = np.zeros(len(self.fields), dtype=FEATURE_DTYPE)
+        extras = {key: value for key, value in customer.items() if key not in self.fields}
+        codes = {}
+        for i, field in enumerate(self.fields):
+            value = customer.get(field)
+            if field not in customer:
+                features[i] = (KIND_ABSENT, 0.0)
+            elif value is None:
+                features[i] = (KIND_NONE, 0.0)
+            elif isinstance(value, int) and not isinstance(value, bool) and abs(value) <= MAX_EXACT_INT:
+                features[i] = (KIND_INT, value)
+            elif isinstance(value, float):
+                features[i] = (KIND_FLOAT, value)
+            elif isinstance(value, str) and field in self.categorical and self._code(codes, field, value) is not None:
+                features[i] = (KIND_CATEGORY, codes[field])
+            else:
+                extras[field] = value
+                features[i] = (KIND_ABSENT, 0.0)
+
+        shap_values = record.get("shapValues") or []
+        shap = np.zeros(len(shap_values), dtype=SHAP_DTYPE)
+        for i, entry in enumerate(shap_values):
+            impact = entry.get("impact", "neutral")
+            name = self.dictionary.code("shap", entry.get("feature"))
+            if name is None:
+                raise ValueError(f"Cannot code SHAP feature {entry.get('feature')!r}")
+            shap[i] = (
+                name,
+                IMPACTS.index(impact) if impact in IMPACTS else IMPACTS.index("neutral"),
+                entry.get("value", 0.0),
+            )
+
+        risk = record.get("riskLevel", "Unknown")
+        document = {
+            "v": COMPACT_VERSION,
+            "userId": record.get("userId"),
+            "timestamp": record["timestamp"],
+            "prediction": record.get("prediction"),
+            "probability": record.get("probability"),
+            "r": RISK_LEVELS.index(risk) if risk in RISK_LEVELS else RISK_LEVELS.index("Unknown"),
+            "f": Binary(features.tobytes()),
+            "s": Binary(shap.tobytes()),
+        }
+        if "_id" in record:
+            document["_id"] = record["_id"]
+        groups = {
+            key: self._code(codes, field, customer[field])
+            for field, key in self.grouped.items() if isinstance(customer.get(field), str)
+        }
+        groups = {key: code for key, code in groups.items() if code is not None}
+        if groups:
+            document["g"] = groups
+        if extras:
+            document["x"] = extras
+        return document
+
+    def _code(self, codes, field, value):
+        if field not in codes:
+            codes[field] = self.dictionary.code(f"field:{field}", value)
+        return codes[field]
+
+    def decode_customer(self, document):
+        customer = {}
+        features = np.frombuffer(document["f"], dtype=FEATURE_DTYPE)
+        for field, (kind, value) in zip(self.fields, features.tolist()):
+            if kind == KIND_INT:
+                customer[field] = int(value)
+            elif kind == KIND_FLOAT:
+                customer[field] = _float32_to_python(value)
+            elif kind == KIND_CATEGORY:
+                customer[field] = self.dictionary.value(f"field:{field}", int(value))
+            elif kind == KIND_NONE:
+                customer[field] = None
+        customer.update(document.get("x", {}))
+        return customer
+
+    def decode(self, document):
+        if document.get("v") != COMPACT_VERSION:
+            return document
+        shap = np.frombuffer(document["s"], dtype=SHAP_DTYPE).tolist()
+        decoded = {
+            "timestamp": document["timestamp"],
+            "customerData": self.decode_customer(document),
+            "prediction": document["prediction"],
+            "probability": document["probability"],
+            "riskLevel": RISK_LEVELS[document.get("r", RISK_LEVELS.index("Unknown"))],
+            "shapValues": [
+                {"feature": self.dictionary.value("shap", name), "value": _float32_to_python(value), "impact": IMPACTS[impact]}
+                for name, impact, value in shap
+            ],
+            "userId": document.get("userId"),
+        }
+        if "_id" in document:
+            decoded["_id"] = document["_id"]
+        return decoded
@@ -0,0 +1,118 @@
+# What-if grids: one base customer plus per-field variations, scored in a single
+# model call. Encoding and scaling are column-wise, so each varied column is
+# prepared once for its own values; only the distinct encoded combinations are
+# scored and the full grid is filled back in by numpy indexing.
+import math
+
+import numpy as np
+import pandas as pd
+
+
+class _Range:
+    """Inclusive numeric range, materialized only after the grid size is checked"""
+
+    def __init__(self, field, start, stop, step):
+        self.start, self.step = start, step
+        steps = (stop - start) / step
+        # Huge spans over tiny steps overflow to inf; no grid that size would pass the point limit anyway
+        if not math.isfinite(steps):
+            raise ValueError(f"{field}: range has too many points")
+        self.count = int(math.floor(steps + 1e-9)) + 1
+
+    def __len__(self):
+        return self.count
+
+    def values(self):
+        return np.round(self.start + self.step * np.arange(self.count), 10)
+
+
+def variation_values(field, spec, base_value, numeric):
+    """Values for one varied field.
+
+    ``spec`` is a list of values, ``{"start", "stop", "step"}`` (inclusive range)
+    or ``{"deltas": [...]}`` (offsets from the base value); ranges and deltas
+    apply to numeric fields only. Raises ValueError on malformed input.
+    """
+    if isinstance(spec, list):
+        if not spec:
+            raise ValueError(f"{field}: no values")
+        return _numeric(field, spec) if numeric else np.asarray(spec, dtype=object)
+    if not isinstance(spec, dict):
+        raise ValueError(f"{field}: expected a list of values or a range object")
+    if not numeric:
+        raise ValueError(f"{field}: ranges and deltas apply to numeric fields only")
+    if "deltas" in spec:
+        if not isinstance(spec["deltas"], list) or not spec["deltas"]:
+            raise ValueError(f"{field}: deltas must be a non-empty list")
+        return _numeric(field, [base_value])[0] + _numeric(field, spec["deltas"])
+    try:
+        start, stop, step = float(spec["start"]), float(spec["stop"]), float(spec["step"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"{field}: a range needs numeric start, stop and step")
+    if not all(math.isfinite(value) for value in (start, stop, step)):
+        raise ValueError(f"{field}: start, stop and step must be finite")
+    if step <= 0 or stop < start:
+        raise ValueError(f"{field}: step must be positive and stop >= start")
+    return _Range(field, start, stop, step)
+
+
+def grid_dimensions(base, variations, fields, numeric_fields, max_points):
+    """[(field, values)] in request order; raises ValueError for unknown fields or oversized grids"""
+    if not isinstance(variations, dict) or not variations:
+        raise ValueError("variations must be a non-empty object")
+    unknown = [field for field in variations if field not in fields]
+    if unknown:
+        raise ValueError(f"Unknown fields in variations: {', '.join(unknown)}")
+
+    specs = {
+        field: variation_values(field, spec, base.get(field), field in numeric_fields)
+        for field, spec in variations.items()
+    }
+    points = math.prod(len(spec) for spec in specs.values())
+    if points > max_points:
+        raise ValueError(f"Grid has {points} points; the limit is {max_points}")
+    return [(field, spec.values() if isinstance(spec, _Range) else spec) for field, spec in specs.items()]
+
+
+def score_grid(base_row, dimensions, prepare, predict):
+    """Probabilities of the base row and of every grid point (row-major over ``dimensions``).
+
+    ``base_row`` maps model columns to the base customer's values and
+    ``dimensions`` is [(model column, values)]. ``prepare`` turns a raw frame into
+    model input (encoding, scaling) and ``predict`` returns one probability per
+    row. Returns (base probability, flat probabilities, rows actually scored).
+    """
+    base_frame = pd.DataFrame([base_row])
+    encoded_base = None
+    distinct, inverses = [], []
+    for column, values in dimensions:
+        # The base value is included so the column holds the same values as in the full grid
+        frame = base_frame.loc[np.zeros(len(values) + 1, dtype=int)].reset_index(drop=True)
+        frame[column] = list(values) + [base_row[column]]
+        prepared = prepare(frame)
+        if encoded_base is None:
+            encoded_base = prepared.iloc[[-1]].reset_index(drop=True)
+        encoded_base[column] = prepared[column].iloc[-1]
+        codes, inverse = np.unique(prepared[column].to_numpy()[:-1], return_inverse=True)
+        distinct.append((column, codes))
+        inverses.append(inverse.ravel())
+
+    shape = tuple(len(codes) for _, codes in distinct)
+    points = math.prod(shape)
+    grid = encoded_base.loc[np.zeros(points + 1, dtype=int)].reset_index(drop=True)
+    for (column, codes), index in zip(distinct, np.indices(shape).reshape(len(shape), points)):
+        grid[column] = np.append(codes[index], encoded_base[column].iloc[0])
+
+    probabilities = np.asarray(predict(grid))
+    surface = probabilities[:-1].reshape(shape)[np.ix_(*inverses)]
+    return float(probabilities[-1]), surface.ravel(), points
+
+
+def _numeric(field, values):
+    try:
+        array = np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field}: values must be numbers")
+    if not np.isfinite(array).all():
+        raise ValueError(f"{field}: values must be finite")
+    return array
@@ -44,7 +44,9 @@ export const PredictionForm: React.FC<PredictionFormProps> = ({
 
   const handleSubmit = (e: React.FormEvent) => {
     e.preventDefault();
-    onSubmit(formData);
+    const { customerId, ...rest } = formData;
+    const trimmedId = customerId?.trim();
+    onSubmit(trimmedId ? { ...rest, customerId: trimmedId } : rest);
   };
 
   return (
@@ -55,6 +57,16 @@ export const PredictionForm: React.FC<PredictionFormProps> = ({
 
       <form onSubmit={handleSubmit} className="space-y-6">
         <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
+          <Input
+            label="Customer ID"
+            type="text"
+            value={formData.customerId ?? ''}
+            onChange={(e) => handleInputChange('customerId', e.target.value)}
+            maxLength={128}
+            placeholder="Optional"
+            helperText="Track this customer in the top-risk list"
+          />
+
           <Input
             label="Tenure (Months)"
             type="number"
@@ -35,6 +35,8 @@ export interface AuthContextType {
 
 
 export interface CustomerData {
+  /** Optional; predictions that name a customer feed the top-risk customer list */
+  customerId?: string;
   contract: 'Month-to-month' | 'One year' | 'Two year';
   monthlyCharges: number;
   numReferrals: number;